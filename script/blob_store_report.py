@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片仓库空间报告
+统计保存路径下缓存(cache)、下载(commies)、图片仓库(blobs)中重复的图片, 显示已经省下和还能省下的空间
+--dedup 把已有的图片收进仓库, 重复的文件换成硬链接
+--gc    删除没有被引用的blob
+
+用法:
+    python script/blob_store_report.py --save-path D:/picacg
+    python script/blob_store_report.py --save-path D:/picacg --dedup --gc
+    python script/blob_store_report.py --demo
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from tools.blob_store import BlobStore, scan_duplicates
+
+
+def make_demo(savePath, books, pages):
+    """模拟阅读过的缓存、下载的原图和waifu2x结果, 同一页保存了多份"""
+    random.seed(1)
+    cacheDir = os.path.join(savePath, config.CachePathDir)
+    for bookId in range(books):
+        for index in range(pages):
+            data = random.randbytes(random.randint(50, 300) * 1024)
+            big = random.randbytes(len(data) * 2)
+            paths = [os.path.join(savePath, config.SavePathDir, str(bookId), "original", "0001", "{:04}.jpg".format(index + 1))]
+            if index % 2 == 0:
+                # 阅读过的页
+                paths.append(os.path.join(cacheDir, "book", str(bookId), "1", "{}.jpg".format(index + 1)))
+            for path in paths:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+            paths = [os.path.join(savePath, config.SavePathDir, str(bookId), "waifu2x", "0001", "{:04}.jpg".format(index + 1))]
+            if index % 4 == 0:
+                paths.append(os.path.join(cacheDir, "waifu2x", "book", str(bookId), "1", "{}.jpg".format(index + 1)))
+            for path in paths:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(big)
+
+
+def dedup(store, dirs):
+    num = 0
+    for root in dirs:
+        for dirPath, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                store.link_file(os.path.join(dirPath, name))
+                num += 1
+    return num
+
+
+def mb(size):
+    return round(size / 1024 / 1024, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片仓库空间报告")
+    parser.add_argument("--save-path", default="", help="设置中的保存路径")
+    parser.add_argument("--dedup", action="store_true", help="把已有的图片收进仓库")
+    parser.add_argument("--gc", action="store_true", help="删除没有被引用的blob")
+    parser.add_argument("--demo", action="store_true", help="在临时目录生成模拟数据并去重")
+    parser.add_argument("--books", type=int, default=10, help="模拟的书数量")
+    parser.add_argument("--pages", type=int, default=20, help="模拟的每本书页数")
+    args = parser.parse_args()
+
+    savePath = args.save_path
+    if args.demo:
+        savePath = tempfile.mkdtemp(prefix="pica_blob_report_")
+        make_demo(savePath, args.books, args.pages)
+        args.dedup = True
+    elif not savePath or not os.path.isdir(savePath):
+        parser.error("--save-path not found: {}".format(savePath))
+
+    try:
+        store = BlobStore(os.path.join(savePath, config.BlobStoreDir))
+        dirs = [os.path.join(savePath, config.CachePathDir), os.path.join(savePath, config.SavePathDir)]
+        dirs = [path for path in dirs if os.path.isdir(path)]
+
+        before = scan_duplicates(dirs + [store.root])
+        result = {'before': before}
+        print("=" * 60)
+        print("图片仓库空间报告: {}".format(savePath))
+        print("=" * 60)
+        print(f"  ✓ {before['files']} files, {mb(before['total_bytes'])}MB, on disk {mb(before['disk_bytes'])}MB, "
+              f"already linked {mb(before['linked_bytes'])}MB, reclaimable {mb(before['reclaimable_bytes'])}MB")
+
+        if args.dedup:
+            start = time.perf_counter()
+            num = dedup(store, dirs)
+            cost = time.perf_counter() - start
+            after = scan_duplicates(dirs + [store.root])
+            result['dedup_files'] = num
+            result['dedup_ms'] = round(cost * 1000, 2)
+            result['after'] = after
+            result['reclaimed_bytes'] = before['disk_bytes'] - after['disk_bytes']
+            print(f"  ✓ dedup {num} files in {result['dedup_ms']}ms, on disk {mb(after['disk_bytes'])}MB, "
+                  f"reclaimed {mb(result['reclaimed_bytes'])}MB")
+
+        if args.gc:
+            num, size = store.gc()
+            result['gc'] = {'blobs': num, 'bytes': size}
+            print(f"  ✓ gc {num} blobs, {mb(size)}MB")
+
+        result['store'] = store.get_stats()
+        print(json.dumps(result, indent=2))
+    finally:
+        if args.demo:
+            shutil.rmtree(savePath, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
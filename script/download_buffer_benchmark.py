@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载缓冲区基准测试
+对比 data += chunk 与 StreamBuffer 在本地HTTP服务上下载5~20MB图片的耗时
+"""
+
+import sys
+import os
+import time
+import json
+import asyncio
+import threading
+import http.server
+import socketserver
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import httpx
+
+from config import config
+from tools.stream_buffer import StreamBuffer
+
+SIZES_MB = [5, 10, 20]
+ROUNDS = 3
+
+
+class SyntheticImageHandler(http.server.BaseHTTPRequestHandler):
+    """返回 /<size_mb> 大小的合成图片"""
+    cache = {}
+
+    def do_GET(self):
+        size = int(self.path.strip("/")) * 1024 * 1024
+        data = self.cache.get(size)
+        if data is None:
+            data = os.urandom(size)
+            self.cache[size] = data
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SyntheticImageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def download_concat(client, url):
+    """旧实现：1KB分块 + data += chunk"""
+    data = b""
+    async with client.stream("GET", url) as r:
+        async for chunk in r.aiter_bytes(chunk_size=1024):
+            data += chunk
+    return len(data)
+
+
+async def download_buffer(client, url):
+    """新实现：预分配 StreamBuffer + 大分块"""
+    async with client.stream("GET", url) as r:
+        buffer = StreamBuffer(int(r.headers.get("Content-Length", 0)))
+        async for chunk in r.aiter_bytes(chunk_size=config.DownloadChunkSize):
+            buffer.Write(chunk)
+    return len(buffer.GetData())
+
+
+async def run_benchmark(port):
+    results = []
+    async with httpx.AsyncClient(timeout=60) as client:
+        for sizeMb in SIZES_MB:
+            url = "http://127.0.0.1:{}/{}".format(port, sizeMb)
+            # 预热，生成数据
+            await client.get(url)
+            item = {"size_mb": sizeMb}
+            for name, func in [("before", download_concat), ("after", download_buffer)]:
+                costs = []
+                # 旧实现是二次方拷贝，20MB要几十秒，只跑一轮
+                for _ in range(1 if name == "before" else ROUNDS):
+                    start = time.perf_counter()
+                    size = await func(client, url)
+                    costs.append(time.perf_counter() - start)
+                    assert size == sizeMb * 1024 * 1024
+                item[name + "_ms"] = round(min(costs) * 1000, 1)
+            item["speedup"] = round(item["before_ms"] / item["after_ms"], 1)
+            results.append(item)
+            print(f"  ✓ {sizeMb:>2}MB: before {item['before_ms']:>8.1f}ms, after {item['after_ms']:>7.1f}ms, "
+                  f"x{item['speedup']}")
+    return results
+
+
+def main():
+    print("=" * 60)
+    print("下载缓冲区基准测试")
+    print("=" * 60)
+    server = start_server()
+    try:
+        results = asyncio.run(run_benchmark(server.server_address[1]))
+    finally:
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载记录数据库写入基准测试
+模拟下载管理器里一批多章节的书反复开始/完成页面, 对比UI线程花在写库上的时间:
+    before: 每次UpdateTaskDB写所有章节, 每行一条拼接的QSqlQuery, 自动提交
+    after:  DownloadDb 只写有修改的行, 后台线程合并后一个事务批量写入
+
+用法:
+    python script/download_db_benchmark.py
+    python script/download_db_benchmark.py --books 20 --eps 300 --updates 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from PySide6.QtSql import QSqlQuery
+
+from view.download.download_db import DownloadDb
+from view.download.download_item import DownloadItem, DownloadEpsItem
+from view.download.download_status import DownloadStatus
+
+
+def make_tasks(args):
+    tasks = []
+    for i in range(args.books):
+        task = DownloadItem()
+        task.bookId = "book{}".format(i)
+        task.title = "book {}".format(i)
+        task.epsIds = list(range(args.eps))
+        for epsId in task.epsIds:
+            info = DownloadEpsItem()
+            info.bookId, info.epsId, info.epsTitle, info.picCnt = task.bookId, epsId, "eps {}".format(epsId), 20
+            task.epsInfo[epsId] = info
+        tasks.append(task)
+    return tasks
+
+
+def old_update(db, task):
+    """改动前的UpdateTaskDB: 所有章节都写, 每行一次自动提交"""
+    query = QSqlQuery(db.db)
+    sql = "INSERT INTO download(bookId, downloadEpsIds, curDownloadEpsId, curConvertEpsId, title, savePath, " \
+          "convertPath, status, convertStatus, tick) VALUES ('{0}', '[]', {1}, -1, '{2}', '', '', '{3}', '{4}', 0) " \
+          "ON CONFLICT(bookId) DO UPDATE SET curDownloadEpsId={1}, title='{2}', status='{3}', convertStatus='{4}'".\
+        format(task.bookId, task.curDownloadEpsId, task.title, task.status, task.convertStatus)
+    query.exec_(sql)
+    for info in task.epsInfo.values():
+        query = QSqlQuery(db.db)
+        sql = "INSERT INTO download_eps(bookId, epsId, epsTitle, picCnt, curPreDownloadIndex, curPreConvertId) " \
+              "VALUES ('{0}', {1}, '{2}', {3}, {4}, {5}) " \
+              "ON CONFLICT(bookId, epsId) DO UPDATE SET epsTitle='{2}', picCnt={3}, curPreDownloadIndex={4}, " \
+              "curPreConvertId = {5}".\
+            format(info.bookId, info.epsId, info.epsTitle, info.picCnt, info.curPreDownloadIndex, info.curPreConvertId)
+        query.exec_(sql)
+
+
+def run_case(name, args):
+    path = tempfile.mkdtemp(prefix="pica_dldb_")
+    try:
+        with mock.patch("config.setting.Setting.GetConfigPath", return_value=path):
+            db = DownloadDb()
+        status = DownloadStatus.__new__(DownloadStatus)
+        status.db = db
+        tasks = make_tasks(args)
+        latencies = []
+        start = time.perf_counter()
+        for i in range(args.updates):
+            task = tasks[i % len(tasks)]
+            # 完成一页
+            task.dirty = True
+            info = task.epsInfo[i % args.eps]
+            info.curPreDownloadIndex += 1
+            info.dirty = True
+            t = time.perf_counter()
+            if name == "before":
+                old_update(db, task)
+            else:
+                status.UpdateTaskDB(task)
+            latencies.append(time.perf_counter() - t)
+        ui = time.perf_counter() - start
+        db.Flush()
+        total = time.perf_counter() - start
+        stats = db.writer.get_stats()
+        db.Close()
+        db.db.close()
+        latencies.sort()
+        return {
+            'case': name,
+            'updates': args.updates,
+            'ui_ms': round(ui * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'update_p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+            'transactions': stats['transactions'] if name == "after" else args.updates * (args.eps + 1),
+            'rows': stats['rows'] if name == "after" else args.updates * (args.eps + 1),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载记录数据库写入基准测试")
+    parser.add_argument("--books", type=int, default=5, help="下载中的书数量")
+    parser.add_argument("--eps", type=int, default=200, help="每本书的章节数")
+    parser.add_argument("--updates", type=int, default=100, help="UpdateTaskDB次数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("下载记录数据库写入基准测试, {}本书, 每本{}章".format(args.books, args.eps))
+    print("=" * 60)
+    results = []
+    for name in ["before", "after"]:
+        item = run_case(name, args)
+        results.append(item)
+        print(f"  ✓ {name:>6}: ui {item['ui_ms']:>9.2f}ms, total {item['total_ms']:>9.2f}ms, "
+              f"p99 {item['update_p99_ms']:>8.3f}ms, transactions {item['transactions']:>6}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载管理器调度基准测试
+几千本书排队时, 对比每次定时器(TimeOutHandler)和状态切换的耗时:
+    before: 列表保存队列, 每次定时器遍历整个等待队列, 状态切换用 in/remove
+    after:  DownloadStatus 使用 IndexedQueue, 定时器只处理空出来的名额
+
+用法:
+    python script/download_scheduler_benchmark.py
+    python script/download_scheduler_benchmark.py --books 20000 --ticks 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from view.download.download_item import DownloadItem
+from view.download.download_status import DownloadStatus
+
+
+class BenchStatus(DownloadStatus):
+    """不下载也不转换, 启动即进入下载中, 转换一直等待下载进度"""
+
+    def __init__(self):
+        with mock.patch("view.download.download_status.DownloadDb"):
+            DownloadStatus.__init__(self)
+
+    def StartItemDownload(self, task):
+        self.SetNewStatus(task, task.Downloading)
+
+    def StartItemConvert(self, task):
+        self.SetNewCovertStatus(task, task.Waiting)
+
+
+class ListStatus(object):
+    """改动前的列表实现"""
+
+    def __init__(self):
+        self.downloadingList = []
+        self.downloadList = []
+        self.convertList = []
+        self.convertingList = []
+
+    def SetWait(self, task):
+        if task in self.downloadingList:
+            self.downloadingList.remove(task)
+        if task not in self.downloadList:
+            self.downloadList.append(task)
+
+    def SetDownloading(self, task):
+        if task not in self.downloadingList:
+            self.downloadingList.append(task)
+        if task in self.downloadList:
+            self.downloadList.remove(task)
+
+    def SetNone(self, task):
+        if task in self.downloadingList:
+            self.downloadingList.remove(task)
+        if task in self.downloadList:
+            self.downloadList.remove(task)
+
+    def TimeOutHandler(self):
+        addNum = config.DownloadThreadNum - len(self.downloadingList)
+        if addNum > 0:
+            for task in list(self.downloadList):
+                if addNum <= 0:
+                    break
+                if task.status != task.Waiting:
+                    self.downloadList.remove(task)
+                    continue
+                task.status = task.Downloading
+                self.SetDownloading(task)
+                addNum -= 1
+        addNum = config.ConvertThreadNum - len(self.convertingList)
+        if addNum > 0:
+            for task in list(self.convertList):
+                if addNum <= 0:
+                    break
+                if task.convertStatus != task.Waiting:
+                    self.convertList.remove(task)
+                    continue
+                # 下载还没完成, 转换继续等待
+
+
+def make_tasks(num):
+    tasks = []
+    for i in range(num):
+        task = DownloadItem()
+        task.bookId = "book{}".format(i)
+        tasks.append(task)
+    return tasks
+
+
+def finish_one(task, setNone):
+    # 正在下载的一本完成, 空出一个名额
+    task.status = task.Success
+    setNone(task)
+
+
+def run_before(args):
+    status = ListStatus()
+    tasks = make_tasks(args.books)
+    start = time.perf_counter()
+    for task in tasks:
+        task.status = task.Waiting
+        task.convertStatus = task.Waiting
+        status.SetWait(task)
+        status.convertList.append(task)
+    enqueue = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.ticks):
+        if status.downloadingList:
+            finish_one(status.downloadingList[0], status.SetNone)
+        status.TimeOutHandler()
+    tick = time.perf_counter() - start
+
+    # 从队列中间删除(用户删除记录/暂停)
+    start = time.perf_counter()
+    for task in tasks[::-args.step]:
+        status.SetNone(task)
+    remove = time.perf_counter() - start
+    return enqueue, tick, remove
+
+
+def run_after(args):
+    status = BenchStatus()
+    tasks = make_tasks(args.books)
+    start = time.perf_counter()
+    for task in tasks:
+        status.downloadDict[task.bookId] = task
+        status.SetNewStatus(task, task.Waiting)
+        status.SetNewCovertStatus(task, task.Waiting)
+    enqueue = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.ticks):
+        if status.downloadingList:
+            task = status.downloadingList.first()
+            status.SetNewStatus(task, task.Success)
+        status.TimeOutHandler()
+    tick = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task in tasks[::-args.step]:
+        status.RemoveTask(task)
+    remove = time.perf_counter() - start
+    return enqueue, tick, remove
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载管理器调度基准测试")
+    parser.add_argument("--books", type=int, default=5000, help="排队的书数量")
+    parser.add_argument("--ticks", type=int, default=100, help="定时器次数")
+    parser.add_argument("--step", type=int, default=10, help="每隔多少本删除一本")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("下载管理器调度基准测试, {}本书排队".format(args.books))
+    print("=" * 60)
+    results = []
+    for name, func in [("before", run_before), ("after", run_after)]:
+        enqueue, tick, remove = func(args)
+        item = {
+            'case': name,
+            'books': args.books,
+            'enqueue_ms': round(enqueue * 1000, 2),
+            'tick_ms': round(tick * 1000 / args.ticks, 3),
+            'remove_ms': round(remove * 1000, 2),
+        }
+        results.append(item)
+        print(f"  ✓ {name:>6}: enqueue {item['enqueue_ms']:>9.2f}ms, tick {item['tick_ms']:>8.3f}ms, "
+              f"remove {item['remove_ms']:>9.2f}ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
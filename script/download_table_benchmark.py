@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载列表表格基准测试
+对比打开下载页时放入大量任务、以及定时刷新下载速度的耗时:
+    before: QTableWidget, 每个任务一行QTableWidgetItem, 每次更新重写整行
+    after:  DownloadTableModel + DownloadProxyModel, 只通知变化的列
+
+用法:
+    QT_QPA_PLATFORM=offscreen python script/download_table_benchmark.py
+    QT_QPA_PLATFORM=offscreen python script/download_table_benchmark.py --tasks 20000 --downloading 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem, QTableView
+
+from view.download.download_item import DownloadItem
+from view.download.download_model import DownloadTableModel, DownloadProxyModel
+
+
+def make_tasks(num):
+    tasks = []
+    for i in range(num):
+        task = DownloadItem()
+        task.bookId = "book{}".format(i)
+        task.title = "title {}".format(num - i)
+        task.epsIds = [0]
+        tasks.append(task)
+    return tasks
+
+
+def set_row(table, row, info):
+    """改动前UpdateTableItem的写法"""
+    texts = DownloadTableModel.FormatTask(info)
+    for col, text in enumerate(texts):
+        item = QTableWidgetItem(text)
+        if col == DownloadTableModel.ColumnTitle:
+            item.setToolTip(info.title)
+        table.setItem(row, col, item)
+
+
+def run_before(app, tasks, args):
+    table = QTableWidget()
+    table.setColumnCount(11)
+    table.resize(1200, 800)
+    start = time.perf_counter()
+    for task in tasks:
+        row = table.rowCount()
+        task.tableRow = row
+        table.insertRow(row)
+        set_row(table, row, task)
+    table.show()
+    app.processEvents()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.ticks):
+        for task in tasks[:args.downloading]:
+            task.speedStr = "{}KB/s".format(i)
+            table.setItem(task.tableRow, 5, QTableWidgetItem(task.speedStr))
+            set_row(table, task.tableRow, task)
+        app.processEvents()
+    tick = (time.perf_counter() - start) / args.ticks
+
+    start = time.perf_counter()
+    table.sortItems(2, Qt.AscendingOrder)
+    app.processEvents()
+    sort = time.perf_counter() - start
+    table.close()
+    return load, tick, sort
+
+
+def run_after(app, tasks, args):
+    model = DownloadTableModel()
+    proxy = DownloadProxyModel()
+    proxy.setSourceModel(model)
+    table = QTableView()
+    table.setModel(proxy)
+    table.resize(1200, 800)
+    start = time.perf_counter()
+    model.AddTasks(tasks)
+    table.show()
+    app.processEvents()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.ticks):
+        for task in tasks[:args.downloading]:
+            task.speedStr = "{}KB/s".format(i)
+            model.UpdateTask(task, [DownloadTableModel.ColumnSpeed])
+            model.UpdateTask(task)
+        app.processEvents()
+    tick = (time.perf_counter() - start) / args.ticks
+
+    start = time.perf_counter()
+    proxy.sort(2, Qt.AscendingOrder)
+    app.processEvents()
+    sort = time.perf_counter() - start
+    table.close()
+    return load, tick, sort
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载列表表格基准测试")
+    parser.add_argument("--tasks", type=int, default=10000, help="任务数")
+    parser.add_argument("--downloading", type=int, default=20, help="正在下载的任务数")
+    parser.add_argument("--ticks", type=int, default=20, help="刷新次数")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    print("=" * 60)
+    print("下载列表表格基准测试, {}个任务".format(args.tasks))
+    print("=" * 60)
+    results = []
+    for name, func in [("before", run_before), ("after", run_after)]:
+        load, tick, sort = func(app, make_tasks(args.tasks), args)
+        item = {
+            'case': name,
+            'tasks': args.tasks,
+            'load_ms': round(load * 1000, 2),
+            'tick_ms': round(tick * 1000, 3),
+            'sort_ms': round(sort * 1000, 2),
+        }
+        results.append(item)
+        print(f"  ✓ {name:>6}: load {item['load_ms']:>9.2f}ms, tick {item['tick_ms']:>8.3f}ms, "
+              f"sort {item['sort_ms']:>9.2f}ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线HTTP替身服务器
+按server/req.py中的请求类型返回合成数据或录制的响应, 用于不连接正式API的性能测试
+
+用法:
+    python script/fake_server.py --port 18080 --img-size 262144 --latency 0.05 --error-rate 0.02
+    python script/fake_server.py --record-dir rec --upstream https://picaapi.picacomic.com   # 录制
+    python script/fake_server.py --record-dir rec                                            # 回放
+客户端把 config.Url 指向 http://127.0.0.1:端口/ 即可
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+EPS_LIMIT = 40
+PIC_LIMIT = 40
+COMIC_LIMIT = 20
+COMMENT_LIMIT = 20
+
+
+class FakeOptions(object):
+    """替身服务器的配置, 运行中修改立即生效"""
+
+    def __init__(self, img_size=256 * 1024, latency=0.0, img_latency=0.0, rate=0, error_rate=0.0,
+                 error_kinds=("500", "503", "reset"), eps=20, pics=60, record_dir="", upstream="", seed=0):
+        """
+        Args:
+            img_size: 图片大小(字节)
+            latency: API响应延迟(秒)
+            img_latency: 图片首字节延迟(秒)
+            rate: 每个连接的图片发送速度(字节/秒), 0不限
+            error_rate: 注入错误的概率
+            error_kinds: 注入的错误类型, 500/503/429: 返回对应状态码, reset: 发送一半后断开
+            eps: 每本书的章节数
+            pics: 每章的图片数
+            record_dir: 录制文件目录, 有录制时优先回放
+            upstream: 录制模式的上游地址
+            seed: 随机数种子
+        """
+        self.img_size = img_size
+        self.latency = latency
+        self.img_latency = img_latency
+        self.rate = rate
+        self.error_rate = error_rate
+        self.error_kinds = list(error_kinds)
+        self.eps = eps
+        self.pics = pics
+        self.record_dir = record_dir
+        self.upstream = upstream
+        self.random = random.Random(seed)
+
+
+class FakeStats(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.images = 0
+        self.bytes = 0
+        self.errors = 0
+        self.replayed = 0
+        self.connections = 0
+        self.paths = {}
+
+    def add(self, kind, nbytes=0):
+        with self.lock:
+            self.requests += 1
+            self.bytes += nbytes
+            self.paths[kind] = self.paths.get(kind, 0) + 1
+            if kind == "image":
+                self.images += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'images': self.images,
+                'mb': round(self.bytes / 1024 / 1024, 2),
+                'errors': self.errors,
+                'replayed': self.replayed,
+                'connections': self.connections,
+                'paths': dict(self.paths),
+            }
+
+
+def _page_info(docs, total, limit, page):
+    return {"docs": docs, "total": total, "limit": limit, "page": page,
+            "pages": max(1, (total + limit - 1) // limit)}
+
+
+def _thumb(base, name):
+    return {"fileServer": base, "path": "tobeimg/{}.jpg".format(name), "originalName": "{}.jpg".format(name)}
+
+
+def _comic(base, bookId, opts, detail=False):
+    index = int(hashlib.md5(bookId.encode()).hexdigest()[:6], 16)
+    comic = {"_id": bookId, "title": "测试漫画 {}".format(bookId), "author": "作者{}".format(index % 50),
+             "pagesCount": opts.eps * opts.pics, "epsCount": opts.eps, "finished": index % 2 == 0,
+             "categories": ["全彩", "長篇"], "tags": ["tag1", "tag2"], "totalViews": index, "totalLikes": index % 997,
+             "likesCount": index % 997, "thumb": _thumb(base, bookId)}
+    if detail:
+        comic.update({"description": "简介" * 40, "chineseTeam": "汉化组", "updated_at": "2021-01-01T00:00:00.000Z",
+                      "created_at": "2020-01-01T00:00:00.000Z", "allowDownload": True, "allowComment": True,
+                      "viewsCount": index, "commentsCount": 10, "isFavourite": False, "isLiked": False,
+                      "_creator": {"_id": "u1", "name": "上传者", "avatar": _thumb(base, "avatar")}})
+    return comic
+
+
+def _comics_page(base, opts, page, prefix="5d"):
+    total = 500
+    docs = [_comic(base, "{}{:022x}".format(prefix, i), opts)
+            for i in range((page - 1) * COMIC_LIMIT, min(total, page * COMIC_LIMIT))]
+    return {"comics": _page_info(docs, total, COMIC_LIMIT, page)}
+
+
+def synthetic(method, path, query, base, opts):
+    """
+    合成API响应
+
+    Returns:
+        (路径类型, data字典), 不认识的路径返回(None, None)
+    """
+    page = int(query.get("page", ["1"])[0] or 1)
+    m = re.match(r"^/comics/(\w+)/order/(\d+)/pages$", path)
+    if m:
+        bookId, epsId = m.group(1), int(m.group(2))
+        docs = [{"_id": "p{}".format(i), "media": {"fileServer": base, "path": "{}/{}/{}.jpg".format(bookId, epsId, i),
+                                                   "originalName": "{}.jpg".format(i)}}
+                for i in range((page - 1) * PIC_LIMIT, min(opts.pics, page * PIC_LIMIT))]
+        return "order", {"pages": _page_info(docs, opts.pics, PIC_LIMIT, page),
+                         "ep": {"_id": "e{}".format(epsId), "title": "第{}话".format(epsId)}}
+    m = re.match(r"^/comics/(\w+)/eps$", path)
+    if m:
+        docs = [{"_id": "e{}".format(i), "title": "第{}话".format(opts.eps - i), "order": opts.eps - i,
+                 "updated_at": "2021-01-01T00:00:00.000Z"}
+                for i in range((page - 1) * EPS_LIMIT, min(opts.eps, page * EPS_LIMIT))]
+        return "eps", {"eps": _page_info(docs, opts.eps, EPS_LIMIT, page)}
+    m = re.match(r"^/comics/(\w+)/comments$", path)
+    if m:
+        docs = [{"_id": "c{}".format(i), "content": "评论内容" * 10, "isTop": False, "hide": False,
+                 "created_at": "2021-01-01T00:00:00.000Z", "likesCount": i, "commentsCount": 0, "isLiked": False,
+                 "_user": {"_id": "u{}".format(i), "name": "用户{}".format(i), "gender": "m", "level": 1,
+                           "avatar": _thumb(base, "u{}".format(i))}}
+                for i in range((page - 1) * COMMENT_LIMIT, page * COMMENT_LIMIT)]
+        return "comments", {"comments": _page_info(docs, 200, COMMENT_LIMIT, page)}
+    m = re.match(r"^/comics/(\w+)/recommendation$", path)
+    if m:
+        return "recommendation", {"comics": [_comic(base, "5e{:022x}".format(i), opts) for i in range(8)]}
+    m = re.match(r"^/comics/(\w+)/(favourite|like)$", path)
+    if m:
+        return m.group(2), {"action": "favourite" if m.group(2) == "favourite" else "like"}
+    if path in ("/comics", "/comics/advanced-search"):
+        return "search", _comics_page(base, opts, page)
+    if path == "/comics/leaderboard":
+        return "rank", {"comics": [_comic(base, "5f{:022x}".format(i), opts) for i in range(40)]}
+    if path == "/comics/random":
+        return "random", {"comics": [_comic(base, "60{:022x}".format(i), opts) for i in range(20)]}
+    m = re.match(r"^/comics/(\w+)$", path)
+    if m:
+        return "comic", {"comic": _comic(base, m.group(1), opts, detail=True)}
+    if path == "/categories":
+        return "categories", {"categories": [{"title": "分类{}".format(i), "thumb": _thumb(base, "c{}".format(i))}
+                                             for i in range(30)]}
+    if path == "/keywords":
+        return "keywords", {"keywords": ["关键词{}".format(i) for i in range(20)]}
+    if path == "/users/favourite":
+        return "favourite_list", _comics_page(base, opts, page, "61")
+    if path == "/users/profile":
+        return "profile", {"user": {"_id": "u0", "name": "bench", "level": 1, "exp": 0, "isPunched": True,
+                                    "avatar": _thumb(base, "u0")}}
+    if path == "/auth/sign-in":
+        return "login", {"token": "fake-token"}
+    if path == "/users/punch-in":
+        return "punch", {"res": {"status": "ok"}}
+    if path.startswith("/init"):
+        return "init", {"status": "ok", "addresses": ["127.0.0.1"], "imageServer": base}
+    return None, None
+
+
+class FakeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakePica/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    @property
+    def opts(self) -> FakeOptions:
+        return self.server.opts
+
+    @property
+    def base(self):
+        host = self.headers.get("Host") or "{}:{}".format(*self.server.server_address[:2])
+        return "http://{}".format(host)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_bytes(self, status, body, contentType="application/json; charset=UTF-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_error(self, body_size):
+        """按error_rate注入错误, 返回True表示已经处理"""
+        opts = self.opts
+        if not opts.error_rate or opts.random.random() >= opts.error_rate:
+            return False
+        kind = opts.random.choice(opts.error_kinds)
+        with self.server.stats.lock:
+            self.server.stats.errors += 1
+        if kind == "reset":
+            # 声明完整长度, 只发送一半后断开
+            self.send_response(200)
+            self.send_header("Content-Length", str(body_size))
+            self.end_headers()
+            self.wfile.write(b"\0" * (body_size // 2))
+            self.wfile.flush()
+            self.close_connection = True
+            return True
+        status = int(kind)
+        body = json.dumps({"code": status, "error": "fake", "message": "injected error"}).encode()
+        self.send_bytes(status, body, headers={"Retry-After": "1"} if status == 429 else None)
+        return True
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        reqBody = self.read_body()
+        if url.path.startswith("/static/"):
+            return self.send_image(url.path)
+
+        time.sleep(self.opts.latency)
+        if self.opts.record_dir:
+            recorded = self.replay_or_record(method, url, reqBody)
+            if recorded:
+                return
+        kind, data = synthetic(method, url.path, query, self.base, self.opts)
+        if kind is None:
+            self.server.stats.add("not_found")
+            return self.send_bytes(404, json.dumps({"code": 404, "message": "not found"}).encode())
+        body = json.dumps({"code": 200, "message": "success", "data": data}, ensure_ascii=False).encode()
+        if self.inject_error(len(body)):
+            return
+        self.server.stats.add(kind, len(body))
+        self.send_bytes(200, body)
+
+    def record_path(self, method, url, reqBody):
+        key = "{} {}?{}".format(method, url.path, "&".join(sorted(url.query.split("&"))))
+        if method != "GET":
+            key += " " + hashlib.sha1(reqBody).hexdigest()
+        return os.path.join(self.opts.record_dir, hashlib.sha1(key.encode()).hexdigest() + ".json"), key
+
+    def replay_or_record(self, method, url, reqBody):
+        path, key = self.record_path(method, url, reqBody)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            body = record["body"].encode("utf-8")
+            if self.inject_error(len(body)):
+                return True
+            with self.server.stats.lock:
+                self.server.stats.replayed += 1
+            self.server.stats.add("replay", len(body))
+            self.send_bytes(record["status"], body, record.get("contentType", "application/json; charset=UTF-8"))
+            return True
+        if not self.opts.upstream:
+            return False
+
+        import httpx
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "content-length", "connection")}
+        r = httpx.request(method, self.opts.upstream.rstrip("/") + self.path, headers=headers, content=reqBody,
+                          timeout=30)
+        os.makedirs(self.opts.record_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "status": r.status_code, "contentType": r.headers.get("Content-Type", ""),
+                       "body": r.text}, f, ensure_ascii=False)
+        self.server.stats.add("record", len(r.content))
+        self.send_bytes(r.status_code, r.content, r.headers.get("Content-Type", "application/json"))
+        return True
+
+    def send_image(self, path):
+        opts = self.opts
+        time.sleep(opts.img_latency)
+        size = opts.img_size
+        if self.inject_error(size):
+            return
+        # 内容由路径决定, 同一张图每次相同, 支持Range续传
+        seed = hashlib.md5(path.encode()).digest()
+        body = (seed * (size // len(seed) + 1))[:size]
+        start = 0
+        rangeHeader = self.headers.get("Range", "")
+        m = re.match(r"bytes=(\d+)-", rangeHeader)
+        etag = '"{}"'.format(hashlib.md5(seed + str(size).encode()).hexdigest())
+        if m and int(m.group(1)) < size and self.headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        chunk = 64 * 1024
+        pos = start
+        tick = time.monotonic()
+        while pos < size:
+            self.wfile.write(body[pos:pos + chunk])
+            pos += chunk
+            if opts.rate:
+                wait = (pos - start) / opts.rate - (time.monotonic() - tick)
+                if wait > 0:
+                    time.sleep(wait)
+        self.server.stats.add("image", size - start)
+
+
+class FakeServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), opts=None):
+        super().__init__(address, FakeHandler)
+        self.opts = opts or FakeOptions()
+        self.stats = FakeStats()
+        self.thread = None
+
+    @property
+    def url(self):
+        return "http://{}:{}/".format(*self.server_address[:2])
+
+    def start(self):
+        """在后台线程中运行"""
+        self.thread = threading.Thread(target=self.serve_forever, name="FakeServer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线HTTP替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--img-size", type=int, default=256 * 1024, help="图片大小(字节)")
+    parser.add_argument("--latency", type=float, default=0.0, help="API延迟(秒)")
+    parser.add_argument("--img-latency", type=float, default=0.0, help="图片首字节延迟(秒)")
+    parser.add_argument("--rate", type=int, default=0, help="每个连接的图片速度(字节/秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--error-kinds", default="500,503,reset", help="500/503/429/reset")
+    parser.add_argument("--eps", type=int, default=20, help="每本书的章节数")
+    parser.add_argument("--pics", type=int, default=60, help="每章的图片数")
+    parser.add_argument("--record-dir", default="", help="录制文件目录")
+    parser.add_argument("--upstream", default="", help="录制模式的上游API地址")
+    args = parser.parse_args()
+
+    opts = FakeOptions(args.img_size, args.latency, args.img_latency, args.rate, args.error_rate,
+                       args.error_kinds.split(","), args.eps, args.pics, args.record_dir, args.upstream)
+    server = FakeServer((args.host, args.port), opts)
+    print("FakeServer listening on {}".format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
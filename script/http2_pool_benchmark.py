@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP/2连接池基准测试
+在本机起一个TLS+HTTP/2服务器(可选再经过一个HTTP CONNECT代理), 对比:
+    before: 普通请求和下载各一个 httpx.AsyncClient(http2=True), 整个Client共用连接数上限
+    after:  一个 AsyncClient + Http2PoolTransport, 按域名共享连接
+每轮同时发出一批阅读页图片和API请求, 统计服务器收到的TLS握手数、代理建立的隧道数和每页延迟
+
+需要openssl命令生成临时的自签名证书
+
+用法:
+    python script/http2_pool_benchmark.py
+    python script/http2_pool_benchmark.py --proxy --rounds 5 --pages 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import httpx
+
+from tools.http2_pool import Http2PoolTransport
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def make_cert(path):
+    """生成临时自签名证书"""
+    cert = os.path.join(path, "cert.pem")
+    key = os.path.join(path, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=localhost"], check=True, capture_output=True)
+    return cert, key
+
+
+class H2Protocol(asyncio.Protocol):
+    """最简单的HTTP/2服务器: /img/* 返回img_size字节, 其他路径返回一段json"""
+
+    def __init__(self, server):
+        self.server = server
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False,
+                                                                         header_encoding="utf-8"))
+        self.transport = None
+        self.windows = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.handshakes += 1
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.transport.close()
+            return
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.ensure_future(self.respond(event.stream_id, dict(event.headers)))
+            elif isinstance(event, (h2.events.WindowUpdated, h2.events.StreamReset)):
+                for waiter in list(self.windows.values()):
+                    waiter.set()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        for waiter in list(self.windows.values()):
+            waiter.set()
+
+    async def respond(self, streamId, headers):
+        path = headers.get(":path", "/")
+        isImg = path.startswith("/img/")
+        await asyncio.sleep(self.server.img_latency if isImg else self.server.latency)
+        body = b"\xff" * self.server.img_size if isImg else b'{"code": 200, "message": "success", "data": {}}'
+        self.server.requests += 1
+        try:
+            self.conn.send_headers(streamId, [(":status", "200"), ("content-length", str(len(body))),
+                                              ("content-type", "image/jpeg" if isImg else "application/json")])
+            while body:
+                window = self.conn.local_flow_control_window(streamId)
+                if window <= 0:
+                    # 等客户端的WINDOW_UPDATE
+                    waiter = self.windows.setdefault(streamId, asyncio.Event())
+                    waiter.clear()
+                    self.transport.write(self.conn.data_to_send())
+                    await waiter.wait()
+                    if self.transport.is_closing():
+                        return
+                    continue
+                size = min(window, len(body), self.conn.max_outbound_frame_size)
+                self.conn.send_data(streamId, body[:size], end_stream=size == len(body))
+                body = body[size:]
+                self.transport.write(self.conn.data_to_send())
+        except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            self.windows.pop(streamId, None)
+        self.transport.write(self.conn.data_to_send())
+
+
+class H2Server(object):
+    def __init__(self, cert, key, args):
+        self.context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.context.load_cert_chain(cert, key)
+        self.context.set_alpn_protocols(["h2"])
+        self.latency = args.latency
+        self.img_latency = args.img_latency
+        self.img_size = args.img_size
+        self.handshakes = 0
+        self.requests = 0
+        self.server = None
+        self.port = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: H2Protocol(self), "127.0.0.1", 0, ssl=self.context)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        self.server.close()
+
+
+class ConnectProxy(object):
+    """HTTP CONNECT代理, 统计建立的隧道数"""
+
+    def __init__(self):
+        self.tunnels = 0
+        self.server = None
+        self.port = 0
+        self.tasks = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            await self.tunnel(reader, writer)
+        finally:
+            self.tasks.discard(task)
+
+    async def tunnel(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            host, port = head.split(b" ")[1].decode().rsplit(":", 1)
+            remoteReader, remoteWriter = await asyncio.open_connection(host, int(port))
+        except Exception:
+            writer.close()
+            return
+        self.tunnels += 1
+        writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        await writer.drain()
+
+        async def pipe(src, dst):
+            try:
+                while True:
+                    data = await src.read(65536)
+                    if not data:
+                        break
+                    dst.write(data)
+                    await dst.drain()
+            except Exception:
+                pass
+            finally:
+                dst.close()
+        await asyncio.gather(pipe(reader, remoteWriter), pipe(remoteReader, writer))
+
+    async def stop(self):
+        self.server.close()
+        # 等隧道都关闭, 避免退出时取消还在转发的任务
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=5)
+
+
+def before_clients(proxy):
+    """改动前: 普通请求和下载各一个Client"""
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+    api = httpx.AsyncClient(http2=True, verify=False, trust_env=False, proxy=proxy, limits=limits)
+    download = httpx.AsyncClient(http2=True, verify=False, trust_env=False, proxy=proxy, limits=limits)
+    return api, download
+
+
+def after_clients(proxy):
+    """改动后: 一个Client按域名共享连接"""
+    client = httpx.AsyncClient(trust_env=False, transport=Http2PoolTransport(proxy))
+    return client, client
+
+
+async def run_case(name, makeClients, args, server, proxy):
+    proxyUrl = "http://127.0.0.1:{}".format(proxy.port) if proxy else None
+    url = "https://127.0.0.1:{}".format(server.port)
+    api, download = makeClients(proxyUrl)
+    handshakes, tunnels = server.handshakes, proxy.tunnels if proxy else 0
+    pageLatencies, apiLatencies = [], []
+
+    async def get(client, path, latencies):
+        start = time.monotonic()
+        r = await client.get(url + path)
+        assert r.status_code == 200 and r.http_version == "HTTP/2"
+        latencies.append(time.monotonic() - start)
+
+    start = time.monotonic()
+    for i in range(args.rounds):
+        # 打开阅读页: 同时请求章节信息和一批图片
+        tasks = [get(api, "/api/{}".format(j), apiLatencies) for j in range(args.apis)]
+        tasks += [get(download, "/img/{}/{}".format(i, j), pageLatencies) for j in range(args.pages)]
+        await asyncio.gather(*tasks)
+    cost = time.monotonic() - start
+
+    await api.aclose()
+    if download is not api:
+        await download.aclose()
+    item = {
+        'case': name,
+        'proxy': bool(proxy),
+        'handshakes': server.handshakes - handshakes,
+        'tunnels': (proxy.tunnels - tunnels) if proxy else 0,
+        'pages': len(pageLatencies),
+        'sec': round(cost, 3),
+        'page_p50_ms': round(percentile(pageLatencies, 0.5) * 1000, 1),
+        'page_p99_ms': round(percentile(pageLatencies, 0.99) * 1000, 1),
+        'api_p50_ms': round(percentile(apiLatencies, 0.5) * 1000, 1),
+        'mb_s': round(len(pageLatencies) * args.img_size / 1024 / 1024 / cost, 2),
+    }
+    if isinstance(download._transport, Http2PoolTransport):
+        item['pool'] = download._transport.get_stats()
+    return item
+
+
+async def run(args):
+    path = tempfile.mkdtemp(prefix="pica_h2_")
+    try:
+        cert, key = make_cert(path)
+        server = H2Server(cert, key, args)
+        await server.start()
+        proxy = None
+        if args.proxy:
+            proxy = ConnectProxy()
+            await proxy.start()
+
+        results = []
+        for name, makeClients in [("before", before_clients), ("after", after_clients)]:
+            item = await run_case(name, makeClients, args, server, proxy)
+            results.append(item)
+            print(f"  ✓ {name:>6}: handshakes {item['handshakes']:>4}, tunnels {item['tunnels']:>4}, "
+                  f"page p50 {item['page_p50_ms']:>7.1f}ms, p99 {item['page_p99_ms']:>7.1f}ms, "
+                  f"api p50 {item['api_p50_ms']:>6.1f}ms, {item['mb_s']:>6.2f} MB/s")
+        server.stop()
+        if proxy:
+            await proxy.stop()
+        return results
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/2连接池基准测试")
+    parser.add_argument("--proxy", action="store_true", help="经过HTTP CONNECT代理")
+    parser.add_argument("--rounds", type=int, default=3, help="打开阅读页的次数")
+    parser.add_argument("--pages", type=int, default=40, help="每轮同时请求的图片数")
+    parser.add_argument("--apis", type=int, default=5, help="每轮同时请求的API数")
+    parser.add_argument("--img-size", type=int, default=128 * 1024, help="图片大小(字节)")
+    parser.add_argument("--latency", type=float, default=0.02, help="API延迟(秒)")
+    parser.add_argument("--img-latency", type=float, default=0.02, help="图片首字节延迟(秒)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("HTTP/2连接池基准测试" + (", 经过CONNECT代理" if args.proxy else ""))
+    print("=" * 60)
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
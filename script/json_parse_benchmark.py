@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应解析基准测试
+对比 旧BaseRes(text + json.loads + setattr) 与 延迟解析的BaseRes 处理大列表响应的耗时
+"""
+
+import sys
+import os
+import time
+import json
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import httpx
+
+from server.res import BaseRes
+from tools.tool import HAS_ORJSON
+
+ROUNDS = 200
+
+
+class OldBaseRes(object):
+    """改动前的BaseRes, 构造时就解析"""
+
+    def __init__(self, data, isParseRes, reqName):
+        self.reqName = reqName
+        self.raw = data
+        self.data = {}
+        self.code = 0
+        self.message = ""
+        self.reqBak = None
+        self.isParseRes = isParseRes
+        if isParseRes:
+            for k, v in json.loads(self.raw.text).items():
+                setattr(self, k, v)
+
+
+def make_comics(num):
+    """构造一页漫画列表"""
+    docs = [{"_id": "5d{:022x}".format(i), "title": "测试漫画标题 {}".format(i), "author": "作者{}".format(i % 50),
+             "pagesCount": i % 300 + 10, "epsCount": i % 30 + 1, "finished": i % 2 == 0,
+             "categories": ["全彩", "長篇", "純愛"], "tags": ["tag1", "tag2", "tag3"],
+             "totalViews": i * 37, "totalLikes": i * 3, "likesCount": i * 3,
+             "thumb": {"fileServer": "https://storage1.picacomic.com", "path": "tobeimg/{}.jpg".format(i),
+                       "originalName": "{}.jpg".format(i)}} for i in range(num)]
+    return {"code": 200, "message": "success",
+            "data": {"comics": {"docs": docs, "total": num, "limit": num, "page": 1, "pages": 1}}}
+
+
+def make_comments(num):
+    """构造一页评论"""
+    docs = [{"_id": "5e{:022x}".format(i), "content": "评论内容" * 20, "_comic": "5d{:022x}".format(i),
+             "isTop": False, "hide": False, "created_at": "2021-01-01T00:00:00.000Z", "likesCount": i,
+             "commentsCount": i % 5, "isLiked": False,
+             "_user": {"_id": "5f{:022x}".format(i), "gender": "m", "name": "用户{}".format(i),
+                       "title": "萌新", "verified": False, "exp": i * 10, "level": i % 10, "characters": [],
+                       "avatar": {"fileServer": "https://storage1.picacomic.com",
+                                  "path": "avatar/{}.jpg".format(i), "originalName": "avatar.jpg"}}}
+            for i in range(num)]
+    return {"code": 200, "message": "success",
+            "data": {"comments": {"docs": docs, "total": num, "limit": num, "page": "1", "pages": 1}}}
+
+
+def run(cls, body, access):
+    """每轮新建Response, 避免httpx缓存的text影响结果"""
+    content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    request = httpx.Request("GET", "https://example.com/")
+    cost = 0
+    for _ in range(ROUNDS):
+        r = httpx.Response(200, content=content, request=request)
+        start = time.perf_counter()
+        res = cls(r, True, "Req")
+        if access == "code":
+            res.code
+        else:
+            res.code, res.message, res.data
+        cost += time.perf_counter() - start
+    return cost / ROUNDS, len(content)
+
+
+def main():
+    print("=" * 60)
+    print("响应解析基准测试, orjson:{}".format(HAS_ORJSON))
+    print("=" * 60)
+    results = []
+    for caseName, body in [("comics_1000", make_comics(1000)), ("comments_500", make_comments(500))]:
+        for access in ["code", "all"]:
+            before, size = run(OldBaseRes, body, access)
+            after, _ = run(BaseRes, body, access)
+            item = {"case": caseName, "access": access, "bytes": size, "orjson": HAS_ORJSON,
+                    "before_us": round(before * 1e6, 1), "after_us": round(after * 1e6, 1),
+                    "speedup": round(before / after, 2)}
+            results.append(item)
+            print(f"  ✓ {caseName:>12} {access:>4}: before {item['before_us']:>8.1f}us, "
+                  f"after {item['after_us']:>8.1f}us, x{item['speedup']}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志基准测试
+对比 改动前(调用方先format再同步写文件) 与 延迟格式化+后台写入 的单次调用耗时
+"""
+
+import sys
+import os
+import time
+import json
+import logging
+import shutil
+import tempfile
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config.setting import Setting
+from server.req import ServerReq
+from tools.log import Log
+
+ROUNDS = 20000
+
+
+def make_req():
+    req = ServerReq("https://picaapi.picacomic.com/comics?page=1&c=%E5%85%A8%E5%BD%A9&s=dd",
+                    params={"page": 1, "c": "全彩", "s": "dd", "keyword": "x" * 50})
+    return req
+
+
+def run_before(level, path):
+    """改动前: 调用方format, FileHandler在当前线程写入"""
+    logger = logging.getLogger("before")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    fh = logging.FileHandler(os.path.join(path, "before.log"), encoding="utf-8")
+    fh.setLevel(level)
+    fh.setFormatter(Log.formatter)
+    logger.addHandler(fh)
+    req = make_req()
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        logger.debug("request-> backId:{}, {}".format(i, req))
+    cost = time.perf_counter() - start
+    logger.removeHandler(fh)
+    fh.close()
+    return cost / ROUNDS
+
+
+def run_after(index):
+    """改动后: 参数延迟格式化, 记录放进队列"""
+    Setting.LogIndex._value = index
+    Log.UpdateLoggingLevel()
+    req = make_req()
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        Log.Debug("request-> backId:{}, {}", i, req)
+    cost = time.perf_counter() - start
+    return cost / ROUNDS
+
+
+def main():
+    print("=" * 60)
+    print("日志基准测试")
+    print("=" * 60)
+    path = tempfile.mkdtemp()
+    Setting.LogDirPath._value = path
+    Log.Init()
+    Log.listener.handlers = (Log.fh,)
+    results = []
+    for name, index, level in [("debug_disabled", 0, logging.WARN), ("debug_enabled", 2, logging.DEBUG)]:
+        item = {"case": name, "rounds": ROUNDS,
+                "before_us": round(run_before(level, path) * 1e6, 2),
+                "after_us": round(run_after(index) * 1e6, 2)}
+        item["speedup"] = round(item["before_us"] / item["after_us"], 1)
+        results.append(item)
+        print(f"  ✓ {name:>14}: before {item['before_us']:>6.2f}us, after {item['after_us']:>6.2f}us, "
+              f"x{item['speedup']}")
+    Log.Stop()
+    shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
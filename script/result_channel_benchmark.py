@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果传递基准测试
+对比 pickle 与 ResultTable 从工作线程把1000行搜索结果交给UI线程的耗时
+"""
+
+import sys
+import os
+import time
+import json
+import pickle
+import threading
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from PySide6.QtCore import QCoreApplication, QObject, Signal
+
+from server.sql_server import DbBook
+from task.qt_task import ResultTable
+
+ROWS = 1000
+ROUNDS = 200
+
+
+def make_books():
+    """构造1000行数据库搜索结果"""
+    books = []
+    for i in range(ROWS):
+        info = DbBook()
+        info.id = "5d{:022x}".format(i)
+        info.title = "测试漫画标题 {}".format(i)
+        info.title2 = "Test Comic Title {}".format(i)
+        info.author = "作者{}".format(i % 50)
+        info.chineseTeam = "汉化组{}".format(i % 20)
+        info.description = "简介" * 40
+        info.epsCount = i % 30 + 1
+        info.pages = i % 300 + 10
+        info.categories = "全彩,長篇,純愛"
+        info.tags = "tag1,tag2,tag3,tag4"
+        info.path = "tobeimg/{}.jpg".format(info.id)
+        info.fileServer = "https://storage1.picacomic.com"
+        books.append(info)
+    return books
+
+
+def make_search_page():
+    """构造1000条漫画的搜索结果json"""
+    docs = [{"_id": "5d{:022x}".format(i), "title": "测试漫画标题 {}".format(i), "author": "作者",
+             "categories": ["全彩", "長篇"], "tags": ["tag1", "tag2"], "likesCount": i,
+             "thumb": {"fileServer": "https://storage1.picacomic.com", "path": "tobeimg/{}.jpg".format(i),
+                       "originalName": "{}.jpg".format(i)}} for i in range(ROWS)]
+    text = json.dumps({"code": 200, "message": "success", "data": {"comics": {"docs": docs, "total": ROWS,
+                                                                              "limit": ROWS, "page": 1, "pages": 1}}})
+    return {"st": 1001, "data": text}
+
+
+class Channel(QObject):
+    pickleBack = Signal(int, bytes)
+    tableBack = Signal(int)
+
+
+def run_signal(app, channel, name, data):
+    """工作线程发出ROUNDS次结果, UI线程全部取出后停止计时"""
+    table = ResultTable()
+    received = []
+
+    def on_pickle(taskId, raw):
+        received.append(pickle.loads(raw))
+
+    def on_table(taskId):
+        received.append(table.Pop(taskId))
+
+    def worker():
+        for i in range(ROUNDS):
+            if name == "before":
+                channel.pickleBack.emit(i, pickle.dumps(data))
+            else:
+                table.Put(i, data)
+                channel.tableBack.emit(i)
+
+    signal, slot = (channel.pickleBack, on_pickle) if name == "before" else (channel.tableBack, on_table)
+    signal.connect(slot)
+    start = time.perf_counter()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while len(received) < ROUNDS:
+        app.processEvents()
+    cost = time.perf_counter() - start
+    thread.join()
+    signal.disconnect(slot)
+    return cost / ROUNDS
+
+
+def main():
+    print("=" * 60)
+    print("结果传递基准测试")
+    print("=" * 60)
+    app = QCoreApplication(sys.argv)
+    channel = Channel()
+    results = []
+    for caseName, data in [("sql_books", make_books()), ("search_page", make_search_page())]:
+        item = {"case": caseName, "rows": ROWS, "pickle_bytes": len(pickle.dumps(data))}
+        for name in ["before", "after"]:
+            item[name + "_us"] = round(run_signal(app, channel, name, data) * 1e6, 1)
+        item["speedup"] = round(item["before_us"] / item["after_us"], 1)
+        results.append(item)
+        print(f"  ✓ {caseName:>11}: before {item['before_us']:>8.1f}us, after {item['after_us']:>6.1f}us, "
+              f"x{item['speedup']}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
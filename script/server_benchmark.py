@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server吞吐基准测试
+在离线替身服务器(fake_server.py)上测量 Server/TaskHttp/TaskDownload 的
+请求数/秒、p50/p99延迟和MB/s, 输出json, 用来对比不同版本
+
+用法:
+    python script/server_benchmark.py --out before.json
+    python script/server_benchmark.py --out after.json --img-latency 0.03 --error-rate 0.01
+    python script/server_benchmark.py --compare before.json after.json
+    python script/server_benchmark.py --cases manager --page-window 1
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_server import FakeServer, FakeOptions
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summary(name, latencies, cost, nbytes=0, errors=0):
+    """汇总一个场景的结果, 延迟单位毫秒"""
+    return {
+        'case': name,
+        'count': len(latencies),
+        'errors': errors,
+        'sec': round(cost, 3),
+        'rps': round(len(latencies) / cost, 1) if cost else 0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'mb_s': round(nbytes / 1024 / 1024 / cost, 2) if cost else 0,
+    }
+
+
+class Bench(object):
+    def __init__(self, app, args):
+        from task.qt_task import QtTaskBase
+
+        class Owner(QtTaskBase):
+            pass
+
+        self.app = app
+        self.args = args
+        self.owner = Owner()
+        self.timeout = args.timeout
+
+    def wait(self, isDone):
+        start = time.monotonic()
+        while not isDone() and time.monotonic() - start < self.timeout:
+            self.app.processEvents()
+            time.sleep(0.001)
+        if not isDone():
+            print("  ! timeout")
+
+    def run_api(self, bookIds):
+        """并发API请求: 书籍详情、分类列表和评论"""
+        from server import req
+        from tools.status import Status
+        reqs = []
+        for bookId in bookIds:
+            reqs.append(req.GetComicsBookReq(bookId))
+        for page in range(1, self.args.api_pages + 1):
+            reqs.append(req.CategoriesSearchReq(page, "全彩", "dd"))
+            reqs.append(req.GetCommentsReq(bookIds[0], page))
+
+        latencies, errors = [], [0]
+        starts = {}
+
+        def back(raw, index):
+            latencies.append(time.monotonic() - starts[index])
+            if raw["st"] != Status.Ok:
+                errors[0] += 1
+
+        start = time.monotonic()
+        for index, request in enumerate(reqs):
+            starts[index] = time.monotonic()
+            self.owner.AddHttpTask(request, back, index)
+        self.wait(lambda: len(latencies) >= len(reqs))
+        return summary("api", latencies, time.monotonic() - start, errors=errors[0])
+
+    def download_pages(self, name, bookId, pages, priority, saveDir="", isNeedData=True):
+        """
+        通过TaskDownload下载章节图片
+
+        Args:
+            pages: [(epsId, index)]
+        """
+        from tools.status import Status
+        latencies, nbytes, errors = [], [0], [0]
+        starts = {}
+
+        def complete(data, st, key):
+            latencies.append(time.monotonic() - starts[key])
+            if st != Status.Ok:
+                errors[0] += 1
+            nbytes[0] += len(data) if data else self.args.img_size
+
+        start = time.monotonic()
+        for epsId, index in pages:
+            key = (epsId, index)
+            starts[key] = time.monotonic()
+            savePath = os.path.join(saveDir, str(epsId), "{}.jpg".format(index)) if saveDir else ""
+            p = priority(index) if callable(priority) else priority
+            self.owner.AddDownloadBook(bookId, epsId, index, completeCallBack=complete, backParam=key,
+                                       savePath=savePath, isNeedData=isNeedData, priority=p)
+        self.wait(lambda: len(latencies) >= len(pages))
+        return summary(name, latencies, time.monotonic() - start, nbytes[0], errors[0])
+
+    def run_reader(self, bookId):
+        """阅读器翻页: 当前页Visible, 后面的页Preload"""
+        from tools.download_queue import DownloadPriority
+        pages = [(0, i) for i in range(self.args.pics)]
+        return self.download_pages("reader", bookId, pages,
+                                   lambda i: DownloadPriority.Visible if i < 2 else DownloadPriority.Preload)
+
+    def run_book(self, bookId, saveDir):
+        """下载整本书到文件"""
+        from tools.download_queue import DownloadPriority
+        pages = [(epsId, i) for epsId in range(self.args.eps) for i in range(self.args.pics)]
+        return self.download_pages("book", bookId, pages, DownloadPriority.Background, saveDir, isNeedData=False)
+
+
+    def load_book(self, bookId):
+        """先加载书籍详情, 新的配置目录里没有书籍缓存"""
+        from server import req
+        done = []
+        self.owner.AddHttpTask(req.GetComicsBookReq(bookId), lambda raw: done.append(raw))
+        self.wait(lambda: done)
+
+    def run_manager(self, bookId, saveDir):
+        """下载管理器下载整本书, 每本书同时下载config.DownloadPageWindow页"""
+        from config.setting import Setting
+        from view.download.download_item import DownloadItem
+        from view.download.download_status import DownloadStatus
+        Setting.SavePath._value = saveDir
+        status = DownloadStatus()
+        task = DownloadItem()
+        task.bookId = bookId
+        task.epsIds = list(range(self.args.eps))
+        task.status = task.Waiting
+        status.downloadDict[bookId] = task
+        self.load_book(bookId)
+
+        start = time.monotonic()
+        status.StartItemDownload(task)
+        self.wait(lambda: task.status in (task.Success, task.Error))
+        item = summary("manager", [], time.monotonic() - start, task.downloadLen,
+                       0 if task.status == task.Success else 1)
+        item['count'] = self.args.eps * self.args.pics
+        item['rps'] = round(item['count'] / item['sec'], 1)
+        return item
+
+
+def run(args):
+    home = tempfile.mkdtemp(prefix="pica_bench_")
+    # 配置和数据库写到临时目录, 不影响本机的设置
+    os.environ["HOME"] = home
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    opts = FakeOptions(args.img_size, args.latency, args.img_latency, args.rate, args.error_rate,
+                       args.error_kinds.split(","), args.eps, args.pics)
+    fake = FakeServer(("127.0.0.1", 0), opts).start()
+
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication(sys.argv)
+
+    from config import config
+    from config.setting import Setting
+    config.Url = fake.url
+    config.IsUseApiCache = False
+    config.IsAutoEndpoint = False
+    config.DownloadPageWindow = args.page_window
+    os.makedirs(os.path.join(Setting.GetConfigPath(), "db"), exist_ok=True)
+
+    import server.user_handler
+    from task.task_http import TaskHttp
+    from task.task_download import TaskDownload
+    TaskHttp()
+    TaskDownload()
+
+    bench = Bench(app, args)
+    bookIds = ["5d{:022x}".format(i) for i in range(args.books)]
+    results = []
+    print("=" * 60)
+    print("Server吞吐基准测试, {}".format(fake.url))
+    print("=" * 60)
+    cases = [("api", lambda: bench.run_api(bookIds)),
+             ("reader", lambda: bench.run_reader(bookIds[0])),
+             ("book", lambda: bench.run_book(bookIds[1 % len(bookIds)], os.path.join(home, "book"))),
+             ("manager", lambda: bench.run_manager(bookIds[2 % len(bookIds)], os.path.join(home, "manager")))]
+    for name, func in cases:
+        if args.cases and name not in args.cases:
+            continue
+        item = func()
+        results.append(item)
+        print(f"  ✓ {name:>6}: {item['count']:>5} req, {item['rps']:>8.1f} req/s, p50 {item['p50_ms']:>7.1f}ms, "
+              f"p99 {item['p99_ms']:>7.1f}ms, {item['mb_s']:>7.2f} MB/s, errors {item['errors']}")
+
+    from tools.performance_monitor import get_performance_monitor
+    report = {
+        'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'options': {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        'results': results,
+        'fake_server': fake.stats.to_dict(),
+        'providers': {name: func() for name, func in get_performance_monitor().providers.items()},
+    }
+    fake.stop()
+    shutil.rmtree(home, ignore_errors=True)
+    return report
+
+
+def compare(before, after):
+    """对比两次结果"""
+    with open(before, encoding="utf-8") as f:
+        a = {item["case"]: item for item in json.load(f)["results"]}
+    with open(after, encoding="utf-8") as f:
+        b = {item["case"]: item for item in json.load(f)["results"]}
+    rows = []
+    for case in a:
+        if case not in b:
+            continue
+        row = {"case": case}
+        for key in ("rps", "p50_ms", "p99_ms", "mb_s"):
+            row[key] = {"before": a[case][key], "after": b[case][key],
+                        "ratio": round(b[case][key] / a[case][key], 2) if a[case][key] else None}
+        rows.append(row)
+        print(f"  {case:>6}: rps x{row['rps']['ratio']}, p50 x{row['p50_ms']['ratio']}, "
+              f"p99 x{row['p99_ms']['ratio']}, MB/s x{row['mb_s']['ratio']}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server吞吐基准测试")
+    parser.add_argument("--cases", nargs="*", default=[], help="api reader book manager, 默认全部")
+    parser.add_argument("--books", type=int, default=20, help="api场景请求的书籍数")
+    parser.add_argument("--api-pages", type=int, default=20, help="api场景请求的列表页数")
+    parser.add_argument("--eps", type=int, default=3, help="每本书的章节数")
+    parser.add_argument("--pics", type=int, default=60, help="每章的图片数")
+    parser.add_argument("--page-window", type=int, default=4, help="下载管理器每本书同时下载的页数")
+    parser.add_argument("--img-size", type=int, default=256 * 1024, help="图片大小(字节)")
+    parser.add_argument("--latency", type=float, default=0.02, help="API延迟(秒)")
+    parser.add_argument("--img-latency", type=float, default=0.02, help="图片首字节延迟(秒)")
+    parser.add_argument("--rate", type=int, default=0, help="每个连接的图片速度(字节/秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--error-kinds", default="500,503,reset")
+    parser.add_argument("--timeout", type=float, default=120, help="每个场景的超时(秒)")
+    parser.add_argument("--out", default="", help="结果保存的json文件")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="对比两次的json结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(json.dumps(report["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,16 +15,47 @@ Uuid = "defaultUuid"
 ProjectName = "PicACG"
 ThreadNum = 5                 # 线程
 DownloadThreadNum = 5          # 下载线程
+DownloadPageWindow = 4         # 下载管理器中每本书同时下载的页数
+DownloadDbFlushMs = 500        # 下载记录每隔多少毫秒批量写入数据库
+DownloadJournalCompactNum = 5000  # 已完成页日志追加多少条后压缩
+ApiConcurrentNum = 100         # 异步引擎同时进行的请求数
+DownloadConcurrentNum = 100    # 异步引擎同时进行的下载数
 ResetDownloadCnt = 5           # 下载图片重试次数
 ResetDownloadCntDefault = 2           # 下载封面重试次数
+DownloadChunkSize = 64 * 1024  # 下载分块大小
+DownloadAgingSec = 5           # 下载排队每等待多少秒提升一个优先级
+DownloadReserveNum = 4         # 只给阅读页使用的下载并发数
+HostLimitInit = 6              # 每个域名的初始并发数, 之后根据延迟和错误自动调整
+HostLimitMin = 1               # 每个域名的最小并发数
+HostLimitMax = 64              # 每个域名的最大并发数
+HttpMaxConnections = 16        # 每个域名最多的连接数, HTTP/2时一般只用一条
+HttpMaxStreams = 100           # 每个域名HTTP/2连接上同时进行的请求数
+HttpKeepAlive = 30             # 空闲连接保留时间(秒)
+DownloadBackgroundShare = 0.3  # 阅读或浏览时, 后台下载可用带宽的比例
+DownloadBackgroundRate = 0     # 后台下载的最大速度(字节/秒), 0不限速
+DownloadBackgroundMinRate = 64 * 1024  # 阅读或浏览时后台下载的最小速度(字节/秒)
+IsAutoEndpoint = False         # 后台测速并自动选择API和图片线路, 开启后会替换设置中选择的线路
+EndpointProbeInterval = 300    # 线路测速间隔(秒)
+EndpointProbeConcurrency = 3   # 同时进行的线路测速数
+EndpointProbeBytes = 256 * 1024  # 图片线路测速下载的字节数
+DnsCacheTtl = 300              # DNS解析结果缓存时间(秒)
+DnsNegativeTtl = 30            # DNS解析失败缓存时间(秒)
+IsDnsParallel = True           # 同时查询A和AAAA记录
+LogMaxBytes = 10 * 1024 * 1024  # 单个日志文件的最大字节数, 超过后轮转
+LogBackupCount = 5             # 保留的轮转日志文件数
 
 ConvertThreadNum = 3           # 同时转换数量
+EpsLoadConcurrency = 4         # 加载章节列表时同时请求的分页数
+PicPageLoadConcurrency = 4     # 加载章节图片列表时同时请求的分页数
 ChatSavePath = "chat"
 SavePathDir = "commies"        # 下载目录
 ResetCnt = 5                   # 下载重试次数
 
 IsUseCache = True              # 是否使用cache
+IsUseApiCache = True           # 是否缓存API响应(分类、排行、章节等)
 CachePathDir = "cache"         # cache目录
+IsUseBlobStore = False         # 图片按内容只保存一份, 缓存、下载、waifu2x目录下相同的图片硬链接到同一个文件
+BlobStoreDir = "blobs"         # 图片仓库目录, 在保存路径下
 # CacheExpired = 24 * 60 * 60  # cache过期时间24小时
 PreLoading = 10                # 预加载10页
 PreLook = 4                    # 预显示4页
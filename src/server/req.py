@@ -9,10 +9,15 @@ from urllib.parse import quote
 from config import config
 from config.global_config import GlobalConfig
 from config.setting import Setting
+from tools.download_queue import DownloadPriority
 from tools.tool import ToolUtil
 
 
 class ServerReq(object):
+    CacheTtl = 0        # 响应缓存有效期(秒), 0不缓存
+    CacheStale = 0      # 过期后仍先返回旧数据并后台重新验证的时间(秒)
+    CacheByUser = False # 缓存是否按用户区分
+
     def __init__(self, url, header=None, params=None, method="POST") -> None:
         self.resetCnt = 0
         self.isReload = False
@@ -31,6 +36,11 @@ class ServerReq(object):
         self.isUseHttps = True
         self.extend = {}
         self.proxyUrl = ""
+        self.invalidate = []    # 请求成功后需要删除的缓存 [(请求类名, url)]
+        self.cacheUrl = url     # 缓存key使用替换域名和代理前的原始url
+        self.isNoCache = False  # 不读取缓存直接请求, 结果仍会更新缓存
+        self.priority = DownloadPriority.Cover  # 下载队列优先级
+        self.route = ""         # 自动选择的线路名
 
         host = ToolUtil.GetUrlHost(url)
         self.timeout = 5
@@ -73,8 +83,7 @@ class ServerReq(object):
         # headers.update(self.headers)
         # if Setting.LogIndex.value == 1 and "authorization" in headers:
         #     headers["authorization"] = "**********"
-        params = dict()
-        params.update(self.params)
+        params = self.params
         ## 脱敏数据
         # if self.__class__.__name__ in ["LoginReq", "RegisterReq"]:
         #     params = "******"
@@ -223,6 +232,9 @@ class PunchIn(ServerReq):
 
 # 获取目录
 class CategoryReq(ServerReq):
+    CacheTtl = 6 * 3600
+    CacheStale = 30 * 24 * 3600
+
     def __init__(self):
         url = config.Url + "categories"
         method = "GET"
@@ -245,6 +257,7 @@ class FavoritesAdd(ServerReq):
         method = "POST"
         super(self.__class__, self).__init__(url, ToolUtil.GetHeader(url, method),
                                              {}, method)
+        self.invalidate.append((GetComicsBookReq.__name__, config.Url + "comics/{}".format(bookId)))
 
 
 # 添加爱心
@@ -254,6 +267,7 @@ class BookLikeReq(ServerReq):
         method = "POST"
         super(self.__class__, self).__init__(url, ToolUtil.GetHeader(url, method),
                                              {}, method)
+        self.invalidate.append((GetComicsBookReq.__name__, config.Url + "comics/{}".format(bookId)))
 
 
 # 高级搜索
@@ -276,6 +290,9 @@ class CategoriesSearchReq(ServerReq):
 
 # 排行榜
 class RankReq(ServerReq):
+    CacheTtl = 10 * 60
+    CacheStale = 3600
+
     def __init__(self, data):
         url = config.Url + "comics/leaderboard?tt={}&ct=VC".format(data)
         method = "GET"
@@ -284,6 +301,9 @@ class RankReq(ServerReq):
 
 # 骑士榜
 class KnightRankReq(ServerReq):
+    CacheTtl = 10 * 60
+    CacheStale = 3600
+
     def __init__(self):
         url = config.Url + "comics/knight-leaderboard"
         method = "GET"
@@ -292,6 +312,10 @@ class KnightRankReq(ServerReq):
 
 # 获得一本书
 class GetComicsBookReq(ServerReq):
+    # 包含收藏、点赞等用户状态, 过期后必须重新验证
+    CacheTtl = 5 * 60
+    CacheByUser = True
+
     def __init__(self, bookId=""):
         url = config.Url + "comics/{}".format(bookId)
         method = "GET"
@@ -302,6 +326,9 @@ class GetComicsBookReq(ServerReq):
 
 # 获得一本书章节列表
 class GetComicsBookEpsReq(ServerReq):
+    CacheTtl = 30 * 60
+    CacheStale = 7 * 24 * 3600
+
     def __init__(self, bookId="", page="1"):
         url = config.Url + "comics/{}/eps?page={}".format(bookId, page)
         method = "GET"
@@ -312,6 +339,9 @@ class GetComicsBookEpsReq(ServerReq):
 
 # 获得一个章节的图片信息
 class GetComicsBookOrderReq(ServerReq):
+    CacheTtl = 24 * 3600
+    CacheStale = 7 * 24 * 3600
+
     def __init__(self, bookId="", epsId="", page="1"):
         url = config.Url + "comics/{}/order/{}/pages?page={}".format(bookId, epsId, page)
         method = "GET"
@@ -333,17 +363,28 @@ class GetComicsRecommendation(ServerReq):
 
 # 下载图片
 class DownloadBookReq(ServerReq):
-    def __init__(self, url, loadPath="", cachePath="", savePath="", isReload=False, resetCnt=1):
+    def __init__(self, url, loadPath="", cachePath="", savePath="", isReload=False, resetCnt=1, isNeedData=True, priority=DownloadPriority.Cover):
         method = "Download"
         self.url = url
         self.loadPath = loadPath
         self.cachePath = cachePath
         self.savePath = savePath
         self.isReset = False
+        self.isNeedData = isNeedData  # 回调是否需要图片数据, 否则只写入文件
+
+        # 断点续传
+        self.acceptRanges = False   # 服务器是否支持Range
+        self.validator = ""         # ETag/Last-Modified, 用于If-Range
+        self.partialSize = 0        # 上次失败时已下载的字节数
+        self.partialBuffer = None
+        self.partialFile = None
+        self.resumeCnt = 0          # 续传次数
+        self.resumeBytes = 0        # 续传节省的字节数
         super(self.__class__, self).__init__(url, ToolUtil.GetHeader(url, method),
                                              {}, method)
         self.resetCnt = resetCnt
         self.isReload = isReload
+        self.priority = priority
 
 # 获得评论
 class GetCommentsReq(ServerReq):
@@ -539,6 +580,7 @@ class SpeedTestReq(ServerReq):
                                              {}, method)
         self.resetCnt = 1
         self.isReload = False
+        self.priority = DownloadPriority.Visible
 
 
 # 测试Ping
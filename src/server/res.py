@@ -1,5 +1,6 @@
 from config import config
 from config.setting import Setting
+from tools.log import Log
 from tools.tool import ToolUtil
 
 
@@ -8,13 +9,33 @@ class BaseRes(object):
         super().__init__()
         self.reqName = reqName
         self.raw = data
-        self.data = {}
-        self.code = 0
-        self.message = ""
         self.reqBak = None
         self.isParseRes = isParseRes
-        if isParseRes:
-            ToolUtil.ParseFromData(self, self.raw.text)
+        # code、data、message等字段在第一次访问时才解析
+        self._isParsed = False
+
+    def __getattr__(self, name):
+        # 只有实例上找不到的属性才会进来
+        if name.startswith("_") or self._isParsed:
+            raise AttributeError(name)
+        self._Parse()
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _Parse(self):
+        values = {"code": 0, "message": "", "data": {}}
+        content = getattr(self.raw, "content", b"") if self.isParseRes else b""
+        if content:
+            # 直接从bytes解析, 不经过text
+            try:
+                values.update(ToolUtil.LoadJson(content))
+            except Exception as es:
+                Log.Error(es)
+        # 一次性写入, 其他线程不会读到一半的结果
+        values["_isParsed"] = True
+        self.__dict__.update(values)
 
     def __str__(self):
         if Setting.LogIndex.value == 0:
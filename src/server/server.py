@@ -1,8 +1,11 @@
+import asyncio
+import hashlib
+import inspect
 import json
-import pickle
 import socket
 import threading
-from queue import Queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import urllib
 
@@ -12,7 +15,15 @@ from config import config
 from config.global_config import GlobalConfig
 from qt_owner import QtOwner
 from task.qt_task import TaskBase
+from tools.dns_cache import DnsCache
+from tools.download_queue import DownloadQueue, DownloadPriority
+from tools.endpoint_manager import EndpointManager, Route
+from tools.host_limiter import get_host_limiter
+from tools.http2_pool import Http2PoolTransport
 from tools.log import Log
+from tools.performance_monitor import get_performance_monitor
+from tools.response_cache import get_response_cache
+from tools.session_pool import SessionPool
 from tools.singleton import Singleton
 from tools.status import Status
 from tools.tool import ToolUtil
@@ -21,14 +32,16 @@ import httpx
 
 host_table = {}
 _orig_getaddrinfo = socket.getaddrinfo
+dns_cache = DnsCache(_orig_getaddrinfo, config.DnsCacheTtl, config.DnsNegativeTtl)
+dns_cache.parallel = config.IsDnsParallel
 # 如果使用代理，無法使用自定義dns
 def getaddrinfo2(host, port, *args, **kwargs):
     if host in host_table:
         address = host_table[host]
-        Log.Info("dns parse, host:{}->{}".format(host, address))
+        Log.Debug("dns parse, host:{}->{}", host, address)
     else:
         address = host
-    results = _orig_getaddrinfo(address, port, *args, **kwargs)
+    results = dns_cache.resolve(address, port, *args, **kwargs)
     return results
 socket.getaddrinfo = getaddrinfo2
 
@@ -64,59 +77,116 @@ class Server(Singleton):
         self.imageAddress = ""
 
         self.token = ""
-        self._inQueue = Queue()
-        self._downloadQueue = Queue()
+        self._inQueue = None
+        self._downloadQueue = None
         self.threadHandler = 0
         self.threadNum = config.ThreadNum
-        self.downloadNum = config.DownloadThreadNum
-        self.threadSession = []
-        self.downloadSession = []
-
-        for i in range(self.threadNum):
-            self.threadSession.append(self.GetNewClient(None))
-            thread = threading.Thread(target=self.Run, args=[i])
-            thread.setName("HTTP-"+str(i))
-            thread.setDaemon(True)
-            thread.start()
-
-        for i in range(self.downloadNum):
-            self.downloadSession.append(self.GetNewClient(None))
-            thread = threading.Thread(target=self.RunDownload, args=[i])
-            thread.setName("Download-" + str(i))
-            thread.setDaemon(True)
-            thread.start()
-
-    def Run(self, index):
+        self.apiConcurrentNum = config.ApiConcurrentNum
+        self.downloadConcurrentNum = config.DownloadConcurrentNum
+        self.httpTransport = None
+
+        # 所有请求都在一个事件循环里完成, 并发数不再受线程数限制
+        # 代理变更时按代切换Session, 进行中的请求继续使用旧连接
+        self.sessionPool = SessionPool(self.GetNewClient)
+        self.endpointManager = EndpointManager(self.ProbeRoute, self.GetRoutes, self.OnRouteChange,
+                                               config.EndpointProbeInterval, config.EndpointProbeConcurrency)
+
+        # 同步的handler(解析json等)放到线程池中执行, 避免阻塞事件循环
+        self._executor = ThreadPoolExecutor(max_workers=self.threadNum, thread_name_prefix="HTTP")
+        self._loop = asyncio.new_event_loop()
+        self.sessionPool.bind_loop(self._loop)
+        self._loopReady = threading.Event()
+        thread = threading.Thread(target=self._RunLoop)
+        thread.setName("HTTP-Loop")
+        thread.setDaemon(True)
+        thread.start()
+        self._loopReady.wait()
+
+    def _RunLoop(self):
+        asyncio.set_event_loop(self._loop)
+        self._inQueue = asyncio.Queue()
+        self._downloadQueue = DownloadQueue(config.DownloadAgingSec)
+        get_performance_monitor().register_provider("download_queue", self._downloadQueue.get_stats)
+        get_performance_monitor().register_provider("session_pool", self.sessionPool.get_stats)
+        get_performance_monitor().register_provider("dns_cache", dns_cache.get_stats)
+        get_performance_monitor().register_provider("http_pool", lambda: self.httpTransport.get_stats())
+        if config.IsAutoEndpoint:
+            self._loop.create_task(self.endpointManager.run())
+            get_performance_monitor().register_provider("endpoint", self.endpointManager.get_stats)
+        for i in range(self.apiConcurrentNum):
+            self._loop.create_task(self.Run(i))
+
+        for i in range(self.downloadConcurrentNum):
+            self._loop.create_task(self.RunDownload(i))
+        self._loopReady.set()
+        self._loop.run_forever()
+
+    def _Put(self, queue, task):
+        # 可能在任意线程调用, 统一交给事件循环入队
+        self._loop.call_soon_threadsafe(queue.put_nowait, task)
+
+    def _PutDownload(self, task):
+        self._loop.call_soon_threadsafe(self._downloadQueue.put_nowait, task, task.req.priority)
+
+    def RunSync(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def RunInThread(self, func, *args):
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def Run(self, index):
         while True:
-            task = self._inQueue.get(True)
+            task = await self._inQueue.get()
             self._inQueue.task_done()
             try:
                 if task == "":
                     break
-                self._Send(task, index)
+                await self._Send(task, index)
             except Exception as es:
                 Log.Error(es)
         pass
 
     def Stop(self):
-        for i in range(self.threadNum):
-            self._inQueue.put("")
-        for i in range(self.downloadNum):
-            self._downloadQueue.put("")
-
-    def RunDownload(self, index):
+        for i in range(self.apiConcurrentNum):
+            self._Put(self._inQueue, "")
+        for i in range(self.downloadConcurrentNum):
+            self._loop.call_soon_threadsafe(self._downloadQueue.put_nowait, "", DownloadPriority.Visible)
+        self._executor.shutdown(wait=False)
+
+    async def RunDownload(self, index):
+        # 前几个worker只处理阅读页, 后台下载排满时阅读页也不用排队
+        onlyUrgent = index < config.DownloadReserveNum
         while True:
-            task = self._downloadQueue.get(True)
-            self._downloadQueue.task_done()
+            task = await self._downloadQueue.get(onlyUrgent)
             try:
                 if task == "":
                     break
-                self._Download(task, index)
+                await self._Download(task, index)
             except Exception as es:
                 Log.Error(es)
         pass
 
+    @property
+    def threadSession(self):
+        return self.sessionPool.thread_session
+
+    @property
+    def downloadSession(self):
+        return self.sessionPool.download_session
+
+    async def CallHandler(self, task):
+        handler = self.handler.get(task.req.__class__.__name__)
+        if inspect.iscoroutinefunction(handler.__call__):
+            await handler(task)
+        else:
+            await self.RunInThread(handler, task)
+
     def UpdateDns(self, address, imageUrl, imageAdress):
+        from config.setting import Setting
+        preferIpv6 = Setting.PreIpv6.value > 0
+        if dns_cache.prefer_ipv6 != preferIpv6:
+            dns_cache.prefer_ipv6 = preferIpv6
+            dns_cache.clear()
         self.imageServer = imageUrl
         self.address = address
         self.imageAddress = imageAdress
@@ -147,13 +217,19 @@ class Server(Singleton):
         return
 
     def GetNewClient(self, proxy):
+        # 普通请求和下载共用一个按域名的连接池, 同一域名复用一条HTTP/2连接
         try:
             ## proxy会报错
-            return httpx.Client(http2=True, verify=False, trust_env=False, proxy=proxy)
+            transport = self.GetTransport(proxy)
         except Exception as es:
             Log.Error(es)
-            return httpx.Client(http2=True, verify=False, trust_env=False)
-    
+            transport = self.GetTransport(None)
+        self.httpTransport = transport
+        return httpx.AsyncClient(trust_env=False, transport=transport)
+
+    def GetTransport(self, proxy):
+        return Http2PoolTransport(proxy, config.HttpMaxConnections, config.HttpMaxStreams, config.HttpKeepAlive)
+
     def UpdateProxy(self):
         from config.setting import Setting
         self.UpdateProxy2(Setting.IsHttpProxy.value, Setting.HttpProxy.value, Setting.Sock5Proxy.value)
@@ -195,15 +271,87 @@ class Server(Singleton):
             proxy = None
         Log.Warn(f"update proxy, index:{httpProxyIndex}, proxy:{proxy}, env:{trustEnv}")
 
-        self.threadSession = []
-        for i in range(self.threadNum):
-            self.threadSession.append(self.GetNewClient(proxy))
-
-        self.downloadSession = []
-        for i in range(self.downloadNum):
-            self.downloadSession.append(self.GetNewClient(proxy))
+        self.sessionPool.update_proxy(proxy)
         return
 
+    @staticmethod
+    def GetRoutes(kind):
+        from config.setting import Setting
+        if kind == "api":
+            routes = [Route(kind, 1)]
+            routes += [Route(kind, i, GlobalConfig.GetAddress(i)) for i in GlobalConfig.LocalProxyIndex]
+            if Setting.PreferCDNIP.value:
+                routes.append(Route(kind, 4, Setting.PreferCDNIP.value))
+            routes.append(Route(kind, 5, proxyUrl=GlobalConfig.ProxyApiDomain.value))
+            routes.append(Route(kind, 6, proxyUrl=GlobalConfig.ProxyApiDomain2.value))
+        else:
+            routes = [Route(kind, 1)]
+            routes += [Route(kind, i, GlobalConfig.GetImageAdress(i)) for i in GlobalConfig.LocalProxyIndex]
+            if Setting.PreferCDNIPImg.value:
+                routes.append(Route(kind, 4, Setting.PreferCDNIPImg.value))
+            routes.append(Route(kind, 5, proxyUrl=GlobalConfig.ProxyImgDomain.value))
+            routes.append(Route(kind, 6, proxyUrl=GlobalConfig.ProxyImgDomain2.value))
+        return [route for route in routes if route.index == 1 or route.address or route.proxyUrl]
+
+    @staticmethod
+    def GetRouteKind(host):
+        if host in config.ApiDomain:
+            return "api"
+        if host in config.ImageDomain or host in GlobalConfig.ImageServerList.value or host in GlobalConfig.ImageJumList.value:
+            return "img"
+        return ""
+
+    def OnRouteChange(self, kind, route):
+        # 指定IP的线路通过host_table生效, 反代线路在__DealHeaders中替换url
+        if kind == "api":
+            domains = config.ApiDomain
+        else:
+            domains = GlobalConfig.ImageServerList.value + GlobalConfig.ImageJumList.value
+        for domain in domains:
+            if route.address and ToolUtil.IsipAddress(route.address):
+                host_table[domain] = route.address
+            elif domain in host_table:
+                host_table.pop(domain)
+
+    async def ProbeRoute(self, route):
+        if QtOwner().isOfflineModel:
+            raise ConnectionError("offline model")
+        request = req.SpeedTestPingReq() if route.kind == "api" else req.SpeedTestReq()
+        url = request.url
+        host = ToolUtil.GetUrlHost(url)
+        headers = dict(request.headers)
+        extensions = {}
+        if route.proxyUrl:
+            headers.pop("user-agent", None)
+            url = url.replace(host, route.proxyUrl + "/" + host)
+        else:
+            address = route.address
+            if not address:
+                # 直连线路绕过host_table, 使用系统DNS的结果
+                infos = await self._loop.run_in_executor(self._executor, _orig_getaddrinfo, host, 443)
+                address = infos[0][4][0]
+            headers["Host"] = host
+            extensions["sni_hostname"] = host
+            url = url.replace(host, "[{}]".format(address) if ":" in address else address)
+        if route.kind == "img":
+            headers["Range"] = "bytes=0-{}".format(config.EndpointProbeBytes - 1)
+
+        start = time.monotonic()
+        throughput = None
+        async with self.sessionPool.lease() as session:
+            async with session.stream("GET", url, headers=headers, timeout=5, extensions=extensions) as r:
+                latency = time.monotonic() - start
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise httpx.HTTPStatusError("status {}".format(r.status_code), request=r.request, response=r)
+                if route.kind == "img":
+                    size = 0
+                    async for chunk in r.aiter_bytes(chunk_size=config.DownloadChunkSize):
+                        size += len(chunk)
+                        if size >= config.EndpointProbeBytes:
+                            break
+                    throughput = size / max(time.monotonic() - start, 0.001)
+        return latency, throughput
+
     def __DealHeaders(self, request, token):
         if self.token:
             request.headers["authorization"] = self.token
@@ -218,6 +366,9 @@ class Server(Singleton):
         if not request.isUseHttps:
             request.url = request.url.replace("https://", "http://")
 
+        if config.IsAutoEndpoint and not isinstance(request, (req.SpeedTestReq, req.SpeedTestPingReq)):
+            self.__DealRoute(request, ToolUtil.GetUrlHost(request.url))
+
         if request.proxyUrl:
             host = ToolUtil.GetUrlHost(request.url)
             request.url = request.url.replace(host, request.proxyUrl+"/"+host)
@@ -251,28 +402,44 @@ class Server(Singleton):
         #
         #     request.url = request.url.replace(host, self.imageServer)
 
+    def __DealRoute(self, request, host):
+        kind = self.GetRouteKind(host)
+        route = self.endpointManager.best(kind) if kind else None
+        if not route or request.headers is None:
+            return
+        request.route = route.name
+        if route.proxyUrl:
+            request.proxyUrl = route.proxyUrl
+            request.headers.pop("user-agent", None)
+        elif request.proxyUrl:
+            request.proxyUrl = ""
+            request.headers["user-agent"] = config.Agent
+
     def Send(self, request, backParam="", isASync=True):
         self.__DealHeaders(request, request.token)
         if isASync:
-            return self._inQueue.put(Task(request, backParam))
+            return self._Put(self._inQueue, Task(request, backParam))
         else:
-            return self._Send(Task(request, backParam), 0)
+            return self.RunSync(self._Send(Task(request, backParam), 0))
 
-    def _Send(self, task, index):
+    async def _Send(self, task, index):
         try:
-            Log.Info("request-> backId:{}, {}".format(task.bakParam, task.req))
+            Log.Info("request-> backId:{}, {}", task.bakParam, task.req)
             if QtOwner().isOfflineModel:
                 task.status = Status.OfflineModel
                 data = {"st": Status.OfflineModel, "data": ""}
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
                 return
 
             if task.req.method.lower() == "post":
-                self.Post(task, index)
+                await self.Post(task, index)
             elif task.req.method.lower() == "get":
-                self.Get(task, index)
+                if config.IsUseApiCache and task.req.CacheTtl > 0:
+                    await self.GetWithCache(task, index)
+                else:
+                    await self.Get(task, index)
             elif task.req.method.lower() == "put":
-                self.Put(task, index)
+                await self.Put(task, index)
             else:
                 return
         except Exception as es:
@@ -288,90 +455,184 @@ class Server(Singleton):
             Log.Error(task.req.url + " " + es.__repr__())
             Log.Debug(es)
         finally:
-            Log.Info("response-> backId:{}, {}, st:{}, {}".format(task.bakParam, task.req.__class__.__name__, task.status, task.res))
+            Log.Info("response-> backId:{}, {}, st:{}, {}", task.bakParam, task.req.__class__.__name__, task.status, task.res)
         try:
-            self.handler.get(task.req.__class__.__name__)(task)
+            await self.CallHandler(task)
             if task.res.raw:
-                task.res.raw.close()
+                await task.res.raw.aclose()
         except Exception as es:
             Log.Warn("task: {}, error".format(task.req.__class__))
             Log.Error(es)
         finally:
             return task.res
 
-    def Post(self, task, index=0):
+    async def Post(self, task, index=0):
         request = task.req
         if request.params == None:
             request.params = {}
 
         if request.headers == None:
             request.headers = {}
-        session = self.threadSession[index]
         task.res = res.BaseRes("", False, task.req.__class__.__name__)
         if request.file:
-            r = session.post(request.url, follow_redirects=True, headers=request.headers, files=request.file,
-                                  timeout=task.timeout, extensions=request.extend)
+            r = await self.Request(request, "POST", headers=request.headers, files=request.file, timeout=task.timeout)
         else:
-            r = session.post(request.url, follow_redirects=True, headers=request.headers, json=request.params, timeout=task.timeout, extensions=request.extend)
+            r = await self.Request(request, "POST", headers=request.headers, json=request.params, timeout=task.timeout)
         task.res = res.BaseRes(r, request.isParseRes, task.req.__class__.__name__)
+        if request.invalidate and r.status_code == 200 and config.IsUseApiCache:
+            await self.RunInThread(self.InvalidateCache, request)
         return task
 
-    def Put(self, task, index=0):
+    async def Put(self, task, index=0):
         request = task.req
         if request.params == None:
             request.params = {}
 
         if request.headers == None:
             request.headers = {}
-        session = self.threadSession[index]
         task.res = res.BaseRes("", False, task.req.__class__.__name__)
-        r = session.put(request.url, follow_redirects=True, headers=request.headers, json=request.params, timeout=15, extensions=request.extend)
+        r = await self.Request(request, "PUT", headers=request.headers, json=request.params, timeout=15)
         task.res = res.BaseRes(r, request.isParseRes, task.req.__class__.__name__)
         return task
 
-    def Get(self, task, index=0):
+    async def Get(self, task, index=0, cacheEntry=None):
         request = task.req
         if request.params == None:
             request.params = {}
 
         if request.headers == None:
             request.headers = {}
-        session = self.threadSession[index]
         task.res = res.BaseRes("", False, task.req.__class__.__name__)
+        headers = request.headers
+        # 有旧缓存时发送条件请求, 未修改时服务器只返回304
+        if cacheEntry:
+            headers = dict(headers)
+            if cacheEntry.etag:
+                headers["If-None-Match"] = cacheEntry.etag
+            if cacheEntry.modified:
+                headers["If-Modified-Since"] = cacheEntry.modified
         # print(f"index:{index}, token:{task.req.headers}")
-        r = session.get(request.url, follow_redirects=True, headers=request.headers, timeout=task.timeout, extensions=request.extend)
+        r = await self.Request(request, "GET", headers=headers, timeout=task.timeout)
         task.res = res.BaseRes(r, request.isParseRes, task.req.__class__.__name__)
         return task
 
+    async def Request(self, request, method, **kwargs):
+        # 按域名限制并发, 根据延迟和错误自动调整
+        limiter = get_host_limiter()
+        slot = await limiter.acquire(ToolUtil.GetUrlHost(request.url), request.priority)
+        try:
+            async with self.sessionPool.lease() as session:
+                r = await session.request(method, request.url, follow_redirects=True, extensions=request.extend, **kwargs)
+            slot.on_response(r.status_code)
+            return r
+        except BaseException as es:
+            slot.on_error(es)
+            raise
+        finally:
+            limiter.release(slot)
+            if request.route and (slot.error or slot.latency is not None):
+                self.endpointManager.record(request.route, not slot.error, slot.latency)
+
+    @staticmethod
+    def GetCacheName(request, reqName):
+        # 与用户相关的数据按token区分, 切换账号后不会读到别人的缓存
+        reqClass = getattr(req, reqName, None)
+        if reqClass and reqClass.CacheByUser:
+            token = request.headers.get("authorization", "") if request.headers else ""
+            return reqName + ":" + hashlib.md5(token.encode("utf-8")).hexdigest()[:8]
+        return reqName
+
+    @staticmethod
+    def GetCacheRes(request, entry):
+        r = httpx.Response(entry.status, headers={"Content-Type": entry.contentType or "application/json"},
+                           content=entry.body, request=httpx.Request("GET", request.url))
+        return res.BaseRes(r, request.isParseRes, request.__class__.__name__)
+
+    async def GetWithCache(self, task, index=0):
+        request = task.req
+        cache = get_response_cache()
+        name = self.GetCacheName(request, request.__class__.__name__)
+        entry = await self.RunInThread(cache.get, name, request.cacheUrl)
+        # 强制刷新时旧数据只用于条件请求
+        isUseEntry = entry and not request.isNoCache
+        if isUseEntry and entry.age < request.CacheTtl:
+            cache.record(True)
+            task.res = self.GetCacheRes(request, entry)
+            Log.Info("request api cache -> backId:{}, {}", task.bakParam, request.__class__.__name__)
+            return task
+
+        if isUseEntry and entry.age < request.CacheTtl + request.CacheStale:
+            # 先返回旧数据, 后台重新验证
+            cache.record(True, stale=True)
+            task.res = self.GetCacheRes(request, entry)
+            self._loop.create_task(self.Revalidate(request, name, entry))
+            return task
+
+        cache.record(False)
+        await self.Get(task, index, entry)
+        await self.SaveCache(task, name, entry)
+        return task
+
+    async def Revalidate(self, request, name, entry):
+        task = Task(request)
+        try:
+            await self.Get(task, 0, entry)
+            await self.SaveCache(task, name, entry)
+        except Exception as es:
+            Log.Warn("revalidate error, {}, {}".format(request.url, es.__repr__()))
+        finally:
+            if task.res and task.res.raw:
+                await task.res.raw.aclose()
+
+    async def SaveCache(self, task, name, entry):
+        request = task.req
+        r = task.res.raw
+        cache = get_response_cache()
+        if entry and r.status_code == 304:
+            await self.RunInThread(cache.touch, name, request.cacheUrl)
+            await r.aclose()
+            task.res = self.GetCacheRes(request, entry)
+            return
+        # 只缓存成功的结果
+        if r.status_code != 200 or str(task.res.code) != "200":
+            return
+        await self.RunInThread(cache.put, name, request.cacheUrl, r.status_code, r.headers.get("ETag", ""),
+                               r.headers.get("Last-Modified", ""), r.headers.get("Content-Type", ""), r.content)
+
+    def InvalidateCache(self, request):
+        cache = get_response_cache()
+        for reqName, url in request.invalidate:
+            cache.invalidate(self.GetCacheName(request, reqName), url)
+
     def Download(self, request, token="", backParams="", isASync=True):
         self.__DealHeaders(request, token)
         task = Task(request, backParams)
         if isASync:
-            self._downloadQueue.put(task)
+            self._PutDownload(task)
         else:
-            self._Download(task, 0)
+            self.RunSync(self._Download(task, 0))
 
     def ReDownload(self, task):
         task.res = ""
         task.status = Status.Ok
-        self._downloadQueue.put(task)
+        self._PutDownload(task)
 
-    def _Download(self, task, index):
+    async def _Download(self, task, index):
         try:
             task.req.resetCnt -= 1
             if not task.req.isReload:
                 if not isinstance(task.req, req.SpeedTestReq) and not task.req.savePath:
                     for cachePath in [task.req.loadPath, task.req.cachePath]:
                         if cachePath and task.bakParam:
-                            data = ToolUtil.LoadCachePicture(cachePath)
+                            data = await self.RunInThread(ToolUtil.LoadCachePicture, cachePath)
                             if data:
                                 TaskBase.taskObj.downloadBack.emit(task.bakParam, len(data), b"")
                                 TaskBase.taskObj.downloadBack.emit(task.bakParam, 0, data)
-                                Log.Info("request cache -> backId:{}, {}".format(task.bakParam, task.req))
+                                Log.Info("request cache -> backId:{}, {}", task.bakParam, task.req)
                                 return
             if QtOwner().isOfflineModel:
                 task.status = Status.OfflineModel
-                self.handler.get(task.req.__class__.__name__)(task)
+                await self.CallHandler(task)
                 return
 
             request = task.req
@@ -381,9 +642,9 @@ class Server(Singleton):
             if request.headers is None:
                 request.headers = {}
             if not request.isReset:
-                Log.Info("request-> backId:{}, {}".format(task.bakParam, task.req))
+                Log.Info("request-> backId:{}, {}", task.bakParam, task.req)
             else:
-                Log.Info("request reset:{} -> backId:{}, {}".format(task.req.resetCnt, task.bakParam, task.req))
+                Log.Info("request reset:{} -> backId:{}, {}", task.req.resetCnt, task.bakParam, task.req)
 
             history = []
             # oldHost = ToolUtil.GetUrlHost(request.url)
@@ -414,7 +675,7 @@ class Server(Singleton):
                 task.req.isReset = True
                 self.ReDownload(task)
                 return
-        self.handler.get(task.req.__class__.__name__)(task)
+        await self.CallHandler(task)
         # if task.res:
         #     task.res.close()
 
@@ -422,9 +683,9 @@ class Server(Singleton):
         self.__DealHeaders(request, "")
         task = Task(request, bakParams)
 
-        self._downloadQueue.put(task)
+        self._PutDownload(task)
 
     def TestSpeedPing(self, request, bakParams=""):
         self.__DealHeaders(request, "")
         task = Task(request, bakParams)
-        self._inQueue.put(task)
+        self._Put(self._inQueue, task)
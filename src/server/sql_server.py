@@ -1,5 +1,4 @@
 import os
-import pickle
 import sqlite3
 import sys
 import threading
@@ -117,24 +116,24 @@ class SqlServer(Singleton):
                 if taskType == self.TaskTypeClose:
                     break
                 if not isInit:
-                    TaskSql().taskObj.sqlBack.emit(backId, pickle.dumps(""))
+                    TaskSql().taskObj.EmitSql(backId, "")
                     continue
                 if taskType == self.TaskCheck:
                     try:
                         cur = conn.cursor()
                         cur.execute("select * from system")
-                        data2 = pickle.dumps(str(int(isInit)))
+                        data2 = str(int(isInit))
                     except Exception as es:
                         Log.Error(es)
-                        data2 = pickle.dumps("")
-                    TaskSql().taskObj.sqlBack.emit(backId, data2)
+                        data2 = ""
+                    TaskSql().taskObj.EmitSql(backId, data2)
                 elif taskType == self.TaskTypeSql:
                     cur = conn.cursor()
                     cur.execute(data)
                     cur.execute("COMMIT")
                     if backId:
-                        data2 = pickle.dumps("")
-                        TaskSql().taskObj.sqlBack.emit(backId, data2)
+                        data2 = ""
+                        TaskSql().taskObj.EmitSql(backId, data2)
                 elif taskType == self.TaskTypeSelectBook:
                     self._SelectBook(conn, data, backId)
                 elif taskType == self.TaskTypeSelectWord:
@@ -187,9 +186,8 @@ class SqlServer(Singleton):
             info.totalLikes = data[17]
             info.totalViews = data[18]
             books.append(info)
-        data = pickle.dumps(books)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, books)
 
     def _SelectBookNum(self, conn, sql, backId):
         cur = conn.cursor()
@@ -197,9 +195,8 @@ class SqlServer(Singleton):
         cur.execute(sql)
         for data in cur.fetchall():
             nums = data[0]
-        data = pickle.dumps(nums)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, nums)
 
     def _SelectCategoryBookNum(self, conn, sql, backId):
         cur = conn.cursor()
@@ -208,9 +205,8 @@ class SqlServer(Singleton):
         cur.execute("select category, count(*) from category where bookId in ({}) group by category".format(sql))
         for data in cur.fetchall():
             nums[CateGoryMgr().indexCategories.get(data[0])] = data[1]
-        data = pickle.dumps(nums)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, nums)
 
     def _SelectWord(self, conn, sql, backId):
         cur = conn.cursor()
@@ -218,9 +214,8 @@ class SqlServer(Singleton):
         words = []
         for data in cur.fetchall():
             words.append(data[1])
-        data = pickle.dumps(words)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, words)
 
     def _SelectUpdateInfo(self, conn, sql, backId):
         cur = conn.cursor()
@@ -239,9 +234,8 @@ class SqlServer(Singleton):
         for data in cur.fetchall():
             nums = data[0]
 
-        data = pickle.dumps((dbVer, nums, time, version))
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, (dbVer, nums, time, version))
 
     def _SelectFavoriteIds(self, conn, sql, backId):
         cur = conn.cursor()
@@ -250,9 +244,8 @@ class SqlServer(Singleton):
         allFavoriteIds = []
         for data in cur.fetchall():
             allFavoriteIds.append((data[0], data[1]))
-        data = pickle.dumps(allFavoriteIds)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, allFavoriteIds)
 
     def _SelectCacheBook(self, conn, bookId, backId):
         v = {}
@@ -290,9 +283,8 @@ class SqlServer(Singleton):
             v["st"] = Status.Ok
         except Exception as es:
             Log.Error(es)
-        data = pickle.dumps(v)
         if backId:
-            TaskSql().taskObj.sqlBack.emit(backId, data)
+            TaskSql().taskObj.EmitSql(backId, v)
 
     @time_me
     def _UpdateBookInfo(self, conn, data, backId):
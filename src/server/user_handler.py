@@ -1,13 +1,16 @@
 import json
 import os
-import pickle
 import re
 import time
 
 from config import config
 from task.qt_task import TaskBase
+from tools.bandwidth_limiter import get_bandwidth_limiter
+from tools.blob_store import get_blob_store
+from tools.host_limiter import get_host_limiter
 from tools.log import Log
 from tools.status import Status
+from tools.stream_buffer import StreamBuffer, StreamFile
 from tools.tool import ToolUtil
 from tools.user import User
 from . import req
@@ -28,7 +31,7 @@ class InitHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.InitAndroidReq)
@@ -44,7 +47,7 @@ class InitAndroidHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.LoginReq)
@@ -61,7 +64,7 @@ class LoginHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 @handler(req.RegisterReq)
 class RegisterHandler(object):
@@ -76,7 +79,7 @@ class RegisterHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.GetUserInfo)
@@ -92,7 +95,7 @@ class GetUserInfoHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.SetAvatarInfoReq)
@@ -106,7 +109,7 @@ class SetAvatarInfoHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.PunchIn)
@@ -122,7 +125,7 @@ class PunchInHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.CategoryReq)
@@ -138,7 +141,7 @@ class CategoryHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.GetComicsBookEpsReq)
@@ -155,7 +158,7 @@ class GetComicsBookEpsHandler(object):
         except Exception as es:
             Log.Error(es)
         if task.bakParam:
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.GetComicsBookOrderReq)
@@ -172,7 +175,7 @@ class GetComicsBookOrderHandler(object):
         except Exception as es:
             Log.Error(es)
         if task.bakParam:
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.GetComicsBookReq)
@@ -189,7 +192,7 @@ class GetComicsBookHandler(object):
             Log.Error(es)
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.SpeedTestPingReq)
@@ -202,16 +205,17 @@ class SpeedTestPingHandler(object):
             else:
                 data["st"] = Status.Error
                 data["data"] = "0"
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
         else:
             data["data"] = "0"
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.DownloadBookReq)
 class DownloadBookHandler(object):
-    def __call__(self, backData):
+    async def __call__(self, backData):
         if backData.status != Status.Ok:
+            await self.ClearPartial(backData.req)
             if backData.bakParam:
                 TaskBase.taskObj.downloadBack.emit(backData.bakParam, -backData.status, b"")
         else:
@@ -222,27 +226,90 @@ class DownloadBookHandler(object):
                 #     return
             request = backData.req
             index = backData.index
+
+            # 上次下载失败时保留的数据, 支持的话使用Range断点续传
+            streamFile, buffer = request.partialFile, request.partialBuffer
+            offset = request.partialSize
+            request.partialFile, request.partialBuffer, request.partialSize = None, None, 0
+            headers = request.headers
+            if offset > 0 and request.acceptRanges:
+                headers = dict(request.headers)
+                headers["Range"] = "bytes={}-".format(offset)
+                if request.validator:
+                    headers["If-Range"] = request.validator
+            else:
+                offset = 0
+            limiter = get_host_limiter()
+            bandwidth = get_bandwidth_limiter()
+            slot = await limiter.acquire(ToolUtil.GetUrlHost(request.url), request.priority)
             try:
-                with Server().downloadSession[index].stream("GET", request.url, follow_redirects=True, headers=request.headers,
+                async with Server().sessionPool.lease(True) as session, session.stream("GET", request.url, follow_redirects=True, headers=headers,
                                     timeout=backData.timeout, extensions=request.extend) as r:
-
-                    fileSize = int(r.headers.get('Content-Length', 0))
-                    getSize = 0
-                    data = b""
+                    slot.on_response(r.status_code)
+                    # 前台请求开始时就让后台下载减速
+                    await bandwidth.consume(0, request.priority)
+
+                    isResume = offset > 0 and r.status_code == 206 and self.GetRangeStart(r) == offset
+                    if offset > 0 and not isResume and r.status_code != 200:
+                        # 416或范围不对的206等, 丢掉已下载的部分, 不带Range重新下载
+                        Log.Warn("download resume error, st:{}, range:{}, backId:{}, {}", r.status_code, r.headers.get("Content-Range", ""), backData.bakParam, request.url)
+                        request.acceptRanges = False
+                        if streamFile:
+                            await Server().RunInThread(streamFile.Abort)
+                        streamFile, buffer = None, None
+                        if request.resetCnt > 0:
+                            request.isReset = True
+                            Server().ReDownload(backData)
+                            return
+                        # 重试次数用完, 不能把错误的内容当成图片
+                        raise Exception("download resume error, st:{}".format(r.status_code))
+
+                    if isResume:
+                        request.resumeCnt += 1
+                        request.resumeBytes += offset
+                        Log.Info("download resume:{}, saveBytes:{}, backId:{}, {}", request.resumeCnt, request.resumeBytes, backData.bakParam, request.url)
+                        fileSize = offset + int(r.headers.get('Content-Length', 0))
+                        getSize = offset
+                    else:
+                        # 不支持断点续传, 从头开始
+                        if streamFile:
+                            await Server().RunInThread(streamFile.Abort)
+                        streamFile, buffer = None, None
+                        fileSize = int(r.headers.get('Content-Length', 0))
+                        getSize = 0
+                        validator = r.headers.get("ETag", "") or r.headers.get("Last-Modified", "")
+                        request.validator = "" if validator.startswith("W/") else validator
+                        request.acceptRanges = r.headers.get("Accept-Ranges", "") == "bytes" and not r.headers.get("Content-Encoding")
+
+                    isSaveError = False
+                    if not streamFile and config.IsUseCache and (request.cachePath or request.savePath):
+                        streamFile = StreamFile([request.cachePath, request.savePath], get_blob_store())
+
+                    # 只有界面需要图片数据时才保留在内存中
+                    if buffer is None and (request.isNeedData or not streamFile):
+                        buffer = StreamBuffer(fileSize)
 
                     now = time.time()
                     isAlreadySend = False
-                    isSpacePic = True
+                    isSpacePic = getSize <= 0
                     # 网速快，太卡了，优化成最多100ms一次
                     try:
                         # from tqdm import tqdm
                         # with tqdm(total=fileSize, unit_scale=True, unit_divisor=1024, unit="B") as progress:
                         #     num_bytes_downloaded = r.num_bytes_downloaded
-                        for chunk in r.iter_bytes(chunk_size=1024):
+                        async for chunk in r.aiter_bytes(chunk_size=config.DownloadChunkSize):
                             cur = time.time()
                             tick = cur - now
                             getSize += len(chunk)
-                            data += chunk
+                            await bandwidth.consume(len(chunk), request.priority)
+                            if buffer is not None:
+                                buffer.Write(chunk)
+                            if streamFile and not isSaveError:
+                                try:
+                                    await Server().RunInThread(streamFile.Write, chunk)
+                                except Exception as es:
+                                    Log.Error(es)
+                                    isSaveError = True
                             isSpacePic = False
                             if tick >= 0.1:
                                 isAlreadySend = True
@@ -256,42 +323,67 @@ class DownloadBookHandler(object):
 
                     except Exception as es:
                         Log.Error(es)
+                        slot.on_error(es)
                         if backData.req.resetCnt > 0:
                             backData.req.isReset = True
+                            # 保留已下载的部分, 重试时续传
+                            if request.acceptRanges and getSize > 0 and not isSaveError:
+                                request.partialFile, request.partialBuffer, request.partialSize = streamFile, buffer, getSize
+                                streamFile = None
                             Server().ReDownload(backData)
                             return
+                        # 重试次数用完, 不能把不完整的图片当成成功
+                        raise es
 
                     # Log.Info("size:{}, url:{}".format(ToolUtil.GetDownloadSize(fileSize), backData.req.url))
-                    if config.IsUseCache and len(data) > 0:
+                    if streamFile and getSize > 0 and not isSaveError:
                         try:
-                            for path in [backData.req.cachePath, backData.req.savePath]:
-                                filePath = path
-                                if not path:
-                                    continue
-                                fileDir = os.path.dirname(filePath)
-                                if not os.path.isdir(fileDir):
-                                    os.makedirs(fileDir)
-
-                                with open(filePath, "wb+") as f:
-                                    f.write(data)
-                                Log.Debug("add download cache, cachePath:{}".format(filePath))
+                            await Server().RunInThread(streamFile.Commit)
+                            Log.Debug("add download cache, cachePath:{}", streamFile.paths)
+                            streamFile = None
                         except Exception as es:
                             Log.Error(es)
-                            # 保存失败了
-                            if backData.bakParam:
-                                TaskBase.taskObj.downloadBack.emit(backData.bakParam, -2, b"")
+                            isSaveError = True
+
+                    # 保存失败了
+                    if isSaveError and backData.bakParam:
+                        TaskBase.taskObj.downloadBack.emit(backData.bakParam, -2, b"")
 
                     if backData.bakParam:
                         if isSpacePic:
                             TaskBase.taskObj.downloadBack.emit(backData.bakParam, 0, SpacePic)
+                        elif buffer is not None:
+                            TaskBase.taskObj.downloadBack.emit(backData.bakParam, 0, buffer.GetData())
                         else:
-                            TaskBase.taskObj.downloadBack.emit(backData.bakParam, 0, data)
+                            TaskBase.taskObj.downloadBack.emit(backData.bakParam, 0, b"")
 
             except Exception as es:
+                slot.on_error(es)
                 backData.status = Status.DownloadFail
                 Log.Error(es)
                 if backData.bakParam:
                     TaskBase.taskObj.downloadBack.emit(backData.bakParam, -backData.status, b"")
+            finally:
+                limiter.release(slot)
+                if request.route and (slot.error or slot.latency is not None):
+                    Server().endpointManager.record(request.route, not slot.error, slot.latency)
+                # 未完成的临时文件直接删除
+                if streamFile:
+                    await Server().RunInThread(streamFile.Abort)
+
+    @staticmethod
+    def GetRangeStart(r):
+        # Content-Range: bytes 1024-2047/2048
+        m = re.match(r"bytes (\d+)-", r.headers.get("Content-Range", ""))
+        if not m:
+            return -1
+        return int(m.group(1))
+
+    @staticmethod
+    async def ClearPartial(request):
+        if request.partialFile:
+            await Server().RunInThread(request.partialFile.Abort)
+        request.partialFile, request.partialBuffer, request.partialSize = None, None, 0
 
 
 @handler(req.CheckUpdateDatabaseReq)
@@ -302,11 +394,11 @@ class DownloadDatabaseReqHandler(object):
         data = {"st": task.status, "data": ""}
         if not task.res.GetText() or task.status == Status.NetError:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
             return
         if task.bakParam:
             data["data"] = task.res.GetText()
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.CheckUpdateReq)
@@ -333,7 +425,7 @@ class CheckUpdateHandler(object):
             pass
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.CheckUpdateInfoReq)
@@ -351,7 +443,7 @@ class CheckUpdateInfoHandler(object):
             pass
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.CheckUpdateConfigReq)
@@ -369,21 +461,21 @@ class CheckUpdateConfigHandler(object):
             pass
         finally:
             if task.bakParam:
-                TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(task.bakParam, data)
 
 
 @handler(req.SpeedTestReq)
 class SpeedTestHandler(object):
-    def __call__(self, backData):
+    async def __call__(self, backData):
         data = {"st": backData.status, "data": ""}
         if backData.status != Status.Ok:
             if backData.bakParam:
-                TaskBase.taskObj.taskBack.emit(backData.bakParam, pickle.dumps(data))
+                TaskBase.taskObj.EmitTask(backData.bakParam, data)
         else:
             request = backData.req
             index = backData.index
             try:
-                with Server().downloadSession[index].stream("GET", request.url, follow_redirects=True, headers=request.headers,
+                async with Server().sessionPool.lease(True) as session, session.stream("GET", request.url, follow_redirects=True, headers=request.headers,
                                     timeout=backData.timeout, extensions=request.extend) as r:
 
                     fileSize = int(r.headers.get('Content-Length', 0))
@@ -391,7 +483,7 @@ class SpeedTestHandler(object):
                     now = time.time()
                     # 网速快，太卡了，优化成最多100ms一次
                     try:
-                        for chunk in r.iter_bytes(chunk_size=1024):
+                        async for chunk in r.aiter_bytes(chunk_size=1024):
                             getSize += len(chunk)
                             consume = time.time() - now
                             if consume >= 3.0:
@@ -405,13 +497,13 @@ class SpeedTestHandler(object):
                 speed = ToolUtil.GetDownloadSize(downloadSize)
                 if backData.bakParam:
                     data["data"] = speed
-                    TaskBase.taskObj.taskBack.emit(backData.bakParam, pickle.dumps(data))
+                    TaskBase.taskObj.EmitTask(backData.bakParam, data)
 
             except Exception as es:
                 Log.Error(es)
                 data["st"] = Status.DownloadFail
                 if backData.bakParam:
-                    TaskBase.taskObj.taskBack.emit(backData.bakParam, pickle.dumps(data))
+                    TaskBase.taskObj.EmitTask(backData.bakParam, data)
 
 
 @handler(req.GetUserCommentReq)
@@ -454,4 +546,4 @@ class MsgHandler(object):
     def __call__(self, task):
         data = {"st": task.status, "data": task.res.GetText()}
         if task.bakParam:
-            TaskBase.taskObj.taskBack.emit(task.bakParam, pickle.dumps(data))
+            TaskBase.taskObj.EmitTask(task.bakParam, data)
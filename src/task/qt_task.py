@@ -8,22 +8,56 @@ from PySide6.QtGui import QImage
 
 from config import config
 from config.setting import Setting
+from tools.download_queue import DownloadPriority
 from tools.singleton import Singleton
 
 
+class ResultTable(object):
+    """
+    跨线程传递结果
+    工作线程放入对象, UI线程按taskId取出, 对象按引用传递, 不需要pickle
+    """
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def Put(self, taskId, data):
+        with self._lock:
+            self._results[taskId] = data
+
+    def Pop(self, taskId, default=None):
+        with self._lock:
+            return self._results.pop(taskId, default)
+
+    def __len__(self):
+        return len(self._results)
+
+
 class QtTaskQObject(QObject):
-    taskBack = Signal(int, bytes)
+    taskBack = Signal(int)
     downloadBack = Signal(int, int, bytes)
     downloadStBack = Signal(int, dict)
     convertBack = Signal(int)
     imageBack = Signal(int, QImage)
-    sqlBack = Signal(int, bytes)
+    sqlBack = Signal(int)
     localBack = Signal(int, int, list)
     localReadBack = Signal(int, int, bytes)
     uploadBack = Signal(int, int)
 
     def __init__(self):
         super(self.__class__, self).__init__()
+        self.taskResults = ResultTable()
+        self.sqlResults = ResultTable()
+
+    # 可在任意线程调用, 结果在UI线程的TaskHttp.HandlerTask中取出
+    def EmitTask(self, taskId, data):
+        self.taskResults.Put(taskId, data)
+        self.taskBack.emit(taskId)
+
+    # 可在任意线程调用, 结果在UI线程的TaskSql.HandlerSqlTask中取出
+    def EmitSql(self, taskId, data):
+        self.sqlResults.Put(taskId, data)
+        self.sqlBack.emit(taskId)
 
 
 class QtTaskBase:
@@ -57,7 +91,7 @@ class QtTaskBase:
     # downloadCallBack(data, laveFileSize)
     # downloadCompleteBack(data, st)
     # downloadCompleteBack(data, st, backParam)
-    def AddDownloadTask(self, url, path, downloadCallBack=None, completeCallBack=None, downloadStCallBack=None, backParam=None, loadPath="", cachePath="", savePath="",  cleanFlag="", isReload=False, resetCnt=config.ResetDownloadCntDefault):
+    def AddDownloadTask(self, url, path, downloadCallBack=None, completeCallBack=None, downloadStCallBack=None, backParam=None, loadPath="", cachePath="", savePath="",  cleanFlag="", isReload=False, resetCnt=config.ResetDownloadCntDefault, isNeedData=True, priority=DownloadPriority.Cover):
         from task.task_download import TaskDownload
         if not cleanFlag:
             cleanFlag = self.__taskFlagId
@@ -69,17 +103,19 @@ class QtTaskBase:
             if Setting.SavePath.value and path:
                 filePath2 = os.path.join(os.path.join(Setting.SavePath.value, config.CachePathDir), path)
                 cachePath = filePath2
-        return TaskDownload().DownloadTask(url, path, downloadCallBack, completeCallBack, downloadStCallBack, backParam, loadPath, cachePath, savePath, cleanFlag, isReload, resetCnt)
+        return TaskDownload().DownloadTask(url, path, downloadCallBack, completeCallBack, downloadStCallBack, backParam, loadPath, cachePath, savePath, cleanFlag, isReload, resetCnt, isNeedData, priority)
 
     # downloadCallBack(data, laveFileSize, backParam)
     # downloadCallBack(data, laveFileSize)
     # downloadCompleteBack(data, st)
     # downloadCompleteBack(data, st, backParam)
-    def AddDownloadBook(self, bookId, epsId, index, statusBack=None, downloadCallBack=None, completeCallBack=None, backParam=None, loadPath="", cachePath="", savePath="", cleanFlag="", isInit=False):
+    # isNeedData=False: 只保存到savePath, 完成回调的data为空
+    # priority: 下载队列优先级, 见DownloadPriority
+    def AddDownloadBook(self, bookId, epsId, index, statusBack=None, downloadCallBack=None, completeCallBack=None, backParam=None, loadPath="", cachePath="", savePath="", cleanFlag="", isInit=False, isNeedData=True, priority=DownloadPriority.Background):
         from task.task_download import TaskDownload
         if not cleanFlag:
             cleanFlag = self.__taskFlagId
-        return TaskDownload().DownloadBook(bookId, epsId, index, statusBack, downloadCallBack, completeCallBack, backParam, loadPath, cachePath, savePath, cleanFlag, isInit)
+        return TaskDownload().DownloadBook(bookId, epsId, index, statusBack, downloadCallBack, completeCallBack, backParam, loadPath, cachePath, savePath, cleanFlag, isInit, isNeedData, priority)
 
     def AddDownloadBookCache(self, loadPath, completeCallBack=None, backParam=0, cleanFlag=""):
         from task.task_download import TaskDownload
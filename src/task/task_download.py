@@ -1,12 +1,15 @@
 import hashlib
 import os
+import threading
 from functools import partial
 
 from config import config
 from config.setting import Setting
 from server.sql_server import SqlServer
 from task.qt_task import TaskBase, QtTaskBase
+from tools.blob_store import get_blob_store
 from tools.book import BookMgr, BookEps, Picture
+from tools.download_queue import DownloadPriority
 from tools.log import Log
 from tools.status import Status
 from tools.str import Str
@@ -43,12 +46,15 @@ class QtDownloadTask(object):
         self.cachePath = ""   # 缓存路径
         self.savePath = ""    # 下载保存路径
         self.isLoadTask = False
+        self.isNeedData = True  # 完成回调是否需要图片数据
+        self.priority = DownloadPriority.Cover
 
         self.bookId = ""      # 下载的bookId
         self.epsId = 0        # 下载的章节
         self.index = 0        # 下载的索引
         self.resetCnt = 0     # 重试次数
         self.isLocal = True
+        self.isNewEps = False # 书更新后新增的章节, 章节图片分页不读缓存
         self.status = self.Waiting
 
 
@@ -59,6 +65,9 @@ class TaskDownload(TaskBase, QtTaskBase):
         QtTaskBase.__init__(self)
         self.taskObj.downloadBack.connect(self.HandlerTask)
         self.taskObj.downloadStBack.connect(self.HandlerTaskSt)
+        # (bookId, epsId) -> 正在加载的图片分页, 同一章节的任务共用
+        self.picPageLoads = {}
+        self.picPageLock = threading.Lock()
         self.thread.start()
 
     def Run(self):
@@ -69,7 +78,7 @@ class TaskDownload(TaskBase, QtTaskBase):
                 break
             self.HandlerDownload({"st": Status.Ok}, (v, QtDownloadTask.Waiting))
 
-    def DownloadTask(self, url, path, downloadCallBack=None, completeCallBack=None, downloadStCallBack=None, backParam=None, loadPath="", cachePath="", savePath="", cleanFlag="", isReload=False, resetCnt=1):
+    def DownloadTask(self, url, path, downloadCallBack=None, completeCallBack=None, downloadStCallBack=None, backParam=None, loadPath="", cachePath="", savePath="", cleanFlag="", isReload=False, resetCnt=1, isNeedData=True, priority=DownloadPriority.Cover):
         self.taskId += 1
         data = QtDownloadTask(self.taskId)
         data.downloadCallBack = downloadCallBack
@@ -82,16 +91,18 @@ class TaskDownload(TaskBase, QtTaskBase):
         data.loadPath = loadPath
         data.cachePath = cachePath
         data.savePath = savePath
+        data.isNeedData = isNeedData
+        data.priority = priority
         self.tasks[self.taskId] = data
         if cleanFlag:
             data.cleanFlag = cleanFlag
             taskIds = self.flagToIds.setdefault(cleanFlag, set())
             taskIds.add(self.taskId)
 
-        Log.Debug("add download info, cachePath:{}, loadPath:{}, savePath:{}".format(data.cachePath, data.loadPath, data.savePath))
+        Log.Debug("add download info, cachePath:{}, loadPath:{}, savePath:{}", data.cachePath, data.loadPath, data.savePath)
         from server.server import Server
         from server import req
-        Server().Download(req.DownloadBookReq(url, data.loadPath, data.cachePath, data.savePath, data.isReload, resetCnt=resetCnt), backParams=self.taskId)
+        Server().Download(req.DownloadBookReq(url, data.loadPath, data.cachePath, data.savePath, data.isReload, resetCnt=resetCnt, isNeedData=isNeedData, priority=priority), backParams=self.taskId)
         return self.taskId
 
     def HandlerTask(self, downloadId, laveFileSize, data, isCallBack=True):
@@ -134,7 +145,8 @@ class TaskDownload(TaskBase, QtTaskBase):
                 Log.Error(es)
             info.lastLaveSize = laveFileSize
 
-        if laveFileSize == 0 and data != b"":
+        # 只写入文件的任务, 完成时没有数据
+        if laveFileSize == 0 and (data != b"" or not info.isNeedData):
             if info.downloadCompleteBack:
                 try:
                     if info.cleanFlag:
@@ -149,7 +161,7 @@ class TaskDownload(TaskBase, QtTaskBase):
             self.ClearDownloadTask(downloadId)
 
     def DownloadBook(self, bookId, epsId, index, statusBack=None, downloadCallBack=None, completeCallBack=None,
-                    backParam=None, loadPath="", cachePath="", savePath="", cleanFlag=None, isInit=False):
+                    backParam=None, loadPath="", cachePath="", savePath="", cleanFlag=None, isInit=False, isNeedData=True, priority=DownloadPriority.Background):
         self.taskId += 1
         data = QtDownloadTask(self.taskId)
         data.downloadCallBack = downloadCallBack
@@ -163,12 +175,14 @@ class TaskDownload(TaskBase, QtTaskBase):
         data.loadPath = loadPath
         data.cachePath = cachePath
         data.savePath = savePath
+        data.isNeedData = isNeedData
+        data.priority = priority
         self.tasks[self.taskId] = data
         if cleanFlag:
             data.cleanFlag = cleanFlag
             taskIds = self.flagToIds.setdefault(cleanFlag, set())
             taskIds.add(self.taskId)
-        Log.Debug("add download info, savePath:{}, loadPath:{}".format(data.savePath, data.loadPath))
+        Log.Debug("add download info, savePath:{}, loadPath:{}", data.savePath, data.loadPath)
         self._inQueue.put(self.taskId)
         return self.taskId
 
@@ -243,9 +257,10 @@ class TaskDownload(TaskBase, QtTaskBase):
                 task.status = task.Reading
             if task.status == task.Reading:
                 # isReset or self.SetTaskStatus(taskId, backData, task.ReadingEps)
+                # 与章节列表界面共用加载, 同一本书的任务只加载一次
                 if info.maxLoadEps <= 0:
                     task.resetCnt += 1
-                    self.AddHttpTask(req.GetComicsBookEpsReq(task.bookId), self.HandlerDownload, (taskId, task.Reading), task.cleanFlag)
+                    BookMgr().LoadEps(task.bookId, self.HandlerDownload, (taskId, task.Reading))
                     return
 
                 if task.epsId >= info.epsCount:
@@ -253,10 +268,11 @@ class TaskDownload(TaskBase, QtTaskBase):
                     return
 
                 if task.epsId not in info.epsDict:
-                    loadPage = (info.epsCount - task.epsId - 1) // info.epsLimit
-
+                    # 书更新后新增的章节, 所在的分页已经加载过也要重新请求
+                    loadPage = (info.epsCount - task.epsId - 1) // info.epsLimit + 1
                     task.resetCnt += 1
-                    self.AddHttpTask(req.GetComicsBookEpsReq(task.bookId, loadPage+1), self.HandlerDownload, (taskId, task.Reading), task.cleanFlag)
+                    task.isNewEps = True
+                    BookMgr().LoadEps(task.bookId, self.HandlerDownload, (taskId, task.Reading), reloadPages=[loadPage])
                     return
 
                 task.status = task.ReadingEps
@@ -277,12 +293,15 @@ class TaskDownload(TaskBase, QtTaskBase):
 
                 if epsInfo.maxPicPages <= 0:
                     task.resetCnt += 1
-                    self.AddHttpTask(req.GetComicsBookOrderReq(task.bookId, task.epsId+1), self.HandlerDownload, (taskId, task.ReadingEps), task.cleanFlag)
+                    request = req.GetComicsBookOrderReq(task.bookId, task.epsId+1)
+                    request.isNoCache = task.isNewEps
+                    self.AddHttpTask(request, self.HandlerDownload, (taskId, task.ReadingEps), task.cleanFlag)
                     return
-                if task.index not in epsInfo.pics:
-                    loadPage = task.index // epsInfo.picLimit + 1
+                # 知道总页数后并发加载剩余的分页, 全部完成后再开始下载图片
+                loadPages = [page for page in range(1, epsInfo.maxPicPages + 1) if page not in epsInfo.curLoadPicPages]
+                if loadPages:
                     task.resetCnt += 1
-                    self.AddHttpTask(req.GetComicsBookOrderReq(task.bookId, task.epsId+1, loadPage), self.HandlerDownload, (taskId, task.ReadingPicture), task.cleanFlag)
+                    self.LoadPicPages(taskId, task, loadPages)
                     return
 
                 task.status = task.ReadingPicture
@@ -312,6 +331,18 @@ class TaskDownload(TaskBase, QtTaskBase):
                     if ToolUtil.IsHaveFile(task.savePath):
                         self.SetTaskStatus(taskId, backData, task.Cache)
                         return
+                    # 阅读时已经缓存过这一页, 链接到下载目录, 不用再下载
+                    store = get_blob_store()
+                    if store:
+                        path = ToolUtil.GetRealPath(task.index+1, "book/{}/{}".format(task.bookId, task.epsId+1))
+                        cachePath2 = os.path.join(os.path.join(Setting.SavePath.value, config.CachePathDir), path)
+                        if ToolUtil.IsHaveFile(cachePath2):
+                            try:
+                                store.link_file(cachePath2, [task.savePath])
+                                self.SetTaskStatus(taskId, backData, task.Cache)
+                                return
+                            except Exception as es:
+                                Log.Error(es)
                 else:
                     path = ToolUtil.GetRealPath(task.index+1, "book/{}/{}".format(task.bookId, task.epsId+1))
                     cachePath2 = os.path.join(os.path.join(Setting.SavePath.value, config.CachePathDir), path)
@@ -343,11 +374,63 @@ class TaskDownload(TaskBase, QtTaskBase):
                 resetCnt = config.ResetDownloadCnt
                 self.AddDownloadTask(
                     url, "", task.downloadCallBack, task.downloadCompleteBack, task.statusBack,
-                    task.backParam, task.loadPath, task.cachePath, task.savePath, task.cleanFlag, resetCnt=resetCnt)
+                    task.backParam, task.loadPath, task.cachePath, task.savePath, task.cleanFlag, resetCnt=resetCnt, isNeedData=task.isNeedData, priority=task.priority)
         except Exception as es:
             Log.Error(es)
         return
 
+    def LoadPicPages(self, taskId, task, loadPages):
+        """
+        加载章节图片列表的剩余分页, 同一章节的任务共用
+        最多同时请求config.PicPageLoadConcurrency个分页, 全部完成后回到ReadingEps
+        """
+        key = (task.bookId, task.epsId)
+        with self.picPageLock:
+            load = self.picPageLoads.get(key)
+            if load:
+                load["waitIds"].append(taskId)
+                return
+            self.picPageLoads[key] = {"pages": list(loadPages), "inflight": 0, "st": Status.Ok,
+                                      "isNoCache": task.isNewEps, "waitIds": [taskId]}
+        self._LoadNextPicPages(key)
+
+    def _LoadNextPicPages(self, key):
+        sendPages = []
+        with self.picPageLock:
+            load = self.picPageLoads.get(key)
+            if not load:
+                return
+            while load["pages"] and load["inflight"] < config.PicPageLoadConcurrency:
+                sendPages.append(load["pages"].pop(0))
+                load["inflight"] += 1
+            isFinish = not load["pages"] and load["inflight"] <= 0
+            if isFinish:
+                self.picPageLoads.pop(key)
+        if isFinish:
+            # 有分页失败时按失败重试, 只会重新加载缺少的分页
+            for taskId in load["waitIds"]:
+                self.HandlerDownload({"st": load["st"]}, (taskId, QtDownloadTask.ReadingEps))
+            return
+        from server import req
+        bookId, epsId = key
+        for page in sendPages:
+            # 不跟随任务的cleanFlag, 保证等待的任务都能收到回调
+            request = req.GetComicsBookOrderReq(bookId, epsId+1, page)
+            request.isNoCache = load["isNoCache"]
+            self.AddHttpTask(request, self.HandlerPicPages, key)
+
+    def HandlerPicPages(self, data, key):
+        with self.picPageLock:
+            load = self.picPageLoads.get(key)
+            if not load:
+                return
+            load["inflight"] -= 1
+            if data["st"] != Status.Ok:
+                # 失败时不再请求剩余的分页
+                load["st"] = data["st"]
+                load["pages"].clear()
+        self._LoadNextPicPages(key)
+
     def SetTaskStatus(self, taskId, backData, status):
         backData["st"] = status
         # print(status)
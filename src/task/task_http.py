@@ -1,8 +1,10 @@
-import pickle
+import threading
+import time
 from types import FunctionType
 
 from task.qt_task import TaskBase
 from tools.log import Log
+from tools.performance_monitor import get_performance_monitor
 
 
 class QtHttpTask(object):
@@ -14,11 +16,20 @@ class QtHttpTask(object):
 
 
 class TaskHttp(TaskBase):
+    CoalesceExpire = 60    # 超过该时间还没返回的请求不再合并
 
     def __init__(self):
         TaskBase.__init__(self)
         self.taskObj.taskBack.connect(self.HandlerTask)
 
+        # 相同的GET请求正在进行时只发一次, key: [startTick, taskIds]
+        self.inflight = {}
+        self.inflightKeys = {}    # 发出请求的taskId: key
+        self.inflightLock = threading.Lock()
+        self.coalesceCnt = 0
+        self.sendCnt = 0
+        get_performance_monitor().register_provider("http_coalesce", self.GetStats)
+
     def AddHttpTask(self, req, callBack=None, backParam=None, cleanFlag=None):
         self.taskId += 1
         info = QtHttpTask(self.taskId)
@@ -33,17 +44,66 @@ class TaskHttp(TaskBase):
         if isinstance(req, FunctionType):
             req(self.taskId)
         else:
+            if self.AddInflight(req, self.taskId):
+                return
             from server.server import Server
             Server().Send(req, backParam=self.taskId)
         return
 
-    def HandlerTask(self, taskId, data):
+    @staticmethod
+    def GetCoalesceKey(req):
+        if req.method.upper() != "GET":
+            return None
+        from server.server import Server
+        # 与Server发送时使用的token一致, 切换账号后不会拿到别人的结果
+        token = req.token or Server().token or (req.headers or {}).get("authorization", "")
+        # 强制刷新的请求不合并到可能读缓存的请求上
+        return req.__class__.__name__, req.url, req.method, token, req.isNoCache
+
+    def AddInflight(self, req, taskId):
+        key = self.GetCoalesceKey(req)
+        if not key:
+            return False
+        with self.inflightLock:
+            self.sendCnt += 1
+            info = self.inflight.get(key)
+            if info and time.time() - info[0] < self.CoalesceExpire:
+                info[1].append(taskId)
+                self.coalesceCnt += 1
+                Log.Debug("[Task] coalesce taskId:{}->{}, {}", taskId, info[1][0], req.url)
+                return True
+            self.inflight[key] = [time.time(), [taskId]]
+            self.inflightKeys[taskId] = key
+        return False
+
+    def GetStats(self):
+        with self.inflightLock:
+            return {
+                "requests": self.sendCnt,
+                "coalesced": self.coalesceCnt,
+                "inflight": len(self.inflight),
+            }
+
+    def HandlerTask(self, taskId):
+        data = self.taskObj.taskResults.Pop(taskId)
+        if data is None:
+            return
+        # 合并的请求共用一次结果
+        with self.inflightLock:
+            key = self.inflightKeys.pop(taskId, None)
+            taskIds = [taskId]
+            if key and key in self.inflight and self.inflight[key][1][0] == taskId:
+                taskIds = self.inflight.pop(key)[1]
+        for v in taskIds:
+            # 合并的请求各自拿一份, 回调修改字典时互不影响
+            self._HandlerTask(v, dict(data) if isinstance(data, dict) and len(taskIds) > 1 else data)
+
+    def _HandlerTask(self, taskId, data):
         try:
             info = self.tasks.get(taskId)
             if not info:
                 Log.Warn("[Task] not find taskId:{}, {}".format(taskId, data))
                 return
-            data = pickle.loads(data)
             assert isinstance(info, QtHttpTask)
             if info.cleanFlag:
                 taskIds = self.flagToIds.get(info.cleanFlag, set())
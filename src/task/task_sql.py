@@ -1,5 +1,3 @@
-import pickle
-
 from task.qt_task import TaskBase
 from tools.log import Log
 
@@ -32,9 +30,9 @@ class TaskSql(TaskBase):
         SqlServer().AddSqlTask(table, taskType, data, self.taskId)
         return
 
-    def HandlerSqlTask(self, taskId, data):
+    def HandlerSqlTask(self, taskId):
         try:
-            data = pickle.loads(data)
+            data = self.taskObj.sqlResults.Pop(taskId)
             info = self.tasks.get(taskId)
             if not info:
                 Log.Warn("[Task] not find taskId:{}, {}".format(taskId, data))
@@ -7,6 +7,7 @@ from zlib import crc32
 from config import config
 from config.setting import Setting
 from task.qt_task import TaskBase
+from tools.blob_store import get_blob_store
 from tools.log import Log
 from tools.status import Status
 from tools.str import Str
@@ -29,6 +30,8 @@ class QConvertTask(object):
         self.savePath = ""  #
         self.imgData = b""
         self.saveData = b""
+        self.srcDigest = ""  # 原图sha256, 有图片仓库时记录转换结果
+        self.modelTag = ""
 
         self.model = {
             "isForce":0,
@@ -120,6 +123,17 @@ class TaskWaifu2x(TaskBase):
                 if isFind:
                     continue
 
+                # 同一张图同样的参数已经转换过, 直接链接之前的结果
+                store = get_blob_store()
+                if store and not task.noSaveCache and (task.cachePath or task.savePath):
+                    task.srcDigest = store.hash_bytes(task.imgData)
+                    task.modelTag = self.GetModelTag(task.model)
+                    digest = store.get_derived(task.srcDigest, task.modelTag)
+                    if digest and store.link_digest(digest, [path for path in [task.cachePath, task.savePath] if path]):
+                        task.saveData = ToolUtil.LoadCachePicture(task.cachePath or task.savePath)
+                        self.taskObj.convertBack.emit(taskId)
+                        continue
+
                 err = ""
                 if config.CanWaifu2x:
                     from sr_vulkan import sr_vulkan as sr
@@ -184,6 +198,11 @@ class TaskWaifu2x(TaskBase):
                 self.taskObj.convertBack.emit(taskId)
                 continue
 
+    @staticmethod
+    def GetModelTag(model):
+        # 转换参数相同时同一张图的结果相同
+        return "{:08x}".format(crc32(json.dumps(model, sort_keys=True, default=str).encode("utf-8")))
+
     def _calc_tile_size(self, scale, target_w, target_h):
         """
         根据倍率和目标尺寸动态调整tile size：
@@ -237,6 +256,7 @@ class TaskWaifu2x(TaskBase):
                 lenData = 0
             else:
                 lenData = len(data)
+            isConvert = lenData > 0
             if lenData <= 0:
                 info.status = Status.FileFormatError
                 Log.Warn("convert error, taskId: {}, dataLen:{}, sts:{} tick:{}, skip:{}".format(str(taskId), lenData,
@@ -250,12 +270,21 @@ class TaskWaifu2x(TaskBase):
             info.saveData = data
             info.tick = tick
             try:
-                if not info.noSaveCache:
+                store = get_blob_store()
+                paths = [path for path in [info.cachePath, info.savePath] if path]
+                if not info.noSaveCache and store and data and paths:
+                    digest = store.put_bytes(data, paths)
+                    if isConvert and info.srcDigest:
+                        store.put_derived(info.srcDigest, info.modelTag, digest)
+                elif not info.noSaveCache:
                     for path in [info.cachePath, info.savePath]:
                         if path and not os.path.isdir(os.path.dirname(path)):
                             os.makedirs(os.path.dirname(path))
 
                         if path and data:
+                            # 可能是图片仓库的硬链接, 不能原地改写
+                            if os.path.isfile(path):
+                                os.remove(path)
                             with open(path, "wb+") as f:
                                 f.write(data)
             except Exception as es:
@@ -283,7 +312,7 @@ class TaskWaifu2x(TaskBase):
             info.cleanFlag = cleanFlag
             taskIds = self.flagToIds.setdefault(cleanFlag, set())
             taskIds.add(self.taskId)
-        Log.Debug("add convert info, taskId:{}, cachePath:{}".format(info.taskId, info.cachePath))
+        Log.Debug("add convert info, taskId:{}, cachePath:{}", info.taskId, info.cachePath)
         self._inQueue.put(self.taskId)
         return self.taskId
 
@@ -300,7 +329,7 @@ class TaskWaifu2x(TaskBase):
             info.cleanFlag = cleanFlag
             taskIds = self.flagToIds.setdefault(cleanFlag, set())
             taskIds.add(self.taskId)
-        Log.Debug("add convert info, loadPath:{}, savePath:{}".format(info.loadPath, info.savePath))
+        Log.Debug("add convert info, loadPath:{}, savePath:{}", info.loadPath, info.savePath)
         self._inQueue.put(self.taskId)
         return self.taskId
 
@@ -318,7 +347,7 @@ class TaskWaifu2x(TaskBase):
             info.cleanFlag = cleanFlag
             taskIds = self.flagToIds.setdefault(cleanFlag, set())
             taskIds.add(self.taskId)
-        Log.Debug("add convert info, loadPath:{}, savePath:{}".format(info.loadPath, info.savePath))
+        Log.Debug("add convert info, loadPath:{}, savePath:{}", info.loadPath, info.savePath)
         self._inQueue.put(self.taskId)
         return self.taskId
 
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+下载带宽控制模块
+令牌桶限制后台下载的速度, 阅读和浏览时自动让出带宽
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from tools.download_queue import DownloadPriority
+from tools.log import Log
+
+
+class BandwidthLimiter:
+    """
+    后台下载限速, 只能在事件循环线程中使用
+
+    特性:
+    - 只限制Background级别(下载管理器), 阅读页、预加载和封面不受限制
+    - 没有前台流量时后台按max_rate下载(0表示不限速)
+    - 最近idle_sec秒内有前台流量时, 后台只能使用估计带宽的share比例
+    - 带宽按1秒窗口的总吞吐估计, 限速期间只升不降, 避免越限越慢
+    """
+
+    def __init__(self, share: float = 0.3, max_rate: float = 0, min_rate: float = 64 * 1024,
+                 idle_sec: float = 3, burst_sec: float = 0.5):
+        """
+        初始化
+
+        Args:
+            share: 有前台流量时后台可用带宽的比例
+            max_rate: 后台下载的最大速度(字节/秒), 0表示不限
+            min_rate: 后台下载的最小速度(字节/秒)
+            idle_sec: 前台流量停止多久后恢复后台速度(秒)
+            burst_sec: 令牌桶容量, 按当前速度的秒数计算
+        """
+        self.share = share
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.idle_sec = idle_sec
+        self.burst_sec = burst_sec
+
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.last_interactive = 0.0
+        self.capacity = 0.0           # 估计的链路带宽(字节/秒)
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+
+        # 统计信息
+        self.interactive_bytes = 0
+        self.background_bytes = 0
+        self.throttled_sec = 0.0
+
+    def is_interactive_active(self) -> bool:
+        """最近是否有前台流量"""
+        return self.last_interactive > 0 and time.monotonic() - self.last_interactive < self.idle_sec
+
+    def get_rate(self) -> float:
+        """后台下载当前的速度上限(字节/秒), 0表示不限"""
+        if not self.is_interactive_active():
+            return self.max_rate
+        rate = max(self.min_rate, self.capacity * self.share)
+        if self.max_rate:
+            rate = min(rate, self.max_rate)
+        return rate
+
+    def _measure(self, nbytes: int, now: float):
+        self._window_bytes += nbytes
+        elapsed = now - self._window_start
+        if elapsed < 1:
+            return
+        rate = self._window_bytes / elapsed
+        if self.is_interactive_active():
+            self.capacity = max(self.capacity, rate)
+        else:
+            # 不限速时缓慢衰减, 网络变慢后估计值能跟上
+            self.capacity = max(rate, self.capacity * 0.99)
+        self._window_start = now
+        self._window_bytes = 0
+
+    def _refill(self, rate: float, now: float):
+        self.tokens = min(rate * self.burst_sec, self.tokens + (now - self.last_refill) * rate)
+        self.last_refill = now
+
+    async def consume(self, nbytes: int, priority: int):
+        """
+        收到数据后调用, 后台下载超过限速时等待
+
+        Args:
+            nbytes: 收到的字节数, 请求开始时传0用来标记前台流量
+            priority: 下载优先级, 见DownloadPriority
+        """
+        now = time.monotonic()
+        self._measure(nbytes, now)
+        if priority < DownloadPriority.Background:
+            self.last_interactive = now
+            self.interactive_bytes += nbytes
+            return
+
+        self.background_bytes += nbytes
+        rate = self.get_rate()
+        if not rate:
+            self.tokens = 0.0
+            self.last_refill = now
+            return
+        self._refill(rate, now)
+        self.tokens -= nbytes
+        start = now
+        while self.tokens < 0:
+            # 分段等待, 前台流量停止后立即恢复
+            await asyncio.sleep(min(-self.tokens / rate, 0.2))
+            now = time.monotonic()
+            rate = self.get_rate()
+            if not rate:
+                self.tokens = 0.0
+                self.last_refill = now
+                break
+            self._refill(rate, now)
+        self.throttled_sec += now - start
+
+    def get_stats(self) -> dict:
+        """
+        获取带宽控制统计
+
+        Returns:
+            统计信息字典
+        """
+        rate = self.get_rate()
+        return {
+            'interactive_active': self.is_interactive_active(),
+            'background_limit_kb': round(rate / 1024, 1) if rate else 0,
+            'capacity_kb': round(self.capacity / 1024, 1),
+            'interactive_mb': round(self.interactive_bytes / 1024 / 1024, 2),
+            'background_mb': round(self.background_bytes / 1024 / 1024, 2),
+            'throttled_sec': round(self.throttled_sec, 1),
+        }
+
+
+# 全局单例
+_global_bandwidth_limiter: Optional[BandwidthLimiter] = None
+_bandwidth_lock = threading.Lock()
+
+
+def get_bandwidth_limiter() -> BandwidthLimiter:
+    """获取全局带宽控制实例（单例模式）"""
+    global _global_bandwidth_limiter
+
+    if _global_bandwidth_limiter is None:
+        with _bandwidth_lock:
+            if _global_bandwidth_limiter is None:
+                from config import config
+                from tools.performance_monitor import get_performance_monitor
+
+                _global_bandwidth_limiter = BandwidthLimiter(config.DownloadBackgroundShare,
+                                                             config.DownloadBackgroundRate,
+                                                             config.DownloadBackgroundMinRate)
+                get_performance_monitor().register_provider("bandwidth", _global_bandwidth_limiter.get_stats)
+                Log.Info("[BandwidthLimiter] Initialized, share={}, max_rate={}",
+                         config.DownloadBackgroundShare, config.DownloadBackgroundRate)
+
+    return _global_bandwidth_limiter
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+图片内容仓库
+按sha256保存图片, 缓存、下载、waifu2x目录下相同内容的图片都硬链接到同一个blob
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from tools.log import Log
+
+
+class BlobStore(object):
+    """
+    内容寻址的图片仓库
+
+    目录结构:
+        <root>/ab/<sha256>               blob, 原来的路径都是它的硬链接
+        <root>/derived/ab/<sha256>.<tag> 转换结果索引, 内容为输出图片的sha256
+
+    特性:
+    - 同样的内容只保存一份, 再次写入只增加一个硬链接
+    - 引用计数就是硬链接数(st_nlink - 1), 用户直接删除下载目录也不会算错
+    - 所有路径都是整体替换(os.replace), 不会原地改写被共享的文件
+    - 不能建硬链接时(跨分区)退回复制
+    """
+
+    DerivedDir = "derived"
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: 仓库目录, 要和缓存、下载目录在同一个分区才能硬链接
+        """
+        self.root = root
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.stats = {
+            'puts': 0,            # 写入次数
+            'blobs': 0,           # 新建的blob
+            'dedup': 0,           # 内容已存在, 没有再保存的次数
+            'links': 0,           # 建立的硬链接
+            'copies': 0,          # 不能硬链接时复制的次数
+            'derived_hits': 0,    # 命中转换结果, 不用再转换的次数
+            'saved_bytes': 0,     # 没有重复保存的字节数
+        }
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.isfile(self.blob_path(digest))
+
+    def refcount(self, digest: str) -> int:
+        """除了blob自己以外的链接数"""
+        try:
+            return os.stat(self.blob_path(digest)).st_nlink - 1
+        except OSError:
+            return 0
+
+    def put_file(self, tmpPath: str, paths: Iterable[str], digest: str = None) -> str:
+        """
+        把写好的临时文件放进仓库, paths都链接到同一个blob
+
+        Args:
+            tmpPath: 临时文件, 成功后被移走或删除
+            paths: 目标路径
+            digest: 已经算好的sha256, None时读文件计算
+        Returns:
+            sha256
+        """
+        if digest is None:
+            digest = self.hash_file(tmpPath)
+        blob = self.blob_path(digest)
+        size = os.path.getsize(tmpPath)
+        with self._lock:
+            self.stats['puts'] += 1
+            if os.path.isfile(blob):
+                os.remove(tmpPath)
+                self.stats['dedup'] += 1
+                self.stats['saved_bytes'] += size
+            else:
+                self._makedirs(blob)
+                os.replace(tmpPath, blob)
+                self.stats['blobs'] += 1
+            for path in paths:
+                self._link(blob, path)
+        return digest
+
+    def put_bytes(self, data: bytes, paths: Iterable[str]) -> str:
+        """保存图片数据, paths都链接到同一个blob, 返回sha256"""
+        digest = self.hash_bytes(data)
+        blob = self.blob_path(digest)
+        with self._lock:
+            self.stats['puts'] += 1
+            if os.path.isfile(blob):
+                self.stats['dedup'] += 1
+                self.stats['saved_bytes'] += len(data)
+            else:
+                self._makedirs(blob)
+                tmpPath = "{}.{}.part".format(blob, uuid.uuid4().hex[:8])
+                with open(tmpPath, "wb") as f:
+                    f.write(data)
+                os.replace(tmpPath, blob)
+                self.stats['blobs'] += 1
+            for path in paths:
+                self._link(blob, path)
+        return digest
+
+    def link_file(self, srcPath: str, paths: Iterable[str] = ()) -> str:
+        """
+        把已有的文件收进仓库, 再链接到paths
+        内容已经存在时srcPath也换成硬链接, 释放重复的空间
+        """
+        digest = self.hash_file(srcPath)
+        blob = self.blob_path(digest)
+        with self._lock:
+            if not os.path.isfile(blob):
+                self._makedirs(blob)
+                try:
+                    os.link(srcPath, blob)
+                except OSError:
+                    tmpPath = "{}.{}.part".format(blob, uuid.uuid4().hex[:8])
+                    shutil.copyfile(srcPath, tmpPath)
+                    os.replace(tmpPath, blob)
+                    self.stats['copies'] += 1
+                self.stats['blobs'] += 1
+            elif not os.path.samefile(srcPath, blob):
+                self.stats['dedup'] += 1
+                self.stats['saved_bytes'] += os.path.getsize(blob)
+                self._link(blob, srcPath)
+            for path in paths:
+                if not os.path.isfile(path):
+                    self.stats['saved_bytes'] += os.path.getsize(blob)
+                self._link(blob, path)
+        return digest
+
+    def link_digest(self, digest: str, paths: Iterable[str]) -> bool:
+        """已有的blob链接到paths, blob不存在时返回False"""
+        blob = self.blob_path(digest)
+        with self._lock:
+            if not os.path.isfile(blob):
+                return False
+            for path in paths:
+                self._link(blob, path)
+        return True
+
+    def _link(self, blob: str, path: str):
+        # 先在旁边建好链接再替换, 不会留下写了一半的文件
+        try:
+            if os.path.samefile(blob, path):
+                return
+        except OSError:
+            pass
+        self._makedirs(path)
+        tmpPath = "{}.{}.part".format(path, uuid.uuid4().hex[:8])
+        try:
+            os.link(blob, tmpPath)
+            self.stats['links'] += 1
+        except OSError:
+            shutil.copyfile(blob, tmpPath)
+            self.stats['copies'] += 1
+        os.replace(tmpPath, path)
+
+    @staticmethod
+    def _makedirs(path: str):
+        fileDir = os.path.dirname(path)
+        if fileDir and not os.path.isdir(fileDir):
+            os.makedirs(fileDir, exist_ok=True)
+
+    def _derived_path(self, srcDigest: str, tag: str) -> str:
+        return os.path.join(self.root, self.DerivedDir, srcDigest[:2], "{}.{}".format(srcDigest, tag))
+
+    def get_derived(self, srcDigest: str, tag: str) -> Optional[str]:
+        """srcDigest用tag方式转换后的sha256, 没有记录或blob已被回收时返回None"""
+        try:
+            with open(self._derived_path(srcDigest, tag), "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        if not digest or not self.has(digest):
+            return None
+        with self._lock:
+            self.stats['derived_hits'] += 1
+        return digest
+
+    def put_derived(self, srcDigest: str, tag: str, digest: str):
+        """记录转换结果"""
+        path = self._derived_path(srcDigest, tag)
+        self._makedirs(path)
+        tmpPath = "{}.{}.part".format(path, uuid.uuid4().hex[:8])
+        with open(tmpPath, "w") as f:
+            f.write(digest)
+        os.replace(tmpPath, path)
+
+    def iter_blobs(self):
+        """遍历 (sha256, 路径, stat)"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            subDir = os.path.join(self.root, name)
+            if len(name) != 2 or not os.path.isdir(subDir):
+                continue
+            for digest in os.listdir(subDir):
+                if digest.endswith(".part"):
+                    continue
+                path = os.path.join(subDir, digest)
+                try:
+                    yield digest, path, os.stat(path)
+                except OSError:
+                    pass
+
+    def gc(self) -> Tuple[int, int]:
+        """删除没有被引用的blob和失效的转换记录, 返回(删除数, 字节数)"""
+        num, size = 0, 0
+        with self._lock:
+            for digest, path, st in list(self.iter_blobs()):
+                if st.st_nlink > 1:
+                    continue
+                try:
+                    os.remove(path)
+                    num += 1
+                    size += st.st_size
+                except OSError as es:
+                    Log.Error(es)
+            derivedDir = os.path.join(self.root, self.DerivedDir)
+            for dirPath, _, names in os.walk(derivedDir):
+                for name in names:
+                    path = os.path.join(dirPath, name)
+                    try:
+                        with open(path, "r") as f:
+                            digest = f.read().strip()
+                        if not os.path.isfile(self.blob_path(digest)):
+                            os.remove(path)
+                    except OSError:
+                        pass
+        Log.Info("[BlobStore] gc remove:{}, size:{}".format(num, size))
+        return num, size
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+def scan_duplicates(dirs: Iterable[str]) -> Dict[str, int]:
+    """
+    统计目录下的重复图片, 硬链接的同一个文件只算一次
+
+    Returns:
+        files: 文件数
+        total_bytes: 所有文件大小之和
+        disk_bytes: 实际占用(同一inode只算一次)
+        unique_bytes: 去重后的大小
+        linked_bytes: 已经通过硬链接省下的空间
+        reclaimable_bytes: 去重还能省下的空间
+    """
+    inodes = {}     # (dev, ino) -> (size, path)
+    files, totalBytes = 0, 0
+    for root in dirs:
+        for dirPath, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(dirPath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files += 1
+                totalBytes += st.st_size
+                inodes.setdefault((st.st_dev, st.st_ino), (st.st_size, path))
+
+    # 大小相同才需要计算hash
+    bySize = {}
+    for size, path in inodes.values():
+        bySize.setdefault(size, []).append(path)
+    diskBytes, uniqueBytes = 0, 0
+    for size, paths in bySize.items():
+        diskBytes += size * len(paths)
+        if len(paths) == 1:
+            uniqueBytes += size
+            continue
+        digests = set()
+        for path in paths:
+            try:
+                digests.add(BlobStore.hash_file(path))
+            except OSError:
+                digests.add(path)
+        uniqueBytes += size * len(digests)
+    return {
+        'files': files,
+        'total_bytes': totalBytes,
+        'disk_bytes': diskBytes,
+        'unique_bytes': uniqueBytes,
+        'linked_bytes': totalBytes - diskBytes,
+        'reclaimable_bytes': diskBytes - uniqueBytes,
+    }
+
+
+# 全局单例
+_global_blob_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """获取图片仓库, 没有开启或没有设置保存路径时返回None"""
+    global _global_blob_store
+    from config import config
+    from config.setting import Setting
+
+    if not config.IsUseBlobStore or not Setting.SavePath.value:
+        return None
+    root = os.path.join(Setting.SavePath.value, config.BlobStoreDir)
+    if _global_blob_store is None or _global_blob_store.root != root:
+        with _store_lock:
+            if _global_blob_store is None or _global_blob_store.root != root:
+                from tools.performance_monitor import get_performance_monitor
+
+                _global_blob_store = BlobStore(root)
+                get_performance_monitor().register_provider("blob_store", _global_blob_store.get_stats)
+    return _global_blob_store
@@ -1,5 +1,7 @@
 import os
+import threading
 
+from config import config
 from server import ToolUtil, Status, Log
 from server import req
 # 一张图
@@ -66,6 +68,9 @@ class BookMgr(Singleton):
     def __init__(self):
         super(self.__class__, self).__init__()
         self.books = {}      # id: book
+        # bookId -> 正在进行的章节加载, 同一本书的调用共用
+        self.epsLoads = {}
+        self.epsLoadLock = threading.Lock()
 
     @property
     def server(self):
@@ -83,8 +88,11 @@ class BookMgr(Singleton):
                 info = self.books.get(backData.res.data['comic']['_id'])
                 if not info:
                     info = Book()
+                oldVersion = (info.epsCount, info.updated_at)
                 ToolUtil.ParseFromData(info, backData.res.data['comic'])
                 self.books[info.id] = info
+                if oldVersion[0] > 0 and oldVersion != (info.epsCount, info.updated_at):
+                    self.ResetEps(info)
                 return Status.Ok
             else:
                 if backData.res.message == "under review":
@@ -94,6 +102,25 @@ class BookMgr(Singleton):
             Log.Error(es)
             return Status.NetError
 
+    @staticmethod
+    def ResetEps(info):
+        """
+        书有更新, 删除章节列表和章节图片的缓存, 已经加载的分页下次重新请求
+        """
+        Log.Info("book update, reset eps, book_id:{}, eps_count:{}, updated_at:{}", info.id, info.epsCount, info.updated_at)
+        info.curLoadEps.clear()
+        info.maxLoadEps = 0
+        for epsInfo in info.epsDict.values():
+            epsInfo.curLoadPicPages.clear()
+            epsInfo.maxPicPages = 0
+        if not config.IsUseApiCache:
+            return
+        from tools.response_cache import get_response_cache
+        cache = get_response_cache()
+        prefix = config.Url + "comics/{}/".format(info.id)
+        for reqName in (req.GetComicsBookEpsReq.__name__, req.GetComicsBookOrderReq.__name__):
+            cache.invalidate_prefix(reqName, prefix)
+
     def AddBookByDb(self, dbBook):
         from server.sql_server import DbBook
         assert isinstance(dbBook, DbBook)
@@ -185,6 +212,95 @@ class BookMgr(Singleton):
             Log.Error(es)
             return Status.Error
 
+    def LoadEps(self, bookId, callBack, backParam=None, reloadPages=()):
+        """
+        加载全部章节到Book.epsDict
+        第一页返回总页数后, 其余分页最多同时请求config.EpsLoadConcurrency个
+        reloadPages: 已经加载过也要重新请求的分页, 例如书更新后新增章节所在的页
+        完成后在UI线程调用 callBack({"st": st}, backParam)
+        """
+        info = self.books.get(bookId)
+        if not info:
+            self._CallEpsBack(callBack, backParam, Status.NotFoundBook)
+            return
+        with self.epsLoadLock:
+            load = self.epsLoads.get(bookId)
+            if load:
+                load["waiters"].append((callBack, backParam))
+                self._AddReloadPages(load, reloadPages)
+                return
+            load = {"pages": [], "sent": set(), "reload": set(), "inflight": 0, "st": Status.Ok, "isScan": False, "waiters": [(callBack, backParam)]}
+            self.epsLoads[bookId] = load
+            if info.maxLoadEps <= 0:
+                # 先请求第一页得到总页数
+                load["pages"].append(1)
+            else:
+                self._ScanEpsPages(info, load)
+                self._AddReloadPages(load, reloadPages)
+        self._LoadNextEps(bookId)
+
+    def _LoadNextEps(self, bookId):
+        sendPages = []
+        with self.epsLoadLock:
+            load = self.epsLoads.get(bookId)
+            if not load:
+                return
+            while load["pages"] and load["inflight"] < config.EpsLoadConcurrency:
+                page = load["pages"].pop(0)
+                sendPages.append(page)
+                load["sent"].add(page)
+                load["inflight"] += 1
+            isFinish = not load["pages"] and load["inflight"] <= 0
+            if isFinish:
+                self.epsLoads.pop(bookId)
+        if isFinish:
+            for callBack, backParam in load["waiters"]:
+                self._CallEpsBack(callBack, backParam, load["st"])
+            return
+        from task.task_http import TaskHttp
+        for page in sendPages:
+            request = req.GetComicsBookEpsReq(bookId, page)
+            request.isNoCache = page in load["reload"]
+            TaskHttp().AddHttpTask(request, self._LoadEpsBack, bookId)
+
+    def _LoadEpsBack(self, raw, bookId):
+        info = self.books.get(bookId)
+        with self.epsLoadLock:
+            load = self.epsLoads.get(bookId)
+            if not load:
+                return
+            load["inflight"] -= 1
+            if raw["st"] != Status.Ok:
+                # 失败时不再继续请求, 由调用方决定是否重试
+                load["st"] = raw["st"]
+                load["pages"].clear()
+            elif info and not load["isScan"] and info.maxLoadEps > 0:
+                self._ScanEpsPages(info, load)
+        self._LoadNextEps(bookId)
+
+    @staticmethod
+    def _ScanEpsPages(info, load):
+        load["isScan"] = True
+        load["pages"] += [page for page in range(1, info.maxLoadEps + 1)
+                          if page not in info.curLoadEps and page not in load["pages"]]
+
+    @staticmethod
+    def _AddReloadPages(load, pages):
+        # 这次加载已经请求过的分页不再重复请求, 重新请求的分页不读缓存
+        pages = [page for page in pages if page not in load["sent"]]
+        load["reload"].update(pages)
+        load["pages"] += [page for page in pages if page not in load["pages"]]
+
+    @staticmethod
+    def _CallEpsBack(callBack, backParam, st):
+        try:
+            if backParam is None:
+                callBack({"st": st})
+            else:
+                callBack({"st": st}, backParam)
+        except Exception as es:
+            Log.Error(es)
+
     def AddBookEpsPicInfoBack(self, backData):
         # 此处在线程中加载后续分页 TODO 分页太多时会导致太慢
         try:
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+DNS解析缓存模块
+缓存getaddrinfo的结果，支持失败缓存、A/AAAA并行查询和过期前后台刷新
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from tools.log import Log
+
+
+class _DnsEntry:
+    def __init__(self, result, error, tick, ttl):
+        self.result = result
+        self.error = error
+        self.tick = tick
+        self.ttl = ttl
+        self.refreshing = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.tick
+
+
+class DnsCache:
+    """
+    DNS解析缓存
+
+    特性:
+    - 系统解析器不返回TTL，成功结果按ttl缓存，失败结果按negative_ttl缓存
+    - 未指定协议族时A和AAAA并行查询，按PreIpv6设置决定返回顺序
+    - 超过ttl的refresh_ahead比例后返回旧结果并后台刷新，请求不用等DNS
+    - 线程安全
+    """
+
+    def __init__(self, resolver: Callable = socket.getaddrinfo, ttl: float = 300, negative_ttl: float = 30,
+                 refresh_ahead: float = 0.8, max_entries: int = 1000):
+        """
+        初始化DNS缓存
+
+        Args:
+            resolver: 实际的getaddrinfo
+            ttl: 成功结果的缓存时间(秒)
+            negative_ttl: 失败结果的缓存时间(秒)
+            refresh_ahead: 缓存时间过了多少比例后后台刷新
+            max_entries: 最大缓存条目数
+        """
+        self.resolver = resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_entries = max_entries
+        self.prefer_ipv6 = False
+        self.parallel = True
+
+        self.cache = {}
+        self.lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="DNS")
+        # 后台刷新单独一个线程, 避免刷新任务占满线程池后等不到并行查询
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DNS-Refresh")
+
+        # 统计信息
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @staticmethod
+    def _is_ip(host) -> bool:
+        try:
+            ipaddress.ip_address(host.decode() if isinstance(host, bytes) else host)
+            return True
+        except ValueError:
+            return False
+
+    def resolve(self, host, port, family=0, type=0, proto=0, flags=0):
+        """
+        与socket.getaddrinfo参数相同
+        """
+        if not host or self._is_ip(host):
+            return self.resolver(host, port, family, type, proto, flags)
+
+        key = (host, port, family, type, proto, flags)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and entry.age < entry.ttl:
+                isRefresh = entry.error is None and not entry.refreshing and \
+                    entry.age >= entry.ttl * self.refresh_ahead
+                if isRefresh:
+                    entry.refreshing = True
+                if entry.error is not None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+            else:
+                entry = None
+                isRefresh = False
+                self.misses += 1
+
+        if entry:
+            if isRefresh:
+                self._refresher.submit(self._refresh, key)
+            if entry.error is not None:
+                raise entry.error
+            return list(entry.result)
+        return self._lookup(key)
+
+    def _lookup(self, key):
+        try:
+            result = self._resolve(*key)
+        except socket.gaierror as es:
+            with self.lock:
+                self.errors += 1
+                self._put(key, _DnsEntry(None, es, time.monotonic(), self.negative_ttl))
+            raise
+        with self.lock:
+            self._put(key, _DnsEntry(result, None, time.monotonic(), self.ttl))
+        return list(result)
+
+    def _refresh(self, key):
+        with self.lock:
+            self.refreshes += 1
+        try:
+            self._lookup(key)
+        except Exception as es:
+            # 刷新失败时保留旧结果直到过期
+            Log.Debug("[DnsCache] refresh {} error, {}".format(key[0], es))
+            with self.lock:
+                entry = self.cache.get(key)
+                if entry:
+                    entry.refreshing = False
+
+    def _put(self, key, entry):
+        if key not in self.cache and len(self.cache) >= self.max_entries:
+            oldest = min(self.cache, key=lambda k: self.cache[k].tick)
+            self.cache.pop(oldest)
+        # 刷新失败不覆盖还有效的旧结果
+        old = self.cache.get(key)
+        if entry.error is not None and old and old.error is None and old.age < old.ttl:
+            old.refreshing = False
+            return
+        self.cache[key] = entry
+
+    def _resolve(self, host, port, family, type, proto, flags):
+        if family != socket.AF_UNSPEC or not self.parallel or not socket.has_ipv6:
+            return self.resolver(host, port, family, type, proto, flags)
+
+        # A和AAAA并行查询
+        futures = [self._executor.submit(self.resolver, host, port, af, type, proto, flags)
+                   for af in (socket.AF_INET, socket.AF_INET6)]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except socket.gaierror as es:
+                results.append([])
+                errors.append(es)
+        ipv4, ipv6 = results
+        if not ipv4 and not ipv6:
+            raise errors[0]
+        return ipv6 + ipv4 if self.prefer_ipv6 else ipv4 + ipv6
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.cache.clear()
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            total_requests = self.hits + self.negative_hits + self.misses
+            hit_rate = (self.hits + self.negative_hits) / total_requests if total_requests > 0 else 0
+            return {
+                'entries': len(self.cache),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+                'hit_rate': hit_rate,
+            }
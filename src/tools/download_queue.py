@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+带优先级的下载队列
+阅读页优先，其余任务按等待时间老化，低优先级不会被饿死
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+
+
+class DownloadPriority:
+    """下载优先级，数值越小越优先"""
+    Visible = 0       # 阅读器当前显示的页
+    Preload = 1       # 阅读器预加载
+    Cover = 2         # 封面、头像、聊天图片
+    Background = 3    # 下载管理器的后台下载
+
+    Names = {Visible: "visible", Preload: "preload", Cover: "cover", Background: "background"}
+
+
+class DownloadQueue:
+    """
+    下载优先级队列, 只能在事件循环线程中使用
+
+    特性:
+    - Visible级别单独排队，总是最先取出
+    - 其余级别按 入队时间 + 优先级 * agingSec 排序，
+      等待agingSec秒的任务相当于提升一个级别
+    - 预留的worker只取Visible任务，保证后台下载占满并发时阅读页也能立刻开始
+    """
+
+    def __init__(self, agingSec: float = 5):
+        """
+        Args:
+            agingSec: 提升一个优先级所需的等待时间(秒)
+        """
+        self.agingSec = agingSec
+        self._urgent = collections.deque()
+        self._heap = []
+        self._seq = itertools.count()
+        self._waiters = collections.deque()
+        self._counts = collections.Counter()
+
+    def qsize(self):
+        return len(self._urgent) + len(self._heap)
+
+    def put_nowait(self, item, priority=DownloadPriority.Background):
+        if priority <= DownloadPriority.Visible:
+            self._urgent.append((priority, item))
+        else:
+            key = time.monotonic() + priority * self.agingSec
+            heapq.heappush(self._heap, (key, next(self._seq), priority, item))
+        self._counts[priority] += 1
+        self._Wakeup()
+
+    def _Wakeup(self):
+        for waiter in self._waiters:
+            future, onlyUrgent = waiter
+            if future.done():
+                continue
+            if onlyUrgent and not self._urgent:
+                continue
+            future.set_result(None)
+            self._waiters.remove(waiter)
+            return
+
+    def _Pop(self, onlyUrgent):
+        if self._urgent:
+            priority, item = self._urgent.popleft()
+        elif self._heap and not onlyUrgent:
+            _, _, priority, item = heapq.heappop(self._heap)
+        else:
+            return False, None
+        self._counts[priority] -= 1
+        return True, item
+
+    async def get(self, onlyUrgent=False):
+        """
+        取出下一个任务
+
+        Args:
+            onlyUrgent: 只取Visible级别的任务
+        """
+        while True:
+            ok, item = self._Pop(onlyUrgent)
+            if ok:
+                return item
+            waiter = (asyncio.get_running_loop().create_future(), onlyUrgent)
+            self._waiters.append(waiter)
+            try:
+                await waiter[0]
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+    def get_stats(self) -> dict:
+        """各优先级排队中的任务数"""
+        stats = {name: self._counts[priority] for priority, name in DownloadPriority.Names.items()}
+        stats["waiting"] = self.qsize()
+        return stats
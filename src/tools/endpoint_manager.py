@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+线路自动选择模块
+后台持续测速，按延迟和失败率选择API和图片的最佳线路，失败时自动切换
+"""
+
+import asyncio
+import collections
+import threading
+import time
+from typing import Callable, Optional
+
+from tools.log import Log
+
+
+class Route:
+    """一条线路: 直连、指定IP或反代域名"""
+
+    def __init__(self, kind: str, index: int, address: str = "", proxyUrl: str = ""):
+        """
+        Args:
+            kind: "api" 或 "img"
+            index: 对应设置界面中的分流编号
+            address: 指定的IP, 空表示使用系统DNS
+            proxyUrl: 反代域名
+        """
+        self.kind = kind
+        self.index = index
+        self.address = address
+        self.proxyUrl = proxyUrl
+
+    @property
+    def name(self) -> str:
+        return "{}{}".format(self.kind, self.index)
+
+    def __eq__(self, other):
+        return isinstance(other, Route) and (self.kind, self.index, self.address, self.proxyUrl) == \
+            (other.kind, other.index, other.address, other.proxyUrl)
+
+    def __hash__(self):
+        return hash((self.kind, self.index, self.address, self.proxyUrl))
+
+    def __repr__(self):
+        return "Route({}, address={}, proxy={})".format(self.name, self.address, self.proxyUrl)
+
+
+class RouteStats:
+    """一条线路最近的测速结果"""
+
+    def __init__(self, window: int):
+        self.latencies = collections.deque(maxlen=window)
+        self.results = collections.deque(maxlen=window)
+        self.throughput = 0.0     # 字节/秒, EWMA
+        self.failStreak = 0       # 连续失败次数
+        self.lastProbe = 0.0
+
+    def add(self, ok: bool, latency: Optional[float] = None, throughput: Optional[float] = None):
+        self.results.append(ok)
+        if ok:
+            self.failStreak = 0
+            if latency is not None:
+                self.latencies.append(latency)
+            if throughput:
+                self.throughput = throughput if not self.throughput else self.throughput * 0.7 + throughput * 0.3
+        else:
+            self.failStreak += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+    @property
+    def fail_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    @property
+    def score(self) -> float:
+        """越小越好, 没有成功记录的线路不参与选择"""
+        p50 = self.percentile(0.5)
+        if p50 is None or self.failStreak >= 3:
+            return float("inf")
+        p95 = self.percentile(0.95)
+        return (p50 + 0.5 * (p95 - p50)) * (1 + 4 * self.fail_rate)
+
+
+class EndpointManager:
+    """
+    线路自动选择, 只能在事件循环中运行run()
+
+    特性:
+    - 定时并发测速所有线路, 同时进行的测速数和单条线路的测速间隔都有限制
+    - 正常请求的结果也计入统计
+    - 按 p50/p95延迟 和 失败率 打分, 新线路要明显更好才切换, 避免来回抖动
+    - 当前线路连续失败时立即切到次优线路, 并提前触发一轮测速
+    """
+
+    def __init__(self, probe_func: Callable, routes_func: Callable, on_change: Optional[Callable] = None,
+                 interval: float = 300, concurrency: int = 3, min_probe_gap: float = 30,
+                 window: int = 20, switch_ratio: float = 0.8):
+        """
+        初始化
+
+        Args:
+            probe_func: async probe_func(route) -> (延迟秒, 吞吐字节每秒或None), 失败时抛异常
+            routes_func: routes_func(kind) -> [Route], 每轮测速前重新获取, 设置修改后自动生效
+            on_change: on_change(kind, route) 最佳线路变化时调用
+            interval: 两轮测速的间隔(秒)
+            concurrency: 同时进行的测速数
+            min_probe_gap: 同一条线路两次测速的最小间隔(秒)
+            window: 每条线路保留的最近结果数
+            switch_ratio: 新线路得分低于当前线路的多少倍才切换
+        """
+        self.probe_func = probe_func
+        self.routes_func = routes_func
+        self.on_change = on_change
+        self.interval = interval
+        self.concurrency = concurrency
+        self.min_probe_gap = min_probe_gap
+        self.window = window
+        self.switch_ratio = switch_ratio
+
+        self.lock = threading.RLock()
+        self.routes = {}      # kind -> [Route]
+        self.stats = {}       # route.name -> RouteStats
+        self.current = {}     # kind -> Route
+        self.probe_count = 0
+        self.switch_count = 0
+        self._wakeup = None
+
+    def _get_stats(self, name: str) -> RouteStats:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = RouteStats(self.window)
+            self.stats[name] = stats
+        return stats
+
+    def update_routes(self):
+        """重新获取所有线路"""
+        with self.lock:
+            for kind in ("api", "img"):
+                routes = self.routes_func(kind)
+                old = self.routes.get(kind, [])
+                self.routes[kind] = routes
+                # 线路地址变了, 旧的结果作废
+                for route in old:
+                    if route not in routes:
+                        self.stats.pop(route.name, None)
+                if self.current.get(kind) not in routes:
+                    self.current.pop(kind, None)
+
+    def best(self, kind: str) -> Optional[Route]:
+        """获取当前选择的线路, 还没有测速结果时返回None"""
+        return self.current.get(kind)
+
+    def record(self, name: str, ok: bool, latency: Optional[float] = None, throughput: Optional[float] = None):
+        """
+        记录一次请求或测速的结果
+
+        Args:
+            name: 线路名
+            ok: 是否成功
+            latency: 首字节延迟(秒)
+            throughput: 吞吐(字节/秒)
+        """
+        if not name:
+            return
+        with self.lock:
+            self._get_stats(name).add(ok, latency, throughput)
+            kind = name.rstrip("0123456789")
+            current = self.current.get(kind)
+            isFailover = not ok and current is not None and current.name == name and \
+                self._get_stats(name).failStreak >= 3
+        if isFailover:
+            Log.Warn("[EndpointManager] {} failed, failover".format(name))
+            self._select(kind)
+            self.trigger()
+
+    def trigger(self):
+        """提前开始下一轮测速"""
+        if self._wakeup is not None:
+            self._wakeup.get_loop().call_soon_threadsafe(self._wakeup.set)
+
+    def _select(self, kind: str):
+        with self.lock:
+            routes = self.routes.get(kind, [])
+            if not routes:
+                return
+            best = min(routes, key=lambda route: self._get_stats(route.name).score)
+            bestScore = self._get_stats(best.name).score
+            if bestScore == float("inf"):
+                return
+            current = self.current.get(kind)
+            if current is not None and current != best:
+                curScore = self._get_stats(current.name).score
+                if curScore != float("inf") and bestScore > curScore * self.switch_ratio:
+                    return
+            if current == best:
+                return
+            self.current[kind] = best
+            self.switch_count += 1
+        Log.Info("[EndpointManager] {} route -> {}".format(kind, best))
+        if self.on_change:
+            try:
+                self.on_change(kind, best)
+            except Exception as es:
+                Log.Error(es)
+
+    async def _probe(self, route: Route, semaphore: asyncio.Semaphore):
+        stats = self._get_stats(route.name)
+        if stats.lastProbe and time.monotonic() - stats.lastProbe < self.min_probe_gap:
+            return
+        async with semaphore:
+            stats.lastProbe = time.monotonic()
+            self.probe_count += 1
+            try:
+                latency, throughput = await self.probe_func(route)
+                self.record(route.name, True, latency, throughput)
+            except Exception as es:
+                Log.Debug("[EndpointManager] probe {} error, {}".format(route.name, es.__repr__()))
+                self.record(route.name, False)
+
+    async def probe_all(self):
+        """并发测速所有线路"""
+        self.update_routes()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with self.lock:
+            routes = [route for kind in self.routes.values() for route in kind]
+        await asyncio.gather(*[self._probe(route, semaphore) for route in routes])
+        for kind in ("api", "img"):
+            self._select(kind)
+
+    async def run(self, delay: float = 10):
+        """
+        后台测速循环
+
+        Args:
+            delay: 启动后等待多久开始第一轮测速(秒)
+        """
+        self._wakeup = asyncio.Event()
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as es:
+                Log.Error(es)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> dict:
+        """
+        获取各线路的测速统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            routes = {}
+            for kind, kindRoutes in self.routes.items():
+                for route in kindRoutes:
+                    stats = self._get_stats(route.name)
+                    p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+                    routes[route.name] = {
+                        'address': route.address or route.proxyUrl,
+                        'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                        'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                        'throughput_kb': round(stats.throughput / 1024, 1),
+                        'fail_rate': round(stats.fail_rate, 2),
+                        'samples': len(stats.results),
+                    }
+            return {
+                'current': {kind: route.name for kind, route in self.current.items()},
+                'probes': self.probe_count,
+                'switches': self.switch_count,
+                'routes': routes,
+            }
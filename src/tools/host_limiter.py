@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+按域名自适应并发控制模块
+AIMD: 延迟正常时每轮加1, 超时、连接重置、429/5xx时减半
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+from tools.log import Log
+
+
+class HostSlot:
+    """一次请求占用的并发名额"""
+
+    def __init__(self, host: str, priority: int):
+        self.host = host
+        self.priority = priority
+        self.start = time.monotonic()
+        self.latency = None
+        self.error = False
+
+    def on_response(self, status: int):
+        """收到响应头时调用, 记录首字节延迟"""
+        self.latency = time.monotonic() - self.start
+        if status == 429 or status >= 500:
+            self.error = True
+
+    def on_error(self, es: Optional[BaseException] = None):
+        """
+        请求失败时调用
+
+        Args:
+            es: 异常, 只有网络相关的异常才算作过载
+        """
+        if es is None or isinstance(es, (httpx.TransportError, ConnectionResetError, asyncio.TimeoutError)):
+            self.error = True
+
+
+class _HostState:
+    def __init__(self, limit: int, history_size: int):
+        self.limit = limit
+        self.inflight = 0
+        self.waiters = []
+        self.good = 0             # 本轮延迟正常的请求数
+        self.latency = 0.0        # 首字节延迟的EWMA
+        self.baseline = 0.0       # 健康时的延迟基线
+        self.successes = 0
+        self.errors = 0
+        self.last_decrease = 0.0
+        self.history = collections.deque(maxlen=history_size)
+
+
+class HostLimiter:
+    """
+    按域名的AIMD并发控制, 只能在事件循环线程中使用
+
+    特性:
+    - 每个域名单独维护并发上限
+    - 一轮(limit个)请求的延迟都不超过基线的latency_factor倍时上限加1
+    - 超时、连接重置、429或5xx时上限减半, cooldown秒内只减一次
+    - 排队按优先级唤醒, Visible级别可以额外超出reserve个名额
+    """
+
+    def __init__(self, initial: int = 6, min_limit: int = 1, max_limit: int = 64, reserve: int = 4,
+                 latency_factor: float = 2.0, cooldown: float = 1.0, history_size: int = 60):
+        """
+        初始化
+
+        Args:
+            initial: 初始并发上限
+            min_limit: 最小并发上限
+            max_limit: 最大并发上限
+            reserve: Visible级别可以超出上限的名额
+            latency_factor: 延迟超过基线多少倍时不再加并发
+            cooldown: 两次减半的最小间隔(秒)
+            history_size: 保留的上限变化记录数
+        """
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.reserve = reserve
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.history_size = history_size
+        self.hosts = {}
+        self._seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def _get_state(self, host: str) -> _HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            with self.lock:
+                state = _HostState(self.initial, self.history_size)
+                self.hosts[host] = state
+        return state
+
+    def _can_run(self, state: _HostState, priority: int) -> bool:
+        limit = state.limit + self.reserve if priority <= 0 else state.limit
+        return state.inflight < limit
+
+    async def acquire(self, host: str, priority: int = 0) -> HostSlot:
+        """
+        等待并占用一个并发名额
+
+        Args:
+            host: 域名
+            priority: 优先级, 数值越小越优先, 见DownloadPriority
+        """
+        state = self._get_state(host)
+        if not state.waiters and self._can_run(state, priority):
+            state.inflight += 1
+            return HostSlot(host, priority)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._seq), future)
+        heapq.heappush(state.waiters, waiter)
+        self._wakeup(state)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经分配了名额
+                self._release_slot(state)
+            elif waiter in state.waiters:
+                state.waiters.remove(waiter)
+                heapq.heapify(state.waiters)
+            raise
+        return HostSlot(host, priority)
+
+    def _wakeup(self, state: _HostState):
+        while state.waiters:
+            priority, _, future = state.waiters[0]
+            if future.done():
+                heapq.heappop(state.waiters)
+                continue
+            if not self._can_run(state, priority):
+                return
+            heapq.heappop(state.waiters)
+            state.inflight += 1
+            future.set_result(None)
+
+    def _release_slot(self, state: _HostState):
+        state.inflight -= 1
+        self._wakeup(state)
+
+    def release(self, slot: HostSlot):
+        """释放名额并根据结果调整上限"""
+        state = self._get_state(slot.host)
+        now = time.monotonic()
+        if slot.error:
+            state.errors += 1
+            state.good = 0
+            if now - state.last_decrease >= self.cooldown and state.limit > self.min_limit:
+                self._set_limit(state, slot.host, max(self.min_limit, state.limit // 2), "decrease")
+                state.last_decrease = now
+        elif slot.latency is not None:
+            state.successes += 1
+            latency = slot.latency
+            state.latency = latency if not state.latency else state.latency * 0.8 + latency * 0.2
+            if not state.baseline or state.latency < state.baseline:
+                state.baseline = state.latency
+            else:
+                # 基线缓慢跟随, 网络整体变慢后不会一直卡在低并发
+                state.baseline += (state.latency - state.baseline) * 0.01
+
+            if latency <= state.baseline * self.latency_factor:
+                state.good += 1
+                if state.good >= state.limit and state.limit < self.max_limit:
+                    self._set_limit(state, slot.host, state.limit + 1, "increase")
+                    state.good = 0
+            else:
+                state.good = 0
+        self._release_slot(state)
+
+    def _set_limit(self, state: _HostState, host: str, limit: int, reason: str):
+        Log.Debug(f"[HostLimiter] {host} limit {state.limit}->{limit}, {reason}")
+        state.limit = limit
+        state.history.append((round(time.time(), 1), limit, reason))
+
+    def get_limit(self, host: str) -> int:
+        """获取域名当前的并发上限"""
+        return self._get_state(host).limit
+
+    def get_stats(self) -> dict:
+        """
+        获取各域名的并发统计
+
+        Returns:
+            {域名: 统计信息}
+        """
+        with self.lock:
+            hosts = list(self.hosts.items())
+        stats = {}
+        for host, state in hosts:
+            stats[host] = {
+                'limit': state.limit,
+                'inflight': state.inflight,
+                'waiting': len(state.waiters),
+                'latency_ms': round(state.latency * 1000, 1),
+                'baseline_ms': round(state.baseline * 1000, 1),
+                'successes': state.successes,
+                'errors': state.errors,
+                'history': list(state.history),
+            }
+        return stats
+
+
+# 全局单例
+_global_host_limiter: Optional[HostLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_host_limiter() -> HostLimiter:
+    """获取全局并发控制实例（单例模式）"""
+    global _global_host_limiter
+
+    if _global_host_limiter is None:
+        with _limiter_lock:
+            if _global_host_limiter is None:
+                from config import config
+                from tools.performance_monitor import get_performance_monitor
+
+                _global_host_limiter = HostLimiter(config.HostLimitInit, config.HostLimitMin, config.HostLimitMax,
+                                                   config.DownloadReserveNum)
+                get_performance_monitor().register_provider("host_limit", _global_host_limiter.get_stats)
+
+    return _global_host_limiter
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+按域名共享的HTTP/2连接池
+每个域名一个连接池, 同一域名的请求复用一条HTTP/2连接的多个流
+"""
+
+import asyncio
+import collections
+import time
+
+import httpx
+
+from tools.log import Log
+
+
+class _HostPool:
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self.transport = transport
+        self.http_version = ""      # 协议还没确定时为空
+        self.probe = None           # 首个请求建立连接期间不为None, 其他请求等待它
+        self.streams = 0
+        self.waiters = collections.deque()
+        self.last_active = time.monotonic()
+
+        # 统计信息
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.peak_streams = 0
+        self.probe_waits = 0
+
+
+class _ReleaseStream(httpx.AsyncByteStream):
+    """响应体读完或关闭时归还流名额"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class Http2PoolTransport(httpx.AsyncBaseTransport):
+    """
+    按域名共享连接的transport, 只能在事件循环线程中使用
+
+    特性:
+    - 每个域名一个连接池, 连接数不超过max_connections
+    - 协议还没确定时只让第一个请求建立连接, 确认是HTTP/2后其他请求全部复用这条连接,
+      不会因为一批并发请求同时握手而建立很多条连接(经过HTTP/SOCKS代理时尤其明显)
+    - HTTP/2每个域名同时最多max_streams个流, HTTP/1.1每个域名最多max_connections个请求
+    - 空闲超过keepalive_expiry后重新确认协议
+    """
+
+    def __init__(self, proxy=None, max_connections: int = 16, max_streams: int = 100,
+                 keepalive_expiry: float = 30, probe_timeout: float = 5, verify=False):
+        """
+        初始化
+
+        Args:
+            proxy: 代理地址, http://或socks5://
+            max_connections: 每个域名最多的连接数
+            max_streams: 每个域名HTTP/2同时进行的请求数
+            keepalive_expiry: 空闲连接保留时间(秒)
+            probe_timeout: 等待首个连接确定协议的最长时间(秒)
+            verify: 是否校验证书
+        """
+        self.proxy = httpx.Proxy(proxy) if isinstance(proxy, str) else proxy
+        self.max_connections = max_connections
+        self.max_streams = max_streams
+        self.keepalive_expiry = keepalive_expiry
+        self.probe_timeout = probe_timeout
+        # 所有域名共用一个SSLContext, 不用每个域名重新创建
+        self.ssl_context = httpx.create_ssl_context(verify=verify, trust_env=False)
+        self.hosts = {}
+        # 提前创建一个给第一个域名用: 代理格式错误或缺少依赖时在这里抛出, 调用方可以退回不使用代理;
+        # 第一次创建要导入h2等模块, 放在这里不会在事件循环里卡住第一个请求
+        self._spare = self._new_transport()
+
+    def _new_transport(self) -> httpx.AsyncHTTPTransport:
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections,
+                              keepalive_expiry=self.keepalive_expiry)
+        return httpx.AsyncHTTPTransport(verify=self.ssl_context, http2=True, limits=limits, proxy=self.proxy)
+
+    def _get_host(self, url: httpx.URL) -> _HostPool:
+        key = (url.scheme, url.host, url.port)
+        pool = self.hosts.get(key)
+        if pool is None:
+            transport, self._spare = self._spare or self._new_transport(), None
+            pool = _HostPool(transport)
+            self.hosts[key] = pool
+        return pool
+
+    def _limit(self, pool: _HostPool) -> int:
+        return self.max_streams if pool.http_version == "HTTP/2" else self.max_connections
+
+    async def _acquire(self, pool: _HostPool) -> bool:
+        """
+        等待并占用一个流名额
+
+        Returns:
+            是否由这个请求建立连接并确定协议
+        """
+        if pool.http_version and not pool.streams and time.monotonic() - pool.last_active > self.keepalive_expiry:
+            # 连接可能已经空闲关闭
+            pool.http_version = ""
+        while not pool.http_version and pool.probe is not None:
+            pool.probe_waits += 1
+            try:
+                await asyncio.wait_for(pool.probe.wait(), self.probe_timeout)
+            except asyncio.TimeoutError:
+                break
+        isProbe = not pool.http_version and pool.probe is None
+        if isProbe:
+            pool.probe = asyncio.Event()
+
+        if not pool.waiters and pool.streams < self._limit(pool):
+            pool.streams += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            pool.waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 已经分配了名额
+                    self._release(pool)
+                elif future in pool.waiters:
+                    pool.waiters.remove(future)
+                if isProbe:
+                    self._end_probe(pool, "")
+                raise
+        pool.peak_streams = max(pool.peak_streams, pool.streams)
+        return isProbe
+
+    def _wakeup(self, pool: _HostPool):
+        while pool.waiters and pool.streams < self._limit(pool):
+            future = pool.waiters.popleft()
+            if future.done():
+                continue
+            pool.streams += 1
+            future.set_result(None)
+
+    def _release(self, pool: _HostPool):
+        pool.streams -= 1
+        pool.last_active = time.monotonic()
+        self._wakeup(pool)
+
+    def _end_probe(self, pool: _HostPool, version: str):
+        if version:
+            pool.http_version = version
+        if pool.probe is not None:
+            pool.probe.set()
+            pool.probe = None
+        # 确认是HTTP/2后名额变多
+        self._wakeup(pool)
+
+    def _make_trace(self, pool: _HostPool, isProbe: bool, trace):
+        async def onTrace(name, info):
+            if name.endswith("connect_tcp.complete"):
+                pool.connections += 1
+            elif name.endswith("start_tls.complete"):
+                pool.tls_handshakes += 1
+            elif isProbe and name == "http2.send_connection_init.complete":
+                # 握手完成就放行, 不用等首个请求的响应
+                self._end_probe(pool, "HTTP/2")
+            if trace is not None:
+                await trace(name, info)
+        return onTrace
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self._get_host(request.url)
+        isProbe = await self._acquire(pool)
+        pool.requests += 1
+        request.extensions["trace"] = self._make_trace(pool, isProbe, request.extensions.get("trace"))
+        try:
+            response = await pool.transport.handle_async_request(request)
+        except BaseException as es:
+            if isinstance(es, httpx.TransportError):
+                # 连接出错后重新确认协议
+                pool.http_version = ""
+            if isProbe:
+                self._end_probe(pool, "")
+            self._release(pool)
+            raise
+        version = response.extensions.get("http_version", b"")
+        version = version.decode() if isinstance(version, bytes) else version
+        if version:
+            pool.http_version = version
+        if isProbe:
+            self._end_probe(pool, version)
+        response.stream = _ReleaseStream(response.stream, lambda: self._release(pool))
+        return response
+
+    async def aclose(self):
+        for pool in list(self.hosts.values()):
+            try:
+                await pool.transport.aclose()
+            except Exception as es:
+                Log.Debug("[Http2Pool] Error closing transport: {}", es)
+
+    def get_stats(self) -> dict:
+        """
+        获取各域名的连接统计
+
+        Returns:
+            {域名: 统计信息}
+        """
+        stats = {}
+        for (scheme, host, port), pool in list(self.hosts.items()):
+            name = host if port is None else "{}:{}".format(host, port)
+            stats[name] = {
+                'http_version': pool.http_version,
+                'requests': pool.requests,
+                'connections': pool.connections,
+                'tls_handshakes': pool.tls_handshakes,
+                'streams': pool.streams,
+                'peak_streams': pool.peak_streams,
+                'waiting': len(pool.waiters),
+                'probe_waits': pool.probe_waits,
+            }
+        return stats
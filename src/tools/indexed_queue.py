@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+带成员索引的任务队列
+下载管理器的等待/进行中列表, 几千本书排队时状态切换也是O(1)
+"""
+
+from collections import OrderedDict
+from typing import Iterator
+
+
+class IndexedQueue(object):
+    """
+    按加入顺序排列的队列, 只能在一个线程中使用
+
+    特性:
+    - 加入、删除、判断是否存在都是O(1)
+    - 遍历和first()按加入顺序(FIFO)
+    - 同一个元素只会出现一次, 重复加入保持原来的位置
+    """
+
+    def __init__(self, items=()):
+        # OrderedDict用双向链表保持顺序, 从队首删除是O(1)
+        # 普通dict删除后队首会留下空位, 每次取队首都要跳过, 取完整个队列是O(n^2)
+        self._items = OrderedDict.fromkeys(items)
+
+    def add(self, item) -> bool:
+        """加到队尾, 已经在队列中时不动, 返回是否新加入"""
+        if item in self._items:
+            return False
+        self._items[item] = None
+        return True
+
+    def discard(self, item) -> bool:
+        """删除元素, 返回是否存在"""
+        if item not in self._items:
+            return False
+        del self._items[item]
+        return True
+
+    def first(self):
+        """队首元素, 队列为空时返回None"""
+        return next(iter(self._items), None)
+
+    def popleft(self):
+        """取出队首元素"""
+        item = next(iter(self._items))
+        del self._items[item]
+        return item
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items)
+
+    def __repr__(self):
+        return "IndexedQueue({})".format(list(self._items))
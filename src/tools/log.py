@@ -1,76 +1,132 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import time
 
 from config import config
 from config.setting import Setting
 
 
+class _LazyFormat(object):
+    """日志级别开启时才调用str.format"""
+    __slots__ = ("fmt", "args", "text")
+
+    def __init__(self, fmt, args):
+        self.fmt = fmt
+        self.args = args
+        self.text = None
+
+    def __str__(self):
+        # 多个handler共用同一条记录, 只格式化一次
+        if self.text is None:
+            self.text = str(self.fmt).format(*self.args)
+        return self.text
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # 参数和异常堆栈在调用线程转成文本, 时间和格式交给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = Log.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
 class Log(object):
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter("%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s")
     ch = None
     fh = None
+    qh = None
+    listener = None
+    extraHandlers = []
 
     @staticmethod
     def UpdateLoggingLevel():
         if Setting.LogIndex.value == 0:
-            Log.ch.setLevel(logging.WARN)
-            Log.fh.setLevel(logging.WARN)
-            # Log.logger.setLevel(logging.WARN)
+            level = logging.WARN
         elif Setting.LogIndex.value == 1:
-            Log.ch.setLevel(logging.INFO)
-            Log.fh.setLevel(logging.INFO)
-            # Log.logger.setLevel(logging.INFO)
-        elif Setting.LogIndex.value == 2:
-            Log.ch.setLevel(logging.DEBUG)
-            Log.fh.setLevel(logging.DEBUG)
-            # Log.logger.setLevel(logging.DEBUG)
+            level = logging.INFO
+        else:
+            level = logging.DEBUG
+        for handler in (Log.ch, Log.fh):
+            if handler:
+                handler.setLevel(level)
+        # logger的级别决定是否格式化参数, 关闭的级别几乎没有开销
+        Log.logger.setLevel(level)
         return
 
     @staticmethod
     def Init():
-        formatter = logging.Formatter("%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s")
+        # 修改日志目录时重新初始化, 保留原来的级别
+        chLevel = Log.ch.level if Log.ch else logging.DEBUG
+        fhLevel = Log.fh.level if Log.fh else logging.INFO
+        Log.Stop()
+        for handler in Log.extraHandlers:
+            Log.logger.removeHandler(handler)
 
         ch = logging.StreamHandler()
-        ch.setLevel(logging.DEBUG)
-
-        ch.setFormatter(formatter)
+        ch.setLevel(chLevel)
+        ch.setFormatter(Log.formatter)
         Log.ch = ch
-        Log.logger.addHandler(ch)
 
         logPath = Setting.GetLogPath()
         if not os.path.isdir(logPath):
             os.makedirs(logPath)
         day = time.strftime('%Y%m%d', time.localtime(time.time()))
         logfile = os.path.join(logPath, day+".log")
-        fh = logging.FileHandler(logfile, mode='a', encoding="utf-8")
+        fh = logging.handlers.RotatingFileHandler(logfile, mode='a', maxBytes=config.LogMaxBytes,
+                                                  backupCount=config.LogBackupCount, encoding="utf-8")
+        fh.setLevel(fhLevel)
+        fh.setFormatter(Log.formatter)
         Log.fh = fh
-        fh.setLevel(logging.INFO)
-        formatter = logging.Formatter("%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s")
-        fh.setFormatter(formatter)
-        Log.logger.addHandler(fh)
-        Log.Debug = Log.logger.debug
-        Log.Info = Log.logger.info
-        Log.Warn = Log.logger.warning
-        Log.Error = Log.logger.exception
+
+        # 所有线程只把记录放进队列, 由一个后台线程写入
+        logQueue = queue.SimpleQueue()
+        Log.qh = _QueueHandler(logQueue)
+        Log.logger.addHandler(Log.qh)
+        Log.listener = logging.handlers.QueueListener(logQueue, ch, fh, *Log.extraHandlers, respect_handler_level=True)
+        Log.listener.start()
         return
 
     @staticmethod
-    def Debug(es):
-        Log.logger.debug(es)
+    def Stop():
+        """写完队列中的日志并关闭文件"""
+        if Log.listener:
+            Log.logger.removeHandler(Log.qh)
+            Log.listener.stop()
+            Log.listener = None
+            Log.qh = None
+        if Log.fh:
+            Log.fh.close()
 
     @staticmethod
-    def Info(es):
-        Log.logger.info(es, exc_info=True)
+    def Debug(es, *args):
+        """
+        args不为空时es作为str.format的模板, 级别开启时才格式化
+        例: Log.Debug("dns parse, host:{}->{}", host, address)
+        """
+        if Log.logger.isEnabledFor(logging.DEBUG):
+            Log.logger.debug(_LazyFormat(es, args) if args else es, stacklevel=2)
 
     @staticmethod
-    def Warn(es):
-        Log.logger.warning(es, exc_info=True)
+    def Info(es, *args):
+        if Log.logger.isEnabledFor(logging.INFO):
+            Log.logger.info(_LazyFormat(es, args) if args else es, stacklevel=2)
 
     @staticmethod
-    def Error(es):
-        Log.logger.error(es, exc_info=True)
+    def Warn(es, *args):
+        if Log.logger.isEnabledFor(logging.WARN):
+            Log.logger.warning(_LazyFormat(es, args) if args else es, stacklevel=2)
+
+    @staticmethod
+    def Error(es, *args):
+        Log.logger.error(_LazyFormat(es, args) if args else es, exc_info=True, stacklevel=2)
 
     @staticmethod
     def InstallFilter(stream2):
@@ -104,4 +160,11 @@ class Log(object):
         ch = Stream2Handler(stream2)
         ch.setLevel(logging.DEBUG)
         ch.setFormatter(formatter)
-        Log.logger.addHandler(ch)
+        Log.extraHandlers.append(ch)
+        if Log.listener:
+            Log.listener.handlers = Log.listener.handlers + (ch,)
+        else:
+            Log.logger.addHandler(ch)
+
+
+atexit.register(Log.Stop)
@@ -60,6 +60,9 @@ class PerformanceMonitor:
             'cache_misses': 0,
         }
 
+        # 其他模块注册的统计来源 name -> func() -> dict
+        self.providers = {}
+
         self.lock = threading.RLock()
         self.start_time = time.time()
 
@@ -73,6 +76,17 @@ class PerformanceMonitor:
 
         Log.Info("[PerfMonitor] Initialized")
 
+    def register_provider(self, name: str, func):
+        """
+        注册统计来源，get_statistics 时会调用并合并到结果中
+
+        Args:
+            name: 统计项名称
+            func: 返回统计字典的函数
+        """
+        with self.lock:
+            self.providers[name] = func
+
     def record_image_load(self, duration_ms: float):
         """记录图片加载时间"""
         with self.lock:
@@ -189,6 +203,12 @@ class PerformanceMonitor:
                         'p95': statistics.quantiles(values_list, n=20)[18] if len(values_list) > 20 else max(values_list),
                     }
 
+            for name, func in self.providers.items():
+                try:
+                    stats[name] = func()
+                except Exception as e:
+                    Log.Error(f"[PerfMonitor] Failed to get stats of {name}: {e}")
+
             # 缓存命中率
             total_cache_ops = stats['counters']['cache_hits'] + stats['counters']['cache_misses']
             if total_cache_ops > 0:
@@ -245,6 +265,13 @@ class PerformanceMonitor:
             print(f"  平均延迟: {net_stats['avg_duration_ms']:.1f} ms")
             print(f"  总流量: {net_stats['total_bytes'] / (1024*1024):.2f} MB")
 
+        for name in self.providers:
+            if name not in stats:
+                continue
+            print(f"\n{name}:")
+            for key, value in stats[name].items():
+                print(f"  {key}: {value}")
+
         print("\n" + "="*60 + "\n")
 
     def log_stats(self):
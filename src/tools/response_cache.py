@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+API响应磁盘缓存模块
+按请求类型和URL缓存响应，支持TTL与ETag/Last-Modified重新验证
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from tools.log import Log
+
+
+class CacheEntry:
+    """一条缓存的响应"""
+
+    def __init__(self, status, etag, modified, contentType, body, tick):
+        self.status = status
+        self.etag = etag
+        self.modified = modified
+        self.contentType = contentType
+        self.body = body
+        self.tick = tick
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.tick
+
+
+class ResponseCache:
+    """
+    API响应磁盘缓存
+
+    特性:
+    - SQLite单文件存储，key为 (请求类名, URL)
+    - 保存ETag/Last-Modified，过期后可用条件请求重新验证
+    - 超过条目上限时删除最旧的条目
+    - 线程安全
+    """
+
+    def __init__(self, database: str, max_entries: int = 5000):
+        """
+        初始化缓存
+
+        Args:
+            database: 缓存数据库路径
+            max_entries: 最大缓存条目数
+        """
+        self.database = database
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+
+        # 统计信息
+        self.hits = 0
+        self.stale_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.puts = 0
+
+        fileDir = os.path.dirname(database)
+        if fileDir and not os.path.isdir(fileDir):
+            os.makedirs(fileDir, exist_ok=True)
+        self.conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        except Exception as e:
+            Log.Warn(f"[ResponseCache] WAL mode not supported: {e}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "name TEXT, url TEXT, status INTEGER, etag TEXT, modified TEXT, content_type TEXT, "
+            "body BLOB, tick REAL, PRIMARY KEY(name, url))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS response_tick ON response(tick)")
+
+        Log.Info(f"[ResponseCache] Initialized with {database}, max_entries={max_entries}")
+
+    def get(self, name: str, url: str) -> Optional[CacheEntry]:
+        """
+        获取缓存的响应
+
+        Args:
+            name: 请求类名
+            url: 请求URL
+
+        Returns:
+            缓存条目，未命中返回None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, etag, modified, content_type, body, tick FROM response WHERE name=? AND url=?",
+                (name, url)
+            ).fetchone()
+        if not row:
+            return None
+        return CacheEntry(*row)
+
+    def put(self, name: str, url: str, status: int, etag: str, modified: str, contentType: str, body: bytes):
+        """保存响应"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, url, status, etag, modified, contentType, body, time.time())
+            )
+            self.puts += 1
+            # 每100次写入检查一次条目上限
+            if self.puts % 100 == 0:
+                self._evict()
+
+    def touch(self, name: str, url: str):
+        """304 Not Modified 后刷新缓存时间"""
+        with self.lock:
+            self.conn.execute("UPDATE response SET tick=? WHERE name=? AND url=?", (time.time(), name, url))
+            self.revalidated += 1
+
+    def invalidate(self, name: str, url: str):
+        """删除一条缓存"""
+        with self.lock:
+            self.conn.execute("DELETE FROM response WHERE name=? AND url=?", (name, url))
+
+    def invalidate_prefix(self, name: str, prefix: str):
+        """删除url以prefix开头的缓存"""
+        with self.lock:
+            self.conn.execute("DELETE FROM response WHERE name=? AND substr(url, 1, ?)=?", (name, len(prefix), prefix))
+
+    def record(self, hit: bool, stale: bool = False):
+        """记录命中情况"""
+        with self.lock:
+            if not hit:
+                self.misses += 1
+            elif stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+
+    def _evict(self):
+        """删除超出上限的最旧条目"""
+        self.conn.execute(
+            "DELETE FROM response WHERE tick < ("
+            "SELECT tick FROM response ORDER BY tick DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries - 1,)
+        )
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.conn.execute("DELETE FROM response")
+            Log.Info("[ResponseCache] Cache cleared")
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM response").fetchone()[0]
+            total_requests = self.hits + self.stale_hits + self.misses
+            hit_rate = (self.hits + self.stale_hits) / total_requests if total_requests > 0 else 0
+
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'hit_rate': hit_rate,
+            }
+
+
+# 全局单例
+_global_response_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局API响应缓存实例（单例模式）"""
+    global _global_response_cache
+
+    if _global_response_cache is None:
+        with _cache_lock:
+            if _global_response_cache is None:
+                from config.setting import Setting
+                from tools.performance_monitor import get_performance_monitor
+
+                database = os.path.join(Setting.GetConfigPath(), "api_cache.db")
+                _global_response_cache = ResponseCache(database)
+                get_performance_monitor().register_provider("api_cache", _global_response_cache.get_stats)
+
+    return _global_response_cache
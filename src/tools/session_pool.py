@@ -1,235 +1,184 @@
 # -*- coding: utf-8 -*-
 """
 HTTP Session连接池管理
-解决Session频繁重建问题，提升HTTP/2连接复用率
+代理变更时按代切换httpx.AsyncClient，旧连接在请求结束后再关闭
 """
+import asyncio
+import contextlib
 import threading
-from typing import Optional, Dict, List
+import time
+from typing import Optional, Callable
+
 import httpx
 from tools.log import Log
 
 
+class SessionGeneration:
+    """一代Session: 相同代理配置下普通请求和下载共用一个AsyncClient"""
+
+    def __init__(self, index: int, proxy, thread_session: httpx.AsyncClient, download_session: httpx.AsyncClient):
+        self.index = index
+        self.proxy = proxy
+        self.thread_session = thread_session
+        self.download_session = download_session
+        self.inflight = 0
+        self.retired = False
+        self.retire_tick = 0.0
+        self.closed = False
+
+
 class SessionPool:
     """
     HTTP Session连接池
 
     功能：
-    - 管理httpx.Client实例池
-    - 支持代理变更时平滑切换
-    - HTTP/2连接复用
-    - 自动健康检查和重连
-
-    性能提升：
-    - HTTP/2复用率提升60%
-    - 代理切换时避免销毁所有连接
-    - 减少连接建立开销
+    - 所有请求通过lease()借用当前一代的AsyncClient
+    - 代理变更时创建新一代, 新请求立即使用新连接
+    - 旧一代的请求全部结束后再关闭, 超过drain_timeout强制关闭
+    - 代理配置没有变化时不重建, 保留已建立的HTTP/2连接
+    - 普通请求和下载共用一个Client, 同一域名不会因为分开两个连接池而重复握手
     """
 
-    def __init__(self, pool_size: int = 10, download_pool_size: int = 50):
+    def __init__(self, client_factory: Callable, drain_timeout: float = 60):
         """
         初始化Session连接池
 
         Args:
-            pool_size: 普通请求连接池大小
-            download_pool_size: 下载连接池大小
+            client_factory: client_factory(proxy) 创建httpx.AsyncClient
+            drain_timeout: 旧连接等待请求结束的最长时间(秒)
         """
-        self.pool_size = pool_size
-        self.download_pool_size = download_pool_size
-
-        self.thread_sessions: List[httpx.Client] = []
-        self.download_sessions: List[httpx.Client] = []
-
-        self.current_proxy: Optional[Dict] = None
+        self.client_factory = client_factory
+        self.drain_timeout = drain_timeout
         self.lock = threading.RLock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
         # 统计信息
         self.session_reuse_count = 0
         self.session_create_count = 0
+        self.skip_update_count = 0
+        self.drained_count = 0
+        self.force_closed_count = 0
 
-        # 初始化连接池
-        self._initialize_pools(None)
+        self.retired = []
+        self.current = self._create_generation(None, 0)
 
-        Log.Info(f"[SessionPool] Initialized with pool_size={pool_size}, download_pool_size={download_pool_size}")
+        Log.Info(f"[SessionPool] Initialized, drain_timeout={drain_timeout}")
 
-    def _create_client(self, proxy: Optional[Dict] = None) -> httpx.Client:
-        """
-        创建新的httpx.Client
+    def _create_generation(self, proxy, index: int) -> SessionGeneration:
+        self.session_create_count += 1
+        session = self.client_factory(proxy)
+        return SessionGeneration(index, proxy, session, session)
 
-        Args:
-            proxy: 代理配置
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """绑定事件循环, 旧连接的关闭在这个循环中执行"""
+        self.loop = loop
 
-        Returns:
-            httpx.Client实例
-        """
-        try:
-            self.session_create_count += 1
+    @property
+    def thread_session(self) -> httpx.AsyncClient:
+        return self.current.thread_session
 
-            if proxy:
-                return httpx.Client(
-                    http2=True,
-                    verify=False,
-                    trust_env=False,
-                    proxy=proxy,
-                    timeout=httpx.Timeout(30.0, connect=10.0),
-                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
-                )
-            else:
-                return httpx.Client(
-                    http2=True,
-                    verify=False,
-                    trust_env=False,
-                    timeout=httpx.Timeout(30.0, connect=10.0),
-                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
-                )
-        except Exception as e:
-            Log.Error(f"[SessionPool] Failed to create client: {e}")
-            # 降级到HTTP/1.1
-            if proxy:
-                return httpx.Client(verify=False, trust_env=False, proxy=proxy)
-            else:
-                return httpx.Client(verify=False, trust_env=False)
+    @property
+    def download_session(self) -> httpx.AsyncClient:
+        return self.current.download_session
 
-    def _initialize_pools(self, proxy: Optional[Dict] = None):
+    @contextlib.asynccontextmanager
+    async def lease(self, is_download: bool = False):
         """
-        初始化连接池
+        借用当前一代的Session, 请求期间切换代理不会关闭它
 
         Args:
-            proxy: 代理配置
-        """
-        with self.lock:
-            # 创建普通请求连接池
-            self.thread_sessions = []
-            for _ in range(self.pool_size):
-                self.thread_sessions.append(self._create_client(proxy))
-
-            # 创建下载连接池
-            self.download_sessions = []
-            for _ in range(self.download_pool_size):
-                self.download_sessions.append(self._create_client(proxy))
-
-            self.current_proxy = proxy
-
-            Log.Info(f"[SessionPool] Pools initialized with {self.pool_size + self.download_pool_size} sessions")
-
-    def get_session(self, index: int, is_download: bool = False) -> httpx.Client:
-        """
-        获取Session（复用优先）
-
-        Args:
-            index: 连接索引
             is_download: 是否为下载连接
-
-        Returns:
-            httpx.Client实例
         """
         with self.lock:
+            generation = self.current
+            generation.inflight += 1
             self.session_reuse_count += 1
-
-            # 每1000次复用输出统计
-            if self.session_reuse_count % 1000 == 0:
-                reuse_rate = self.session_reuse_count / self.session_create_count if self.session_create_count > 0 else 0
-                Log.Info(f"[SessionPool] Session reuse rate: {reuse_rate:.1f}x, creates: {self.session_create_count}")
-
-            if is_download:
-                sessions = self.download_sessions
-                pool_size = self.download_pool_size
-            else:
-                sessions = self.thread_sessions
-                pool_size = self.pool_size
-
-            # 确保索引在范围内
-            index = index % pool_size
-
-            return sessions[index]
-
-    def update_proxy(self, proxy: Optional[Dict] = None, force: bool = False):
+        try:
+            yield generation.download_session if is_download else generation.thread_session
+        finally:
+            with self.lock:
+                generation.inflight -= 1
+                isDrained = generation.retired and generation.inflight <= 0
+            if isDrained:
+                await self._close_generation(generation)
+
+    def update_proxy(self, proxy=None, force: bool = False) -> bool:
         """
-        更新代理配置（优化版：平滑切换）
+        更新代理配置, 可在任意线程调用
 
         Args:
             proxy: 新的代理配置
-            force: 是否强制重建所有连接
+            force: 代理没变也强制重建
+
+        Returns:
+            是否创建了新一代Session
         """
         with self.lock:
             # 检查代理是否变化
             if not force and self._is_same_proxy(proxy):
+                self.skip_update_count += 1
                 Log.Debug("[SessionPool] Proxy unchanged, skip update")
-                return
-
-            Log.Info(f"[SessionPool] Updating proxy, force={force}")
-
-            if force:
-                # 强制重建所有连接
-                self._close_all_sessions()
-                self._initialize_pools(proxy)
-            else:
-                # 平滑切换：逐个替换连接
-                self._smooth_update_proxy(proxy)
+                return False
+            self._smooth_update_proxy(proxy)
+            return True
 
-    def _is_same_proxy(self, new_proxy: Optional[Dict]) -> bool:
+    def _is_same_proxy(self, new_proxy) -> bool:
         """检查代理配置是否相同"""
-        if self.current_proxy is None and new_proxy is None:
-            return True
-        if self.current_proxy is None or new_proxy is None:
-            return False
-        return self.current_proxy == new_proxy
+        return self.current.proxy == new_proxy
 
-    def _smooth_update_proxy(self, proxy: Optional[Dict]):
+    def _smooth_update_proxy(self, proxy):
         """
-        平滑更新代理（逐个替换，避免一次性销毁所有连接）
+        新建一代Session并替换当前的, 旧的等请求结束后关闭
 
         Args:
             proxy: 新的代理配置
         """
-        # 替换普通连接池
-        for i in range(len(self.thread_sessions)):
-            try:
-                old_session = self.thread_sessions[i]
-                new_session = self._create_client(proxy)
-                self.thread_sessions[i] = new_session
-
-                # 异步关闭旧连接（避免阻塞）
-                threading.Thread(target=self._close_session_async, args=(old_session,), daemon=True).start()
-            except Exception as e:
-                Log.Error(f"[SessionPool] Failed to update thread session {i}: {e}")
-
-        # 替换下载连接池
-        for i in range(len(self.download_sessions)):
-            try:
-                old_session = self.download_sessions[i]
-                new_session = self._create_client(proxy)
-                self.download_sessions[i] = new_session
-
-                threading.Thread(target=self._close_session_async, args=(old_session,), daemon=True).start()
-            except Exception as e:
-                Log.Error(f"[SessionPool] Failed to update download session {i}: {e}")
-
-        self.current_proxy = proxy
-        Log.Info("[SessionPool] Proxy updated smoothly")
-
-    def _close_session_async(self, session: httpx.Client):
-        """异步关闭session"""
-        try:
-            session.close()
-        except Exception as e:
-            Log.Debug(f"[SessionPool] Error closing session: {e}")
-
-    def _close_all_sessions(self):
-        """关闭所有session"""
-        for session in self.thread_sessions + self.download_sessions:
+        old = self.current
+        self.current = self._create_generation(proxy, old.index + 1)
+        old.retired = True
+        old.retire_tick = time.monotonic()
+        self.retired.append(old)
+        Log.Info(f"[SessionPool] Proxy updated, generation:{self.current.index}, draining:{old.inflight}")
+
+        if self.loop is None:
+            return
+        if old.inflight <= 0:
+            asyncio.run_coroutine_threadsafe(self._close_generation(old), self.loop)
+        else:
+            asyncio.run_coroutine_threadsafe(self._drain(old), self.loop)
+
+    async def _drain(self, generation: SessionGeneration):
+        """等待旧一代的请求结束, 超时强制关闭"""
+        await asyncio.sleep(self.drain_timeout)
+        if not generation.closed:
+            with self.lock:
+                self.force_closed_count += 1
+            Log.Warn(f"[SessionPool] Generation {generation.index} drain timeout, inflight:{generation.inflight}")
+            await self._close_generation(generation)
+
+    async def _close_generation(self, generation: SessionGeneration):
+        with self.lock:
+            if generation.closed:
+                return
+            generation.closed = True
+            if generation in self.retired:
+                self.retired.remove(generation)
+            if generation.inflight <= 0:
+                self.drained_count += 1
+        for session in {generation.thread_session, generation.download_session}:
             try:
-                session.close()
+                await session.aclose()
             except Exception as e:
                 Log.Debug(f"[SessionPool] Error closing session: {e}")
+        Log.Info(f"[SessionPool] Generation {generation.index} closed")
 
-        self.thread_sessions = []
-        self.download_sessions = []
-
-    def close(self):
+    async def close(self):
         """关闭连接池"""
+        Log.Info("[SessionPool] Closing all sessions")
         with self.lock:
-            Log.Info("[SessionPool] Closing all sessions")
-            self._close_all_sessions()
+            generations = self.retired + [self.current]
+        for generation in generations:
+            await self._close_generation(generation)
 
     def get_stats(self) -> dict:
         """
@@ -239,44 +188,14 @@ class SessionPool:
             统计信息字典
         """
         with self.lock:
-            reuse_rate = self.session_reuse_count / self.session_create_count if self.session_create_count > 0 else 0
-
             return {
-                'pool_size': self.pool_size,
-                'download_pool_size': self.download_pool_size,
+                'generation': self.current.index,
+                'inflight': self.current.inflight,
+                'draining': [(g.index, g.inflight) for g in self.retired],
                 'session_create_count': self.session_create_count,
                 'session_reuse_count': self.session_reuse_count,
-                'reuse_rate': reuse_rate,
-                'current_proxy': self.current_proxy,
+                'skip_update_count': self.skip_update_count,
+                'drained_count': self.drained_count,
+                'force_closed_count': self.force_closed_count,
+                'current_proxy': self.current.proxy,
             }
-
-
-# 全局单例
-_global_session_pool: Optional[SessionPool] = None
-_pool_lock = threading.Lock()
-
-
-def get_session_pool() -> SessionPool:
-    """
-    获取全局Session连接池实例（单例模式）
-
-    Returns:
-        全局SessionPool实例
-    """
-    global _global_session_pool
-
-    if _global_session_pool is None:
-        with _pool_lock:
-            if _global_session_pool is None:
-                from config import config
-
-                # 从配置读取连接池大小
-                pool_size = getattr(config, 'ThreadNum', 10)
-                download_pool_size = getattr(config, 'DownloadThreadNum', 50)
-
-                _global_session_pool = SessionPool(
-                    pool_size=pool_size,
-                    download_pool_size=download_pool_size
-                )
-
-    return _global_session_pool
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+下载流缓冲区
+替代 data += chunk 的写法，避免大图下载时的二次方拷贝
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from tools.log import Log
+
+
+class StreamBuffer:
+    """
+    下载缓冲区
+
+    特性:
+    - 已知Content-Length时一次性预分配，分块直接写入
+    - 长度未知时收集分块，结束时只拼接一次
+    - Content-Length不准确时自动退化为可增长缓冲区
+    """
+
+    def __init__(self, size: int = 0):
+        """
+        Args:
+            size: 预期大小（Content-Length），0表示未知
+        """
+        self.size = size
+        self.length = 0
+        self._data = None
+        self._chunks = []
+        self._buf = None
+        self._view = None
+        if size > 0:
+            self._buf = bytearray(size)
+            self._view = memoryview(self._buf)
+
+    def __len__(self):
+        return self.length
+
+    def Write(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        self._data = None
+        end = self.length + n
+        if self._view is not None:
+            if end <= self.size:
+                self._view[self.length:end] = chunk
+                self.length = end
+                return
+            # 实际数据比Content-Length长，转为分块收集
+            self._view.release()
+            self._view = None
+            self._chunks.append(bytes(self._buf[:self.length]))
+            self._buf = None
+        self._chunks.append(chunk)
+        self.length = end
+
+    def GetData(self) -> bytes:
+        """返回完整数据，多次调用返回同一个对象"""
+        if self._data is not None:
+            return self._data
+        if self._view is not None:
+            if self.length == self.size:
+                self._data = bytes(self._buf)
+            else:
+                self._data = self._view[:self.length].tobytes()
+        elif len(self._chunks) == 1:
+            self._data = bytes(self._chunks[0])
+        else:
+            self._data = b"".join(self._chunks)
+        return self._data
+
+
+class StreamFile:
+    """
+    边下载边写入临时文件
+
+    特性:
+    - 分块直接写入 <目标>.<随机>.part，不在内存中保留整张图
+    - 完成后原子重命名到第一个目标路径，崩溃不会留下写了一半的图片
+    - 其余目标路径优先使用硬链接，失败时才复制
+    - 有图片仓库时边写边计算sha256，完成后交给仓库，相同内容只保存一份
+    """
+
+    def __init__(self, paths, store=None):
+        """
+        Args:
+            paths: 目标路径列表，空路径会被忽略
+            store: 图片仓库(BlobStore)，None时直接保存
+        """
+        self.paths = list(dict.fromkeys(path for path in paths if path))
+        self.tempPath = "{}.{}.part".format(self.paths[0], uuid.uuid4().hex[:8])
+        self.length = 0
+        self.store = store
+        self._hash = hashlib.sha256() if store else None
+        self._file = None
+
+    def Open(self):
+        fileDir = os.path.dirname(self.tempPath)
+        if fileDir and not os.path.isdir(fileDir):
+            os.makedirs(fileDir, exist_ok=True)
+        self._file = open(self.tempPath, "wb")
+
+    def Write(self, chunk):
+        if self._file is None:
+            self.Open()
+        self._file.write(chunk)
+        if self._hash is not None:
+            self._hash.update(chunk)
+        self.length += len(chunk)
+
+    def Commit(self):
+        self._file.close()
+        self._file = None
+        if self.store:
+            try:
+                self.store.put_file(self.tempPath, self.paths, self._hash.hexdigest())
+                return
+            except OSError as es:
+                # 仓库和目标不在同一个分区, 按原来的方式保存
+                Log.Warn("blob store put error, {}, {}".format(self.paths, es))
+        os.replace(self.tempPath, self.paths[0])
+        for path in self.paths[1:]:
+            fileDir = os.path.dirname(path)
+            if fileDir and not os.path.isdir(fileDir):
+                os.makedirs(fileDir, exist_ok=True)
+            if os.path.isfile(path):
+                os.remove(path)
+            try:
+                os.link(self.paths[0], path)
+            except OSError:
+                # 跨分区或文件系统不支持硬链接
+                tempPath = path + ".part"
+                shutil.copyfile(self.paths[0], tempPath)
+                os.replace(tempPath, path)
+
+    def Abort(self):
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.isfile(self.tempPath):
+                os.remove(self.tempPath)
+        except OSError:
+            pass
@@ -15,6 +15,12 @@ from config import config
 from config.setting import Setting
 from tools.log import Log
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 
 class CTime(object):
     def __init__(self):
@@ -174,13 +180,24 @@ class ToolUtil(object):
         signature = hmac.new(appsecret, data, digestmod=sha256).hexdigest()
         return signature
 
+    @staticmethod
+    def LoadJson(src):
+        """解析json, 支持str和bytes, 安装了orjson时优先使用"""
+        if HAS_ORJSON:
+            try:
+                return orjson.loads(src)
+            except orjson.JSONDecodeError:
+                # orjson不支持的内容(非utf8编码、超大整数等)交给标准库
+                pass
+        return json.loads(src)
+
     @staticmethod
     def ParseFromData(desc, src):
         try:
             if not src:
                 return
-            if isinstance(src, str):
-                src = json.loads(src)
+            if isinstance(src, (str, bytes)):
+                src = ToolUtil.LoadJson(src)
             for k, v in src.items():
                 setattr(desc, k, v)
         except Exception as es:
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 写缓冲模块
+UI线程只记录要写的行, 后台线程定时合并后在一个事务中写入
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, Tuple
+
+from tools.log import Log
+
+
+class WriteBehindDb(object):
+    """
+    后台批量写入的SQLite连接
+
+    特性:
+    - execute() 不等待写入, 只把语句放进待写表
+    - 同一语句同一个key多次写入只保留最后一次(合并upsert)
+    - 每隔interval秒在后台线程用一个事务写入, 语句使用参数绑定
+    - 按最后一次写入的先后顺序执行, 删除后再添加的行不会被删掉
+    - WAL模式, 不阻塞其他连接读取
+    - 写入失败(数据库被锁、磁盘错误)时放回待写表, 下次重试
+    """
+
+    def __init__(self, database: str, name: str = "db", interval: float = 0.5, busyTimeout: float = 30):
+        """
+        Args:
+            database: 数据库文件路径
+            name: 线程名
+            interval: 写入间隔(秒)
+            busyTimeout: 数据库被其他连接锁住时等待的时间(秒)
+        """
+        self.database = database
+        self.interval = interval
+        self.busyTimeout = busyTimeout
+        self._pending: Dict[Tuple[str, Hashable], Tuple[Any, ...]] = {}
+        self._cond = threading.Condition()
+        self._flushing = False
+        self._flushReq = 0
+        self._flushDone = 0
+        self._flushOk = True
+        self._afterCommit = []
+        self._closed = False
+
+        # 统计信息
+        self.stats = {
+            'writes': 0,         # 调用execute的次数
+            'coalesced': 0,      # 被后来的写入覆盖的次数
+            'rows': 0,           # 实际写入的行数
+            'transactions': 0,   # 事务数
+            'errors': 0,
+            'retries': 0,        # 数据库被锁或磁盘错误时放回重试的行数
+            'last_flush_ms': 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="DB-" + name, daemon=True)
+        self._thread.start()
+
+    def execute(self, sql: str, params: Tuple[Any, ...], key: Hashable = None):
+        """
+        记录一条要写入的语句
+
+        Args:
+            sql: 带?占位符的语句
+            params: 参数
+            key: 合并用的主键, 同一sql同一key只写最后一次, None时用params
+        """
+        if key is None:
+            key = params
+        with self._cond:
+            if self._closed:
+                Log.Warn("[WriteBehind] write after close: {}".format(sql))
+                return
+            self.stats['writes'] += 1
+            # 删除后重新加入, 顺序按最后一次写入
+            if self._pending.pop((sql, key), None) is not None:
+                self.stats['coalesced'] += 1
+            self._pending[(sql, key)] = params
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def run_after_commit(self, func):
+        """
+        之前记录的写入都提交后, 在写入线程中调用func(conn), 不等待
+        写入失败时等下次提交成功再调用
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._afterCommit.append(func)
+            self._flushReq += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 10) -> bool:
+        """立即写入并等待完成, 返回是否在超时前写入成功"""
+        with self._cond:
+            self._flushReq += 1
+            req = self._flushReq
+            self._cond.notify_all()
+            isDone = self._cond.wait_for(lambda: self._flushDone >= req or not self._thread.is_alive(), timeout)
+            return isDone and self._flushDone >= req and self._flushOk
+
+    def close(self, timeout: float = 10):
+        """写入剩下的数据并结束线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+            return stats
+
+    def _connect(self):
+        try:
+            conn = sqlite3.connect(self.database, isolation_level=None, timeout=self.busyTimeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            return conn
+        except Exception as es:
+            Log.Error(es)
+        return None
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._flushReq > self._flushDone, self.interval)
+                batch, self._pending = self._pending, {}
+                callbacks, self._afterCommit = self._afterCommit, []
+                req, closed = self._flushReq, self._closed
+            ok = True
+            if batch or callbacks:
+                if conn is None:
+                    # 打开失败时每次都重新打开
+                    conn = self._connect()
+                if conn is None:
+                    ok = False
+                    if batch:
+                        self._requeue(batch, closed)
+                elif batch:
+                    ok = self._write(conn, batch, closed)
+            if callbacks:
+                self._call_after_commit(conn, callbacks, ok, closed)
+            with self._cond:
+                self._flushDone = req
+                self._flushOk = ok
+                self._cond.notify_all()
+            if closed:
+                break
+
+        if conn:
+            conn.close()
+        Log.Info("[WriteBehind] close conn:{}".format(self.database))
+
+    def _call_after_commit(self, conn, callbacks, ok, closed):
+        if not ok:
+            with self._cond:
+                if not closed:
+                    self._afterCommit[:0] = callbacks
+            return
+        for func in callbacks:
+            try:
+                func(conn)
+            except Exception as es:
+                Log.Error(es)
+
+    @staticmethod
+    def _is_retry_error(es) -> bool:
+        """数据库被锁、磁盘错误等可以重试的错误, 语句本身的错误重试也没用"""
+        name = getattr(es, "sqlite_errorname", "")
+        if name:
+            return name.startswith(("SQLITE_BUSY", "SQLITE_LOCKED", "SQLITE_IOERR", "SQLITE_FULL", "SQLITE_CANTOPEN"))
+        msg = str(es).lower()
+        return any(key in msg for key in ("locked", "busy", "disk", "unable to open"))
+
+    def _requeue(self, batch, closed):
+        with self._cond:
+            self.stats['errors'] += 1
+            if closed:
+                Log.Error("[WriteBehind] drop {} rows after close: {}".format(len(batch), self.database))
+                return
+            # 失败的行在前, 期间新写入的同一行保留新的
+            pending = {key: params for key, params in batch.items() if key not in self._pending}
+            self.stats['retries'] += len(pending)
+            pending.update(self._pending)
+            self._pending = pending
+
+    def _write(self, conn, batch, closed=False) -> bool:
+        start = time.perf_counter()
+        # 相邻的同一语句合并成一次executemany
+        groups = []
+        for (sql, _), params in batch.items():
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        try:
+            conn.execute("BEGIN")
+            for sql, rows in groups:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+            ok = True
+        except Exception as es:
+            Log.Error(es)
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            ok = False
+            if self._is_retry_error(es):
+                self._requeue(batch, closed)
+            else:
+                with self._cond:
+                    self.stats['errors'] += 1
+        cost = (time.perf_counter() - start) * 1000
+        with self._cond:
+            if ok:
+                self.stats['rows'] += len(batch)
+                self.stats['transactions'] += 1
+            self.stats['last_flush_ms'] = round(cost, 2)
+        return ok
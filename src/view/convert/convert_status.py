@@ -105,7 +105,7 @@ class ConvertStatus(QtTaskBase):
             return
         epsId, index, savePath, isInit = task.GetDownloadPath()
 
-        self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+        self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit, isNeedData=False)
         self.UpdateTaskDB(task)
         return
 
@@ -133,7 +133,7 @@ class ConvertStatus(QtTaskBase):
             self.SetNewStatus(task, newStatus)
             if newStatus == task.Downloading:
                 epsId, index, savePath, isInit = task.GetDownloadPath()
-                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit, isNeedData=False)
             return
         elif st in [Str.Reading, Str.ReadingEps, Str.ReadingPicture, Str.Downloading]:
             task.statusMsg = st
@@ -166,7 +166,7 @@ class ConvertStatus(QtTaskBase):
             self.SetNewStatus(task, newStatus)
             if newStatus == task.Downloading:
                 epsId, index, savePath, isInit = task.GetDownloadPath()
-                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit, isNeedData=False)
             self.UpdateTableItem(task)
             self.UpdateTaskDB(task)
         else:
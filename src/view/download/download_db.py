@@ -4,9 +4,13 @@ import time
 
 from PySide6.QtSql import QSqlDatabase, QSqlQuery
 
+from config import config
 from config.setting import Setting
 from tools.log import Log
+from tools.performance_monitor import get_performance_monitor
+from tools.write_behind import WriteBehindDb
 from view.download.download_item import DownloadItem, DownloadEpsItem
+from view.download.download_journal import DownloadJournal
 
 
 class DownloadDb(object):
@@ -17,6 +21,12 @@ class DownloadDb(object):
         if not self.db.open():
             Log.Warn(self.db.lastError().text())
 
+        # WAL模式, 后台线程写入时不阻塞这里的读取
+        query = QSqlQuery(self.db)
+        suc = query.exec_("PRAGMA journal_mode=WAL")
+        if not suc:
+            Log.Warn(query.lastError().text())
+
         query = QSqlQuery(self.db)
         sql = """\
             create table if not exists download(\
@@ -62,49 +72,71 @@ class DownloadDb(object):
             Log.Warn(a)
         # self.LoadDownload()
 
-    def DelDownloadDB(self, bookId):
-        query = QSqlQuery(self.db)
-        sql = "delete from download where bookId='{}'".format(bookId)
-        suc = query.exec_(sql)
-        if not suc:
-            Log.Warn(query.lastError().text())
+        # 写入都交给后台线程合并后批量写
+        self.writer = WriteBehindDb(path, "download", config.DownloadDbFlushMs / 1000)
+        get_performance_monitor().register_provider("download_db", self.writer.get_stats)
+        self.journal = DownloadJournal(os.path.join(Setting.GetConfigPath(), "download.journal"),
+                                       config.DownloadJournalCompactNum)
 
-        sql = "delete from download_eps where bookId='{}'".format(bookId)
-        suc = query.exec_(sql)
-        if not suc:
-            Log.Warn(query.lastError().text())
+    def Flush(self):
+        self.writer.flush()
+
+    def Close(self):
+        self.writer.close()
+        self.journal.Close()
+
+    def AddDownloadPage(self, bookId, epsId, index):
+        self.journal.AddPage(bookId, epsId, index)
+
+    def NeedCompact(self):
+        return self.journal.NeedCompact()
+
+    def CompactJournal(self):
+        # 在写入线程中等前面的记录提交后再压缩, 不阻塞界面
+        if self.journal.isCompacting:
+            return
+        self.journal.isCompacting = True
+        self.writer.run_after_commit(self._CompactJournal)
+
+    def _CompactJournal(self, conn):
+        # 只去掉数据库里确实已经有的进度
+        saved = {}
+        for bookId, epsId, index in conn.execute("select bookId, epsId, curPreDownloadIndex from download_eps"):
+            saved[(bookId, epsId)] = index
+
+        def IsSaved(bookId, epsId, preIndex, bits):
+            return bits == 0 and saved.get((bookId, epsId), -1) >= preIndex
+        self.journal.Compact(IsSaved)
+
+    def DelDownloadDB(self, bookId):
+        self.journal.DelBook(bookId)
+        self.writer.execute("delete from download where bookId=?", (bookId, ))
+        self.writer.execute("delete from download_eps where bookId=?", (bookId, ))
         return
 
     def AddDownloadDB(self, task):
         assert isinstance(task, DownloadItem)
         tick = int(time.time())
-        query = QSqlQuery(self.db)
         sql = "INSERT INTO download(bookId, downloadEpsIds, curDownloadEpsId, curConvertEpsId, title, " \
               "savePath, convertPath, status, convertStatus, tick) " \
-              "VALUES ('{0}', '{1}', {2}, {3}, '{4}', '{5}', '{6}', '{7}', '{8}', {9}) " \
-              "ON CONFLICT(bookId) DO UPDATE SET downloadEpsIds='{1}', curDownloadEpsId={2}, curConvertEpsId={3}, " \
-              "title = '{4}', savePath = '{5}', convertPath= '{6}', status = '{7}', convertStatus = '{8}'".\
-            format(task.bookId, json.dumps(task.epsIds), task.curDownloadEpsId, task.curConvertEpsId, task.title.replace("'", "''"),
-                   task.savePath.replace("'", "''"), task.convertPath.replace("'", "''"), task.status, task.convertStatus, tick)
-
-        suc = query.exec_(sql)
-        if not suc:
-            Log.Warn(query.lastError().text())
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) " \
+              "ON CONFLICT(bookId) DO UPDATE SET downloadEpsIds=excluded.downloadEpsIds, " \
+              "curDownloadEpsId=excluded.curDownloadEpsId, curConvertEpsId=excluded.curConvertEpsId, " \
+              "title=excluded.title, savePath=excluded.savePath, convertPath=excluded.convertPath, " \
+              "status=excluded.status, convertStatus=excluded.convertStatus"
+        self.writer.execute(sql, (task.bookId, json.dumps(task.epsIds), task.curDownloadEpsId, task.curConvertEpsId,
+                                  task.title, task.savePath, task.convertPath, task.status, task.convertStatus, tick),
+                            task.bookId)
         return
 
     def AddDownloadEpsDB(self, info):
         assert isinstance(info, DownloadEpsItem)
-        query = QSqlQuery(self.db)
         sql = "INSERT INTO download_eps(bookId, epsId, epsTitle, picCnt, curPreDownloadIndex, curPreConvertId) " \
-              "VALUES ('{0}', {1}, '{2}', {3}, {4}, {5}) " \
-              "ON CONFLICT(bookId, epsId) DO UPDATE SET epsTitle='{2}', picCnt={3}, curPreDownloadIndex={4}, " \
-              "curPreConvertId = {5}".\
-            format(info.bookId, info.epsId, info.epsTitle.replace("'", "''"), info.picCnt, info.curPreDownloadIndex,
-                   info.curPreConvertId)
-
-        suc = query.exec_(sql)
-        if not suc:
-            Log.Warn(query.lastError().text())
+              "VALUES (?, ?, ?, ?, ?, ?) " \
+              "ON CONFLICT(bookId, epsId) DO UPDATE SET epsTitle=excluded.epsTitle, picCnt=excluded.picCnt, " \
+              "curPreDownloadIndex=excluded.curPreDownloadIndex, curPreConvertId=excluded.curPreConvertId"
+        self.writer.execute(sql, (info.bookId, info.epsId, info.epsTitle, info.picCnt, info.curPreDownloadIndex,
+                                  info.curPreConvertId), (info.bookId, info.epsId))
         return
 
     def LoadDownload(self, owner):
@@ -131,6 +163,7 @@ class DownloadDb(object):
             info.status = query.value(7)
             info.convertStatus = query.value(8)
             info.tick = query.value(9)
+            info.dirty = False
             downloads[info.bookId] = info
 
         query = QSqlQuery(self.db)
@@ -155,6 +188,24 @@ class DownloadDb(object):
             info.picCnt = query.value(3)
             info.curPreDownloadIndex = query.value(4)
             info.curPreConvertId = query.value(5)
+            info.dirty = False
             task.epsInfo[info.epsId] = info
 
+        # 用日志补上数据库中还没写入的进度, 包括不连续完成的页
+        for (bookId, epsId), (preIndex, bits) in self.journal.Load().items():
+            task = downloads.get(bookId)
+            if not task:
+                continue
+            info = task.epsInfo.get(epsId)
+            if not info:
+                info = DownloadEpsItem()
+                info.bookId = bookId
+                info.epsId = epsId
+                task.epsInfo[epsId] = info
+            oldProgress = (info.curPreDownloadIndex, info.doneBits)
+            info.MergeDone(preIndex, bits)
+            if oldProgress != (info.curPreDownloadIndex, info.doneBits):
+                info.dirty = True
+                task.dirty = True
+        self.CompactJournal()
         return downloads
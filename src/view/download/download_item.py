@@ -41,6 +41,7 @@ class DownloadItem(QtTaskBase):
         self.epsInfo = {}                # 下载的章节信息
         self.epsIds = []                 # 下载的章节Id
         self.curDownloadEpsId = -1       # 当前正在下载的章节, 不是索引
+        self.downloadingPages = set()    # 正在下载的页 (epsId, index), index为-1表示正在获取章节信息
         self.convertStatus = self.Pause
         self.convertMsg = ""
         self.curConvertEpsId = -1        # 当前正在转换的章节, 不是索引
@@ -201,16 +202,20 @@ class DownloadItem(QtTaskBase):
         if not self.author and author.strip() not in [" ", "无", "無", ]:
             self.author = author
 
+        self.downloadingPages.discard((self.curDownloadEpsId, -1))
         self.curDownloadEpsInfo.dirty = True
         self.curDownloadEpsInfo.picCnt = maxPic
         self.curDownloadEpsInfo.epsTitle = title
         return
 
-    # 下载成功回调
-    def DownloadSucCallBack(self):
+    # 下载成功回调, 完成的页可能不按顺序
+    def DownloadSucCallBack(self, epsId, index):
         self.dirty = True
-        self.curDownloadEpsInfo.dirty = True
-        self.curDownloadEpsInfo.curPreDownloadIndex += 1
+        self.downloadingPages.discard((epsId, index))
+        epsInfo = self.epsInfo.get(epsId)
+        if epsInfo:
+            epsInfo.dirty = True
+            epsInfo.SetPageDone(index)
         while True:
             if self.curDownloadEpsInfo.isDownloadComplete():
                 index = self.epsIds.index(self.curDownloadEpsId)
@@ -222,12 +227,29 @@ class DownloadItem(QtTaskBase):
         self.curDownloadEpsInfo.dirty = True
         return self.Downloading
 
-    # 获得下载参数
-    def GetDownloadPath(self):
+    # 获得接下来要下载的页, 每本书同时最多下载maxNum页
+    def GetDownloadPaths(self, maxNum):
+        epsInfo = self.curDownloadEpsInfo
         # 如果没有初始化，先初始化
-        if not self.curDownloadEpsInfo.epsTitle or self.curDownloadEpsInfo.picCnt <= 0:
-            return self.curDownloadEpsInfo.epsId, 0, "", True
-
+        if not epsInfo.epsTitle or epsInfo.picCnt <= 0:
+            if (epsInfo.epsId, -1) in self.downloadingPages:
+                return []
+            self.downloadingPages.add((epsInfo.epsId, -1))
+            return [(epsInfo.epsId, 0, "", True)]
+
+        self.InitSavePath()
+        convertPath = os.path.join(self.savePath, ToolUtil.GetCanSaveName(epsInfo.epsTitle))
+        paths = []
+        index = epsInfo.curPreDownloadIndex
+        while len(self.downloadingPages) < maxNum and index < epsInfo.picCnt:
+            if not epsInfo.IsPageDone(index) and (epsInfo.epsId, index) not in self.downloadingPages:
+                self.downloadingPages.add((epsInfo.epsId, index))
+                savePath = os.path.join(convertPath, "{:04}.{}".format(index + 1, "jpg"))
+                paths.append((epsInfo.epsId, index, savePath, False))
+            index += 1
+        return paths
+
+    def InitSavePath(self):
         if not self.savePath and Setting.SavePath.value:
             path = os.path.join(Setting.SavePath.value, config.SavePathDir)
             path2 = os.path.join(path, ToolUtil.GetCanSaveName(self.title))
@@ -243,10 +265,6 @@ class DownloadItem(QtTaskBase):
                     path2 = os.path.join(path, os.path.join("default", ToolUtil.GetCanSaveName(self.title)))
                 self.savePath = os.path.join(path2, "original")
 
-        convertPath = os.path.join(self.savePath, ToolUtil.GetCanSaveName(self.curDownloadEpsInfo.epsTitle))
-        savePath = os.path.join(convertPath, "{:04}.{}".format(self.curDownloadEpsInfo.curPreDownloadIndex + 1, "jpg"))
-        return self.curDownloadEpsInfo.epsId, self.curDownloadEpsInfo.curPreDownloadIndex, savePath, False
-
     def ConvertInit(self):
         if not self.epsIds:
             return self.Error
@@ -349,8 +367,9 @@ class DownloadEpsItem(QtTaskBase):
         self.epsId = 0      # 章节Id
         self.epsTitle = ""  # 章节名
         self.picCnt = 0     # 图片数
-        self.curPreDownloadIndex = 0    # 当前要下载的
+        self.curPreDownloadIndex = 0    # 当前要下载的, 之前的页都已完成
         self.curPreConvertId = 0        # 当前要转换的
+        self.doneBits = 0               # curPreDownloadIndex之后已完成的页, 按位记录
 
         self.dirty = True
 
@@ -361,6 +380,26 @@ class DownloadEpsItem(QtTaskBase):
             return False
         return self.curPreDownloadIndex >= self.picCnt
 
+    def IsPageDone(self, index):
+        return index < self.curPreDownloadIndex or bool(self.doneBits >> index & 1)
+
+    def SetPageDone(self, index):
+        # 连续完成的页推进curPreDownloadIndex, 保存和转换都只看这个索引
+        if index < self.curPreDownloadIndex:
+            return
+        self.doneBits |= 1 << index
+        while self.doneBits >> self.curPreDownloadIndex & 1:
+            self.curPreDownloadIndex += 1
+        self.doneBits &= ~((1 << self.curPreDownloadIndex) - 1)
+
+    # 合并日志中记录的进度
+    def MergeDone(self, preIndex, bits):
+        if preIndex > self.curPreDownloadIndex:
+            self.curPreDownloadIndex = preIndex
+        self.doneBits |= bits
+        while self.doneBits >> self.curPreDownloadIndex & 1:
+            self.curPreDownloadIndex += 1
+        self.doneBits &= ~((1 << self.curPreDownloadIndex) - 1)
 
     def isConvertComplete(self):
         if not self.epsTitle:
@@ -0,0 +1,146 @@
+import os
+import threading
+
+from tools.log import Log
+
+
+class DownloadJournal(object):
+    """
+    已完成页的追加日志, 和download.db放在一起
+    数据库里只有连续完成的页数, 并且是定时批量写入的, 崩溃后重启时用这里的记录恢复准确的进度
+
+    每行一条记录:
+        p bookId epsId index          完成一页
+        s bookId epsId preIndex bits  压缩后的章节进度, preIndex之前都已完成, bits为之后已完成的页(16进制)
+        d bookId                      删除记录
+
+    界面线程追加, 压缩在数据库写入线程中进行, 压缩期间追加的记录会补到新文件后面
+    """
+
+    def __init__(self, path, compactNum=5000):
+        self.path = path
+        self.compactNum = compactNum
+        self.progress = {}      # (bookId, epsId) -> [preIndex, bits]
+        self.appendCnt = 0      # 上次压缩后追加的记录数
+        self.fd = -1
+        self.tail = None        # 压缩期间追加的记录, 不压缩时为None
+        self.isCompacting = False
+        self.lock = threading.Lock()
+
+    def Load(self):
+        """读取日志, 返回 {(bookId, epsId): (preIndex, bits)}"""
+        self.progress = {}
+        self.appendCnt = 0
+        try:
+            if os.path.isfile(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        self._Apply(line)
+        except Exception as es:
+            Log.Error(es)
+        return {k: tuple(v) for k, v in self.progress.items()}
+
+    def _Apply(self, line):
+        # 最后一行可能只写了一半, 不完整的记录直接跳过
+        if not line.endswith("\n"):
+            return
+        fields = line.split()
+        try:
+            if fields[0] == "p" and len(fields) == 4:
+                self._SetPageDone(fields[1], int(fields[2]), int(fields[3]))
+                self.appendCnt += 1
+            elif fields[0] == "s" and len(fields) == 5:
+                self.progress[(fields[1], int(fields[2]))] = [int(fields[3]), int(fields[4], 16)]
+            elif fields[0] == "d" and len(fields) == 2:
+                self._Remove(fields[1])
+                self.appendCnt += 1
+        except (ValueError, IndexError):
+            pass
+
+    def _SetPageDone(self, bookId, epsId, index):
+        info = self.progress.setdefault((bookId, epsId), [0, 0])
+        if index < info[0]:
+            return
+        bits = info[1] | 1 << index
+        preIndex = info[0]
+        while bits >> preIndex & 1:
+            preIndex += 1
+        info[0], info[1] = preIndex, bits & ~((1 << preIndex) - 1)
+
+    def _Remove(self, bookId):
+        for key in [key for key in self.progress if key[0] == bookId]:
+            self.progress.pop(key)
+
+    def _Write(self, data):
+        try:
+            if self.fd < 0:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # 一条记录一次write, 进程崩溃时已经交给系统的记录不会丢
+            os.write(self.fd, data.encode("utf-8"))
+        except Exception as es:
+            Log.Error(es)
+
+    def _Append(self, data):
+        self.appendCnt += 1
+        if self.tail is not None:
+            self.tail.append(data)
+        self._Write(data)
+
+    def AddPage(self, bookId, epsId, index):
+        with self.lock:
+            self._SetPageDone(bookId, epsId, index)
+            self._Append("p\t{}\t{}\t{}\n".format(bookId, epsId, index))
+
+    def DelBook(self, bookId):
+        with self.lock:
+            self._Remove(bookId)
+            self._Append("d\t{}\n".format(bookId))
+
+    def NeedCompact(self):
+        return not self.isCompacting and self.appendCnt >= self.compactNum
+
+    def Compact(self, isSaved=None):
+        """
+        把每个章节的进度压缩成一行, 写到临时文件后替换
+        isSaved(bookId, epsId, preIndex, bits) 返回True表示数据库里已经有这个进度, 不再保留
+        可以在其他线程调用, 写文件和fsync时不阻塞AddPage
+        """
+        with self.lock:
+            progress = {key: tuple(value) for key, value in self.progress.items()}
+            self.tail = []
+            oldCnt, self.appendCnt = self.appendCnt, 0
+        saved = {}
+        if isSaved:
+            saved = {key: value for key, value in progress.items() if isSaved(key[0], key[1], *value)}
+            for key in saved:
+                progress.pop(key)
+        tmpPath = self.path + ".tmp"
+        try:
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                for (bookId, epsId), (preIndex, bits) in progress.items():
+                    f.write("s\t{}\t{}\t{}\t{:x}\n".format(bookId, epsId, preIndex, bits))
+                f.flush()
+                os.fsync(f.fileno())
+            with self.lock:
+                # 补上压缩期间追加的记录后替换
+                with open(tmpPath, "a", encoding="utf-8") as f:
+                    f.writelines(self.tail)
+                self.Close()
+                os.replace(tmpPath, self.path)
+                for key, value in saved.items():
+                    # 压缩期间又有变化的章节保留
+                    if tuple(self.progress.get(key, ())) == value:
+                        self.progress.pop(key)
+                self.tail = None
+        except Exception as es:
+            Log.Error(es)
+            with self.lock:
+                self.appendCnt += oldCnt
+                self.tail = None
+        finally:
+            self.isCompacting = False
+
+    def Close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,242 @@
+import time
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QCoreApplication, QSize
+from PySide6.QtGui import QIcon
+
+from view.download.download_item import DownloadItem
+
+
+class DownloadTableModel(QAbstractTableModel):
+    """下载列表, 每行对应downloadDict中的一个任务, 显示的文字在更新时比较, 只通知变化的列"""
+    ColumnId = 0
+    ColumnTime = 1
+    ColumnTitle = 2
+    ColumnDownload = 3
+    ColumnDownloadEps = 4
+    ColumnSpeed = 5
+    ColumnStatus = 6
+    ColumnConvert = 7
+    ColumnConvertEps = 8
+    ColumnConvertTick = 9
+    ColumnConvertStatus = 10
+
+    Headers = ["id", "时间", "标题", "下载进度", "下载章节", "下载速度", "下载状态", "转换进度", "转换章节", "转换耗时", "转换状态"]
+    SortRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.tasks = []         # 行 -> DownloadItem
+        self.rows = {}          # bookId -> 行
+        self.texts = []         # 每行显示的文字, 还没显示过的行为None
+        self.newBookIds = set()  # 有新章节的书
+        self.newIcon = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.tasks)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.Headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.Headers):
+            return QCoreApplication.translate("Download", self.Headers[section], None)
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            return self.GetTexts(row)[col]
+        elif role == Qt.ToolTipRole:
+            if col == self.ColumnTitle:
+                return self.tasks[row].title
+        elif role == Qt.DecorationRole:
+            if col == self.ColumnDownloadEps and self.tasks[row].bookId in self.newBookIds:
+                if self.newIcon is None:
+                    self.newIcon = QIcon()
+                    self.newIcon.addFile(u":/png/icon/new.svg", QSize(), QIcon.Normal, QIcon.Off)
+                return self.newIcon
+        elif role == self.SortRole:
+            return self.GetSortKey(self.tasks[row], col)
+        return None
+
+    def GetTexts(self, row):
+        texts = self.texts[row]
+        if texts is None:
+            texts = self.texts[row] = self.FormatTask(self.tasks[row])
+        return texts
+
+    @staticmethod
+    def FormatTask(info, columns=None):
+        """每列显示的文字, columns不为None时只计算这些列, 其他列为None"""
+        assert isinstance(info, DownloadItem)
+        formats = (
+            lambda: info.bookId,
+            lambda: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info.tick)),
+            lambda: info.title,
+            lambda: "{}/{}".format(str(info.curDownloadPic), str(info.maxDownloadPic)),
+            lambda: "{}/{}".format(str(info.curDownloadEps), str(info.epsCount)),
+            lambda: info.speedStr,
+            lambda: info.GetStatusMsg(),
+            lambda: "{}/{}".format(str(info.curConvertCnt), str(info.convertCnt)),
+            lambda: "{}/{}".format(str(info.curConvertEps), str(info.convertEpsCnt)),
+            lambda: "{}".format(str(info.convertTick)),
+            lambda: info.GetConvertStatusMsg(),
+        )
+        if columns is None:
+            return tuple(func() for func in formats)
+        texts = [None] * len(formats)
+        for col in columns:
+            texts[col] = formats[col]()
+        return tuple(texts)
+
+    def GetSortKey(self, info, col):
+        # 时间和数字列按数值排序, 其他按文字
+        if col == self.ColumnTime:
+            return info.tick
+        elif col == self.ColumnConvertTick:
+            return info.cvTick
+        texts = self.texts[self.rows[info.bookId]]
+        if texts is None:
+            return self.FormatTask(info, [col])[col]
+        return texts[col]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if not 0 <= column < len(self.Headers):
+            return
+        self.layoutAboutToBeChanged.emit()
+        keys = [self.GetSortKey(task, column) for task in self.tasks]
+        newOrder = sorted(range(len(self.tasks)), key=keys.__getitem__, reverse=order == Qt.DescendingOrder)
+        newRows = [0] * len(newOrder)
+        for row, oldRow in enumerate(newOrder):
+            newRows[oldRow] = row
+        self.tasks = [self.tasks[i] for i in newOrder]
+        self.texts = [self.texts[i] for i in newOrder]
+        for row, task in enumerate(self.tasks):
+            task.tableRow = row
+            self.rows[task.bookId] = row
+        # 保持选中的行
+        oldIndexes = self.persistentIndexList()
+        self.changePersistentIndexList(oldIndexes, [self.index(newRows[i.row()], i.column()) for i in oldIndexes])
+        self.layoutChanged.emit()
+
+    def GetTask(self, row):
+        if 0 <= row < len(self.tasks):
+            return self.tasks[row]
+        return None
+
+    def GetRow(self, bookId):
+        return self.rows.get(bookId, -1)
+
+    def AddTasks(self, tasks):
+        tasks = [task for task in tasks if task.bookId not in self.rows]
+        if not tasks:
+            return
+        first = len(self.tasks)
+        self.beginInsertRows(QModelIndex(), first, first + len(tasks) - 1)
+        for task in tasks:
+            task.tableRow = len(self.tasks)
+            self.rows[task.bookId] = task.tableRow
+            self.tasks.append(task)
+            self.texts.append(None)
+        self.endInsertRows()
+
+    def RemoveTask(self, bookId):
+        row = self.rows.pop(bookId, -1)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        task = self.tasks.pop(row)
+        task.tableRow = -1
+        self.texts.pop(row)
+        for i in range(row, len(self.tasks)):
+            self.tasks[i].tableRow = i
+            self.rows[self.tasks[i].bookId] = i
+        self.newBookIds.discard(bookId)
+        self.endRemoveRows()
+
+    def SetNewEps(self, bookId, isNew):
+        if isNew == (bookId in self.newBookIds):
+            return
+        if isNew:
+            self.newBookIds.add(bookId)
+        else:
+            self.newBookIds.discard(bookId)
+        row = self.rows.get(bookId, -1)
+        if row >= 0:
+            index = self.index(row, self.ColumnDownloadEps)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def UpdateTask(self, task, columns=None):
+        """重新计算一行的文字, 只通知变化了的列, columns为None时检查所有列"""
+        row = self.rows.get(task.bookId, -1)
+        if row < 0:
+            return
+        old = self.texts[row]
+        if old is None:
+            # 还没显示过, 显示时再计算
+            return
+        if columns is None:
+            columns = range(len(old))
+        new = self.FormatTask(task, columns)
+        changed = [col for col in columns if old[col] != new[col]]
+        if not changed:
+            return
+        texts = list(old)
+        for col in changed:
+            texts[col] = new[col]
+        self.texts[row] = tuple(texts)
+        self.dataChanged.emit(self.index(row, min(changed)), self.index(row, max(changed)), [Qt.DisplayRole])
+
+
+class DownloadProxyModel(QSortFilterProxyModel):
+    """排序和搜索、完成状态过滤"""
+    ShowAll = 0
+    ShowNotComplete = 1
+    ShowComplete = 2
+
+    def __init__(self, parent=None):
+        QSortFilterProxyModel.__init__(self, parent)
+        self.searchText = ""
+        self.showType = self.ShowAll
+        self.converter = None
+        self.setSortRole(DownloadTableModel.SortRole)
+        # 和原来一样只在点击表头时排序, 下载进度变化不重新排序
+        self.setDynamicSortFilter(False)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # 逐个比较时要回调python的data, 上万行很慢, 交给源model一次排好, 这里只做过滤
+        self.sourceModel().sort(column, order)
+
+    def SetFilter(self, searchText, showType):
+        self.searchText = searchText
+        self.showType = showType
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        if self.showType == self.ShowAll and not self.searchText:
+            return True
+        info = self.sourceModel().GetTask(sourceRow)
+        if not info:
+            return False
+        if self.showType == self.ShowNotComplete and info.status == DownloadItem.Success:
+            return False
+        if self.showType == self.ShowComplete and info.status != DownloadItem.Success:
+            return False
+        if not self.searchText:
+            return True
+        if self.searchText in str(info.bookId):
+            return True
+        if self.converter is None:
+            from tools.langconv import Converter
+            self.converter = Converter('zh-hans')
+        if self.searchText in self.converter.convert(info.title):
+            return True
+        if self.searchText in self.converter.convert(info.author):
+            return True
+        return False
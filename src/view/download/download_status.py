@@ -3,6 +3,7 @@ from config.setting import Setting
 from task.qt_task import QtTaskBase
 from tools.status import Status
 from tools.str import Str
+from tools.indexed_queue import IndexedQueue
 from tools.tool import ToolUtil
 from view.download.download_db import DownloadDb
 from view.download.download_item import DownloadItem
@@ -13,19 +14,28 @@ class DownloadStatus(QtTaskBase):
     def __init__(self):
         QtTaskBase.__init__(self)
         self.db = DownloadDb()
-        self.downloadingList = []  # 正在下载列表
-        self.downloadList = []  # 下载队列
+        self.downloadingList = IndexedQueue()  # 正在下载列表
+        self.downloadList = IndexedQueue()  # 下载队列
         self.downloadDict = {}  # bookId ：downloadInfo
-        self.convertList = []
-        self.convertingList = []
+        self.convertList = IndexedQueue()
+        self.convertingList = IndexedQueue()
+        self.convertBlocked = IndexedQueue()  # 等待下载进度的转换任务, 下载有进展后放回convertList
 
     def SetNewStatus(self, task, status, statusMsg=""):
         if status == task.status:
             return
+        oldStatus = task.status
         task.status = status
         task.statusMsg = statusMsg
         task.dirty = True
         assert isinstance(task, DownloadItem)
+        if status != task.Downloading:
+            # 还没回来的页不再计入进度, 重新开始时按文件是否存在跳过
+            task.downloadingPages.clear()
+            if oldStatus == task.Downloading and status != task.Pause:
+                # 取消还在下载的页, 否则自动重试时同一页会有两个任务写同一个文件
+                self._CancelDownload(task)
+        self._WakeConvert(task)
         if status == task.Waiting:
             self._SetTaskWait(task)
         elif status == task.Pause:
@@ -65,40 +75,37 @@ class DownloadStatus(QtTaskBase):
         self.UpdateTableItem(task)
 
     def _SetTaskWait(self, task):
-        if task in self.downloadingList:
-            self.downloadingList.remove(task)
-        if task not in self.downloadList:
-            self.downloadList.append(task)
+        self.downloadingList.discard(task)
+        self.downloadList.add(task)
         return
 
     def _SetTaskConvertWait(self, task):
         task.convertStatus = task.Waiting
-        if task in self.convertingList:
-            self.convertingList.remove(task)
-        if task not in self.convertList:
-            self.convertList.append(task)
+        self.convertingList.discard(task)
+        self.convertBlocked.discard(task)
+        self.convertList.add(task)
         return
 
     def _SetTaskDownloading(self, task):
-        if task not in self.downloadingList:
-            self.downloadingList.append(task)
-        if task in self.downloadList:
-            self.downloadList.remove(task)
+        self.downloadingList.add(task)
+        self.downloadList.discard(task)
         return
 
     def _SetTaskConverting(self, task):
-        if task not in self.convertingList:
-            self.convertingList.append(task)
-        if task in self.convertList:
-            self.convertList.remove(task)
+        self.convertingList.add(task)
+        self.convertList.discard(task)
+        self.convertBlocked.discard(task)
         return
 
     def _SetTaskPause(self, task2):
-        from task.task_download import TaskDownload
-        TaskDownload().Cancel(task2.cleanFlag)
+        self._CancelDownload(task2)
         self._SetDownloadTaskNone(task2)
         return
 
+    def _CancelDownload(self, task):
+        from task.task_download import TaskDownload
+        TaskDownload().Cancel(task.cleanFlag)
+
     def _SetTaskConvertPause(self, task2):
         task2.convertStatus = task2.Pause
         from task.task_waifu2x import TaskWaifu2x
@@ -107,22 +114,31 @@ class DownloadStatus(QtTaskBase):
         return
 
     def _SetDownloadTaskNone(self, task):
-        if task in self.downloadingList:
-            self.downloadingList.remove(task)
-        if task in self.downloadList:
-            self.downloadList.remove(task)
+        self.downloadingList.discard(task)
+        self.downloadList.discard(task)
         return
 
     def _SetTaskConvertNone(self, task):
-        if task in self.convertingList:
-            self.convertingList.remove(task)
-        if task in self.convertList:
-            self.convertList.remove(task)
+        self.convertingList.discard(task)
+        self.convertList.discard(task)
+        self.convertBlocked.discard(task)
         return
 
+    def _WakeConvert(self, task):
+        # 下载有进展, 等待的转换任务可以继续
+        if self.convertBlocked.discard(task):
+            self.convertList.add(task)
+
+    def RemoveTask(self, task):
+        for queue in (self.downloadingList, self.downloadList, self.convertList, self.convertingList, self.convertBlocked):
+            queue.discard(task)
+
     def UpdateTableItem(self, task):
         return
 
+    def UpdateSpeed(self, task):
+        return
+
     def UpdateTaskDB(self, task):
         assert isinstance(task, DownloadItem)
         if task.dirty:
@@ -131,37 +147,43 @@ class DownloadStatus(QtTaskBase):
         for info in task.epsInfo.values():
             if info.dirty:
                 info.dirty = False
-            self.db.AddDownloadEpsDB(info)
+                self.db.AddDownloadEpsDB(info)
+
+    def AddDownloadPage(self, task, epsId, index):
+        # 完成的页先记到日志, 崩溃后重启可以跳过
+        self.db.AddDownloadPage(task.bookId, epsId, index)
+        if self.db.NeedCompact():
+            self.db.CompactJournal()
 
     def TimeOutHandler(self):
+        # 只处理空出来的名额和正在进行的任务, 排队的任务再多也不用整个遍历
         downloadNum = config.DownloadThreadNum
         addNum = downloadNum - len(self.downloadingList)
-        if addNum > 0:
-            for task in list(self.downloadList):
-                assert isinstance(task, DownloadItem)
-                if task.status != task.Waiting:
-                    self.downloadList.remove(task)
-                    continue
-                self.StartItemDownload(task)
-                if task.status == task.Downloading:
-                    addNum -= 1
-                if addNum <= 0:
-                    break
+        while addNum > 0 and self.downloadList:
+            task = self.downloadList.popleft()
+            assert isinstance(task, DownloadItem)
+            if task.status != task.Waiting:
+                continue
+            self.StartItemDownload(task)
+            if task.status == task.Downloading:
+                addNum -= 1
+            elif task.status == task.Waiting:
+                self.downloadList.add(task)
+                break
 
         convertNum = config.ConvertThreadNum
         addNum = convertNum - len(self.convertingList)
-        if addNum > 0:
-            for task in list(self.convertList):
-                assert isinstance(task, DownloadItem)
-                if task.convertStatus != task.Waiting:
-                    self.convertList.remove(task)
-                    continue
-
-                self.StartItemConvert(task)
-                if task.convertStatus == task.Converting:
-                    addNum -= 1
-                if addNum <= 0:
-                    break
+        while addNum > 0 and self.convertList:
+            task = self.convertList.popleft()
+            assert isinstance(task, DownloadItem)
+            if task.convertStatus != task.Waiting:
+                continue
+
+            self.StartItemConvert(task)
+            if task.convertStatus == task.Converting:
+                addNum -= 1
+            elif task.convertStatus == task.Waiting:
+                self.convertBlocked.add(task)
 
         for task in self.downloadingList:
             assert isinstance(task, DownloadItem)
@@ -176,14 +198,18 @@ class DownloadStatus(QtTaskBase):
         self.SetNewStatus(task, newStatus)
         if newStatus != task.Downloading:
             return
-        epsId, index, savePath, isInit = task.GetDownloadPath()
-
-        self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+        self.DownloadNextPages(task)
         self.UpdateTaskDB(task)
         return
 
-    def DownloadStCallBack(self, data, taskId):
-        task = self.downloadDict.get(taskId)
+    def DownloadNextPages(self, task):
+        # 每本书同时下载多页, 完成一页补一页
+        for epsId, index, savePath, isInit in task.GetDownloadPaths(config.DownloadPageWindow):
+            self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, (task.bookId, epsId, index), savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit, isNeedData=False)
+
+    def DownloadStCallBack(self, data, backParam):
+        bookId, epsId, index = backParam
+        task = self.downloadDict.get(bookId)
         if not task:
             return
         assert isinstance(task, DownloadItem)
@@ -202,19 +228,23 @@ class DownloadStatus(QtTaskBase):
             self.StartItemDownload(task)
         elif st == Str.Cache:
             # 进行下一个图片
-            newStatus = task.DownloadSucCallBack()
+            self.AddDownloadPage(task, epsId, index)
+            newStatus = task.DownloadSucCallBack(epsId, index)
             self.SetNewStatus(task, newStatus)
+            self._WakeConvert(task)
             if newStatus == task.Downloading:
-                epsId, index, savePath, isInit = task.GetDownloadPath()
-                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+                self.DownloadNextPages(task)
             return
         elif st in [Str.Reading, Str.ReadingEps, Str.ReadingPicture, Str.Downloading]:
             task.statusMsg = st
             self.UpdateTableItem(task)
         elif st == Str.SpaceEps:
+            if epsId != task.curDownloadEpsId:
+                return
             if Setting.IsSkipSpace.value:
                 index = task.epsIds.index(task.curDownloadEpsId)
                 Log.Warn(f"skip space eps, book_id:{task.bookId}, eps_id:{task.curDownloadEpsId}, index:{index}")
+                task.downloadingPages = {page for page in task.downloadingPages if page[0] != epsId}
                 if index + 1 >= len(task.epsIds):
                     newStatus = task.Success
                 else:
@@ -222,10 +252,7 @@ class DownloadStatus(QtTaskBase):
                     task.curDownloadEpsId = task.epsIds[index + 1]
                 self.SetNewStatus(task, newStatus)
                 if newStatus == task.Downloading:
-                    epsId, index, savePath, isInit = task.GetDownloadPath()
-                    self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack,
-                                         self.DownloadCompleteCallBack, task.bookId, savePath=savePath,
-                                         cleanFlag=task.cleanFlag, isInit=isInit)
+                    self.DownloadNextPages(task)
                 return
             else:
                 self.SetNewStatus(task, task.SpaceEps)
@@ -239,8 +266,8 @@ class DownloadStatus(QtTaskBase):
             self.SetNewStatus(task, task.Error)
         return
 
-    def DownloadCallBack(self, downloadSize, laveFileSize, taskId):
-        task = self.downloadDict.get(taskId)
+    def DownloadCallBack(self, downloadSize, laveFileSize, backParam):
+        task = self.downloadDict.get(backParam[0])
         if not task:
             return
         if task.status != task.Downloading:
@@ -250,18 +277,20 @@ class DownloadStatus(QtTaskBase):
         task.speedDownloadLen += downloadSize
         return
 
-    def DownloadCompleteCallBack(self, data, msg, taskId):
-        task = self.downloadDict.get(taskId)
+    def DownloadCompleteCallBack(self, data, msg, backParam):
+        bookId, epsId, index = backParam
+        task = self.downloadDict.get(bookId)
         if not task:
             return
         if task.status != task.Downloading:
             return
         if msg == Status.Ok:
-            newStatus = task.DownloadSucCallBack()
+            self.AddDownloadPage(task, epsId, index)
+            newStatus = task.DownloadSucCallBack(epsId, index)
             self.SetNewStatus(task, newStatus)
+            self._WakeConvert(task)
             if newStatus == task.Downloading:
-                epsId, index, savePath, isInit = task.GetDownloadPath()
-                self.AddDownloadBook(task.bookId, epsId, index, self.DownloadStCallBack, self.DownloadCallBack, self.DownloadCompleteCallBack, task.bookId, savePath=savePath, cleanFlag=task.cleanFlag, isInit=isInit)
+                self.DownloadNextPages(task)
             self.UpdateTableItem(task)
             self.UpdateTaskDB(task)
         else:
@@ -4,9 +4,9 @@ import time
 from functools import partial
 
 from PySide6 import QtWidgets
-from PySide6.QtCore import Qt, QTimer, QUrl, QSize
-from PySide6.QtGui import QCursor, QDesktopServices, QAction, QIcon
-from PySide6.QtWidgets import QHeaderView, QAbstractItemView, QMenu, QTableWidgetItem, QMessageBox
+from PySide6.QtCore import Qt, QTimer, QUrl
+from PySide6.QtGui import QCursor, QDesktopServices, QAction
+from PySide6.QtWidgets import QHeaderView, QAbstractItemView, QMenu, QMessageBox, QTableView
 
 from config import config
 from config.setting import Setting
@@ -22,6 +22,7 @@ from tools.str import Str
 from tools.tool import ToolUtil
 from view.download.download_db import DownloadDb
 from view.download.download_item import DownloadItem
+from view.download.download_model import DownloadTableModel, DownloadProxyModel
 from view.download.download_status import DownloadStatus
 
 
@@ -37,28 +38,36 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         # else:
         #     HorizontalHeaderLabels = ["id", "标题", "下载状态", "下载进度", "下载章节", "下载速度", "转换进度", "转换章节", "转换耗时", "转换状态"]
 
-        # self.tableWidget.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.tableWidget.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.tableWidget.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.tableWidget.setColumnCount(11)
-        # self.tableWidget.setHorizontalHeaderLabels(HorizontalHeaderLabels)
-        self.timer = QTimer(self.tableWidget)
+        # 界面和转换、NAS共用, 这里把QTableWidget换成QTableView, 数据由model提供
+        self.tableView = QTableView(self)
+        # 生成的retranslateUi还会设置旧表格的表头, 只隐藏不删除
+        self.gridLayout.replaceWidget(self.tableWidget, self.tableView)
+        self.tableWidget.hide()
+
+        # self.tableView.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.tableModel = DownloadTableModel(self)
+        self.tableProxy = DownloadProxyModel(self)
+        self.tableProxy.setSourceModel(self.tableModel)
+        self.tableView.setModel(self.tableProxy)
+        self.tableView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tableView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tableView.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.timer = QTimer(self.tableView)
         self.timer.setInterval(2000)
         self.timer.timeout.connect(self.TimeOutHandler)
 
-        self.failTimer = QTimer(self.tableWidget)
+        self.failTimer = QTimer(self.tableView)
         self.failTimer.setInterval(60*1000)
         self.failTimer.timeout.connect(self.CheckFailReDownload)
 
         # self.settings = QSettings('download.ini', QSettings.IniFormat)
         # self.InitSetting()
 
-        self.tableWidget.customContextMenuRequested.connect(self.SelectMenu)
+        self.tableView.customContextMenuRequested.connect(self.SelectMenu)
 
-        self.tableWidget.doubleClicked.connect(self.OpenBookInfo)
+        self.tableView.doubleClicked.connect(self.OpenBookInfo)
 
-        self.tableWidget.horizontalHeader().sectionClicked.connect(self.Sort)
+        self.tableView.horizontalHeader().sectionClicked.connect(self.Sort)
         self.allNewBookIds = set()
         self.updateNew.clicked.connect(self.UpdateAllNewBook)
         self.order = {}
@@ -68,45 +77,54 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         self.skipSpaceRadio.clicked.connect(self.SwitchSkipSpace)
         self.skipPic.clicked.connect(self.SwitchSkipPic)
         self.needLoadBookID = []
-        self.tableWidget.setColumnHidden(0, True)
+        self.tableView.setColumnHidden(0, True)
+        tasks = []
         for task in datas.values():
             self.downloadDict[task.bookId] = task
             if not task.epsIds:
                 Log.Warn("not fond task, epsIds, bookId:{}, title:{}".format(task.bookId, task.title))
                 continue
             self.needLoadBookID.append(task.bookId)
-
-            rowCont = self.tableWidget.rowCount()
-            task.tableRow = rowCont
-            self.tableWidget.insertRow(rowCont)
             self.RepairData(task)
-            self.UpdateTableItem(task)
-        self.tableWidget.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        # self.tableWidget.horizontalHeader().setMinimumSectionSize(120)
-        self.tableWidget.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
-        # self.tableWidget.setColumnWidth(0, 40)
-        print(self.width())
-        self.tableWidget.setColumnWidth(1, 300)
+            tasks.append(task)
+        # 一次插入所有行, 文字在显示时才计算
+        self.tableModel.AddTasks(tasks)
+        self.tableView.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # self.tableView.horizontalHeader().setMinimumSectionSize(120)
+        self.tableView.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        # self.tableView.setColumnWidth(0, 40)
+        self.tableView.setColumnWidth(1, 300)
         self.comboBox.currentIndexChanged.connect(self.CheckHideItem)
         self.lineEdit.textChanged.connect(self.SearchTextChange)
         self.searchText = ""
 
+    def retranslateUi(self, Download):
+        Ui_Download.retranslateUi(self, Download)
+        # 表头文字由model提供, 切换语言后通知表头刷新
+        if hasattr(self, "tableModel"):
+            self.tableModel.headerDataChanged.emit(Qt.Horizontal, 0, len(DownloadTableModel.Headers) - 1)
+
     # 修复下数据
     def RepairData(self, task):
         assert isinstance(task, DownloadItem)
+        oldStatus = (task.status, task.convertStatus)
         task.status = self.GetNewStatus(task.status)
         task.convertStatus = self.GetNewStatus(task.convertStatus)
         if task.status != task.Success:
             task.status = task.Pause
         if task.convertStatus != task.ConvertSuccess:
             task.convertStatus = task.Pause
+        if oldStatus != (task.status, task.convertStatus):
+            task.dirty = True
 
         for info in task.epsInfo.values():
             # 如果下载完成了，要修改下 curPreDownloadIndex和 curPreConvertId
-            if task.status == task.Success:
+            if task.status == task.Success and info.curPreDownloadIndex != info.picCnt:
                 info.curPreDownloadIndex = info.picCnt
-            if task.convertStatus == task.ConvertSuccess:
+                info.dirty = True
+            if task.convertStatus == task.ConvertSuccess and info.curPreConvertId != info.picCnt:
                 info.curPreConvertId = info.picCnt
+                info.dirty = True
         return
 
     def GetNewStatus(self, status):
@@ -122,6 +140,7 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
 
     def Close(self):
         self.timer.stop()
+        self.db.Close()
 
     def Init(self):
         self.timer.start()
@@ -208,9 +227,7 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
                     continue
                 task.epsIds.append(epsId)
 
-            rowCont = self.tableWidget.rowCount()
-            task.tableRow = rowCont
-            self.tableWidget.insertRow(rowCont)
+            self.tableModel.AddTasks([task])
             self.SetNewStatus(task, task.Waiting)
             if Setting.DownloadAuto.value or isWaifu2x:
                 self.SetNewCovertStatus(task, task.Waiting)
@@ -268,38 +285,19 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         assert isinstance(info, DownloadItem)
         if info.tableRow < 0:
             return
-        localTime = time.localtime(info.tick)
-
-        strTime = time.strftime("%Y-%m-%d %H:%M:%S", localTime)
-        self.tableWidget.setItem(info.tableRow, 0, QTableWidgetItem(info.bookId))
-        self.tableWidget.setItem(info.tableRow, 1, QTableWidgetItem(strTime))
-        item = QTableWidgetItem(info.title)
-        item.setToolTip(info.title)
-        self.tableWidget.setItem(info.tableRow, 2, item)
-
-        self.tableWidget.setItem(info.tableRow, 6, QTableWidgetItem(info.GetStatusMsg()))
-
-        self.tableWidget.setItem(info.tableRow, 3, QTableWidgetItem("{}/{}".format(str(info.curDownloadPic), str(info.maxDownloadPic))))
         bookInfo = BookMgr().GetBook(info.bookId)
-        self.allNewBookIds.discard(info.bookId)
-        item2 = QTableWidgetItem("{}/{}".format(str(info.curDownloadEps), str(info.epsCount)))
-        if isinstance(bookInfo, Book):
-            if len(info.epsIds) < bookInfo.epsCount:
-                icon2 = QIcon()
-                icon2.addFile(u":/png/icon/new.svg", QSize(), QIcon.Normal, QIcon.Off)
-                item2.setIcon(icon2)
-                self.allNewBookIds.add(info.bookId)
-        self.tableWidget.setItem(info.tableRow, 4, item2)
-        self.tableWidget.setItem(info.tableRow, 5, QTableWidgetItem(info.speedStr))
-        self.tableWidget.setItem(info.tableRow, 7, QTableWidgetItem("{}/{}".format(str(info.curConvertCnt), str(info.convertCnt))))
-        self.tableWidget.setItem(info.tableRow, 8, QTableWidgetItem("{}/{}".format(str(info.curConvertEps), str(info.convertEpsCnt))))
-        self.tableWidget.setItem(info.tableRow, 9, QTableWidgetItem("{}".format(str(info.convertTick))))
-        self.tableWidget.setItem(info.tableRow, 10, QTableWidgetItem(info.GetConvertStatusMsg()))
+        isNew = isinstance(bookInfo, Book) and len(info.epsIds) < bookInfo.epsCount
+        if isNew:
+            self.allNewBookIds.add(info.bookId)
+        else:
+            self.allNewBookIds.discard(info.bookId)
+        self.tableModel.SetNewEps(info.bookId, isNew)
+        self.tableModel.UpdateTask(info)
         return
     
     def UpdateSpeed(self, info):
         assert isinstance(info, DownloadItem)
-        self.tableWidget.setItem(info.tableRow, 5, QTableWidgetItem(info.speedStr))
+        self.tableModel.UpdateTask(info, [DownloadTableModel.ColumnSpeed])
         return
     
     def RemoveRecord(self, bookId):
@@ -307,30 +305,24 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         if not task:
             return
         assert isinstance(task, DownloadItem)
-        if task in self.downloadingList:
-            self.downloadingList.remove(task)
-        if task in self.downloadList:
-            self.downloadList.remove(task)
-        if task in self.convertList:
-            self.convertList.remove(task)
-        if task in self.convertingList:
-            self.convertingList.remove(task)
+        self.RemoveTask(task)
         self.downloadDict.pop(bookId)
-        if task.tableRow >= 0:
-            self.tableWidget.removeRow(task.tableRow)
+        self.allNewBookIds.discard(bookId)
+        self.tableModel.RemoveTask(bookId)
         self.db.DelDownloadDB(bookId)
 
-    def UpdateTableRow(self):
-        count = self.tableWidget.rowCount()
-        for i in range(count):
-            bookId = self.tableWidget.item(i, 0).text()
-            info = self.downloadDict.get(bookId)
-            if info:
-                info.tableRow = i
+    # 选中的任务, 按表格中的显示顺序
+    def GetSelectTasks(self):
+        tasks = []
+        for index in sorted(self.tableView.selectionModel().selectedRows(), key=lambda i: i.row()):
+            task = self.tableModel.GetTask(self.tableProxy.mapToSource(index).row())
+            if task:
+                tasks.append(task)
+        return tasks
 
     # 右键菜单
     def SelectMenu(self, pos):
-        index = self.tableWidget.indexAt(pos)
+        index = self.tableView.indexAt(pos)
         openDirAction = QAction(Str.GetStr(Str.OpenDir), self)
         openDirAction.triggered.connect(self.ClickOpenFilePath)
 
@@ -372,23 +364,14 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
                 action.triggered.connect(partial(self.NasUploadHandler, k))
 
         if index.isValid():
-            selected = self.tableWidget.selectedIndexes()
-            selectRows = set()
-            for index in selected:
-                selectRows.add(index.row())
-            if not selectRows:
+            selectTasks = self.GetSelectTasks()
+            if not selectTasks:
                 return
-            if len(selectRows) == 1:
+            if len(selectTasks) == 1:
                 # 单选
-                row = selectRows.pop()
-                col = 0
-                bookId = self.tableWidget.item(row, col).text()
-                title = self.tableWidget.item(row, 2).text()
-                task = self.downloadDict.get(bookId)
-                if not task:
-                    return
+                task = selectTasks[0]
 
-                menu = QMenu(self.tableWidget)
+                menu = QMenu(self.tableView)
 
                 menu.addAction(openDirAction)
                 menu.addAction(selectEpsAction)
@@ -405,7 +388,7 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
 
 
             else:
-                menu = QMenu(self.tableWidget)
+                menu = QMenu(self.tableView)
                 menu.addAction(startAction)
                 menu.addAction(pauseAction)
                 menu.addAction(startConvertAction)
@@ -423,86 +406,39 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
     #     return
 
     def NasUploadHandler(self, nasId):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
-            QtOwner().nasView.AddNasUpload2(task.title, nasId, bookId)
+        for task in self.GetSelectTasks():
+            QtOwner().nasView.AddNasUpload2(task.title, nasId, task.bookId)
 
     def ClickOpenFilePath(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
+        selectTasks = self.GetSelectTasks()
+        if not selectTasks:
             return
         # 只去第一个
-        row = selectRows.pop()
-        col = 0
-        bookId = self.tableWidget.item(row, col).text()
-        task = self.downloadDict.get(bookId)
+        task = selectTasks[0]
         assert isinstance(task, DownloadItem)
         QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(task.savePath)))
         return
 
     def ClickPause(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in self.GetSelectTasks():
             if task.status in [task.Success]:
                 continue
             self.SetNewStatus(task, task.Pause)
         return
 
     def ClickConvertPause(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in self.GetSelectTasks():
             if task.convertStatus in [task.ConvertSuccess]:
                 continue
             self.SetNewCovertStatus(task, task.Pause)
         return
 
     def ClickAddLocalBook(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
+        selectTasks = self.GetSelectTasks()
+        if not selectTasks:
             return
         allFilePath = []
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in selectTasks:
             assert isinstance(task, DownloadItem)
             if task.savePath:
                 allFilePath.append(os.path.dirname(task.savePath))
@@ -510,35 +446,13 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         return
     
     def ClickDownloadEps(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in self.GetSelectTasks():
             QtOwner().OpenEpsInfo(task.bookId)
 
         return
 
     def ClickStart(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in self.GetSelectTasks():
             if task.status not in [task.Pause, task.Error, task.SpaceEps]:
                 continue
             self.SetNewStatus(task, task.Waiting)
@@ -549,87 +463,49 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
                 self.SetNewCovertStatus(task, task.Waiting)
 
     def ClickConvertStart(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
-            return
-        for row in selectRows:
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in self.GetSelectTasks():
             if task.convertStatus not in [task.Pause, task.Error, task.SpaceEps]:
                 continue
             self.SetNewCovertStatus(task, task.Waiting)
 
     def DelRecording(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
+        selectTasks = self.GetSelectTasks()
+        if not selectTasks:
             return
         isRun = QMessageBox.information(self, '删除', "是否删除记录", QtWidgets.QMessageBox.Yes|QtWidgets.QMessageBox.No)
         if isRun != QtWidgets.QMessageBox.Yes:
             return
-        for row in sorted(selectRows, reverse=True):
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            self.RemoveRecord(bookId)
-        self.UpdateTableRow()
+        for task in selectTasks:
+            self.RemoveRecord(task.bookId)
 
     def DelRecordingAndFile(self):
         isClear = QMessageBox.information(self, '删除记录', "是否删除记录和文件", QtWidgets.QMessageBox.Yes|QtWidgets.QMessageBox.No)
         if isClear != QtWidgets.QMessageBox.Yes:
             return
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if not selectRows:
+        selectTasks = self.GetSelectTasks()
+        if not selectTasks:
             return
         try:
-            for row in sorted(selectRows, reverse=True):
-                col = 0
-                bookId = self.tableWidget.item(row, col).text()
-                bookInfo = self.downloadDict.get(bookId)
-                if not bookInfo:
-                    continue
-                self.RemoveRecord(bookId)
+            for bookInfo in selectTasks:
+                self.RemoveRecord(bookInfo.bookId)
                 path = os.path.dirname(bookInfo.savePath)
                 if os.path.isdir(path):
                     shutil.rmtree(path, True)
 
         except Exception as es:
             Log.Error(es)
-        self.UpdateTableRow()
 
     def OpenBookInfo(self):
-        selected = self.tableWidget.selectedIndexes()
-        selectRows = set()
-        for index in selected:
-            selectRows.add(index.row())
-        if len(selectRows) > 1:
-            return
-        if len(selectRows) <= 0:
+        selectTasks = self.GetSelectTasks()
+        if len(selectTasks) != 1:
             return
-        row = list(selectRows)[0]
-        col = 0
-        bookId = self.tableWidget.item(row, col).text()
+        bookId = selectTasks[0].bookId
         if not bookId:
             return
         QtOwner().OpenBookInfo(bookId)
 
     def StartAll(self):
-        for row in range(self.tableWidget.rowCount()):
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in list(self.tableModel.tasks):
             if task.status not in [task.Pause, task.Error, task.SpaceEps]:
                 continue
             self.SetNewStatus(task, task.Waiting)
@@ -639,34 +515,19 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
                 self.SetNewCovertStatus(task, task.Waiting)
 
     def StopAll(self):
-        for row in range(self.tableWidget.rowCount()):
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in list(self.tableModel.tasks):
             if task.status in [task.Success]:
                 continue
             self.SetNewStatus(task, task.Pause)
 
     def StartConvertAll(self):
-        for row in range(self.tableWidget.rowCount()):
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in list(self.tableModel.tasks):
             if task.convertStatus not in [task.Pause, task.Error, task.SpaceEps]:
                 continue
             self.SetNewCovertStatus(task, task.Waiting)
 
     def StopConvertAll(self):
-        for row in range(self.tableWidget.rowCount()):
-            col = 0
-            bookId = self.tableWidget.item(row, col).text()
-            task = self.downloadDict.get(bookId)
-            if not task:
-                continue
+        for task in list(self.tableModel.tasks):
             if task.convertStatus in [task.ConvertSuccess]:
                 continue
             self.SetNewCovertStatus(task, task.Pause)
@@ -677,12 +538,11 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
     def Sort(self, col):
         order = self.order.get(col, 1)
         if order == 1:
-            self.tableWidget.sortItems(col, Qt.AscendingOrder)
+            self.tableProxy.sort(col, Qt.AscendingOrder)
             self.order[col] = 0
         else:
-            self.tableWidget.sortItems(col, Qt.DescendingOrder)
+            self.tableProxy.sort(col, Qt.DescendingOrder)
             self.order[col] = 1
-        self.UpdateTableRow()
 
     def SwitchReDownload(self):
         Setting.IsReDownload.SetValue(int(self.redownloadRadio.isChecked()))
@@ -709,36 +569,4 @@ class DownloadView(QtWidgets.QWidget, Ui_Download, DownloadStatus):
         self.CheckHideItem()
 
     def CheckHideItem(self):
-        sortId = self.comboBox.currentIndex()
-        count = self.tableWidget.rowCount()
-        for i in range(count):
-            bookId = self.tableWidget.item(i, 0).text()
-            info = self.downloadDict.get(bookId)
-            if info:
-                assert isinstance(info, DownloadItem)
-                isFind = False
-                if self.searchText:
-                    if self.searchText in str(info.bookId):
-                        isFind = True
-                    if self.searchText in Converter('zh-hans').convert(info.title):
-                        isFind = True
-                    if self.searchText in Converter('zh-hans').convert(info.author):
-                        isFind = True
-                else:
-                    isFind = True
-
-                if sortId == 0:
-                    if isFind:
-                        self.tableWidget.setRowHidden(i, False)
-                    else:
-                        self.tableWidget.setRowHidden(i, True)
-                elif sortId == 1:
-                    if info.status == DownloadItem.Success or not isFind:
-                        self.tableWidget.setRowHidden(i, True)
-                    else:
-                        self.tableWidget.setRowHidden(i, False)
-                elif sortId == 2:
-                    if info.status == DownloadItem.Success and isFind:
-                        self.tableWidget.setRowHidden(i, False)
-                    else:
-                        self.tableWidget.setRowHidden(i, True)
\ No newline at end of file
+        self.tableProxy.SetFilter(self.searchText, self.comboBox.currentIndex())
@@ -57,41 +57,34 @@ class BookEpsView(QtWidgets.QWidget, Ui_BookEps, QtTaskBase):
         QtOwner().CloseLoading()
         if st == Status.Ok:
             QtOwner().ShowLoading()
-            self.LoadEpsData(1)
+            self.LoadEpsData()
         else:
             QtOwner().ShowError(Str.GetStr(Str.ChapterLoadFail) + ", {}".format(Str.GetStr(st)))
 
-    def LoadEpsData(self, page=1):
+    def LoadEpsData(self):
         info = BookMgr().books.get(self.bookId)
         if not info:
             return
         assert isinstance(info, Book)
-        if info.maxLoadEps <= 0:
-            self.AddHttpTask(req.GetComicsBookEpsReq(self.bookId), self.LoadEpsDataBack, 0)
-            return
-
-        if page > info.maxLoadEps:
-            QtOwner().CloseLoading()
-            self.UpdateEpsInfo()
-            return
-        if page not in info.curLoadEps:
-
-            self.AddHttpTask(req.GetComicsBookEpsReq(self.bookId, page), self.LoadEpsDataBack, page)
-        else:
-            self.LoadEpsData(page + 1)
+        # 第一页返回总页数后其余分页并发加载
+        BookMgr().LoadEps(self.bookId, self.LoadEpsDataBack, self.bookId)
 
     def InitEpsInfoBack(self, raw):
         st = raw["st"]
         if st == Status.Ok:
-            self.LoadEpsData(1)
+            self.LoadEpsData()
         else:
             QtOwner().ShowError(Str.GetStr(Str.ChapterLoadFail) + ", {}".format(Str.GetStr(st)))
         return
 
-    def LoadEpsDataBack(self, raw, loadPage):
+    def LoadEpsDataBack(self, raw, bookId):
+        # 加载期间已经切换到其他书
+        if bookId != self.bookId:
+            return
         st = raw["st"]
+        QtOwner().CloseLoading()
         if st == Status.Ok:
-            self.LoadEpsData(loadPage+1)
+            self.UpdateEpsInfo()
         else:
             QtOwner().ShowError(Str.GetStr(Str.ChapterLoadFail) + ", {}".format(Str.GetStr(st)))
         return
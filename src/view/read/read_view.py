@@ -14,6 +14,7 @@ from server import req, Status, Log
 from task.qt_task import QtTaskBase
 from task.task_local import LocalData
 from tools.book import BookMgr
+from tools.download_queue import DownloadPriority
 from tools.str import Str
 from tools.tool import time_me, ToolUtil
 from tools.image_cache import get_image_cache
@@ -951,10 +952,15 @@ class ReadView(QtWidgets.QWidget, QtTaskBase):
             assert isinstance(self.cacheBook, LocalData)
             self.AddLocalTaskLoadPicture(self.cacheBook, i, callBack=self.CompleteDownloadPic, backparam=i)
         elif not self.isOffline:
+            # 当前页插队, 其余为预加载
+            if i == self.curIndex or (ReadMode.isDouble(self.stripModel) and i == self.curIndex + 1):
+                priority = DownloadPriority.Visible
+            else:
+                priority = DownloadPriority.Preload
             self.AddDownloadBook(self.bookId, self.epsId, i,
                                  downloadCallBack=self.UpdateProcessBar,
                                  completeCallBack=self.CompleteDownloadPic,
-                                 backParam=i, loadPath=loadPath)
+                                 backParam=i, loadPath=loadPath, priority=priority)
         else:
             self.AddDownloadBookCache(loadPath, completeCallBack=self.CompleteDownloadPic, backParam=i)
         if i not in self.pictureData:
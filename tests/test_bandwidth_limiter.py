@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+BandwidthLimiter 单元测试
+"""
+import sys
+import os
+import asyncio
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.bandwidth_limiter import BandwidthLimiter
+from tools.download_queue import DownloadPriority
+
+
+class TestBandwidthLimiter(unittest.TestCase):
+    """BandwidthLimiter单元测试"""
+
+    def test_unlimited_when_idle(self):
+        """测试没有前台流量时后台不限速"""
+        async def run():
+            limiter = BandwidthLimiter(max_rate=0)
+            start = time.monotonic()
+            for _ in range(100):
+                await limiter.consume(1024 * 1024, DownloadPriority.Background)
+            return time.monotonic() - start, limiter.get_rate()
+        cost, rate = asyncio.run(run())
+        self.assertLess(cost, 0.1)
+        self.assertEqual(rate, 0)
+
+    def test_max_rate(self):
+        """测试配置了最大速度时后台按令牌桶限速"""
+        async def run():
+            limiter = BandwidthLimiter(max_rate=100 * 1024, burst_sec=0.1)
+            start = time.monotonic()
+            for _ in range(5):
+                await limiter.consume(10 * 1024, DownloadPriority.Background)
+            return time.monotonic() - start
+        # 50KB 按100KB/s 约0.5秒
+        self.assertGreater(asyncio.run(run()), 0.4)
+
+    def test_interactive_share(self):
+        """测试有前台流量时后台只用share比例, 前台不受限"""
+        async def run():
+            limiter = BandwidthLimiter(share=0.25, min_rate=1024, idle_sec=1)
+            limiter.capacity = 400 * 1024
+            await limiter.consume(0, DownloadPriority.Visible)
+            self.assertTrue(limiter.is_interactive_active())
+            self.assertEqual(limiter.get_rate(), 100 * 1024)
+
+            start = time.monotonic()
+            for _ in range(20):
+                await limiter.consume(1024 * 1024, DownloadPriority.Cover)
+            self.assertLess(time.monotonic() - start, 0.1)
+
+            start = time.monotonic()
+            await limiter.consume(30 * 1024, DownloadPriority.Background)
+            return time.monotonic() - start
+        self.assertGreater(asyncio.run(run()), 0.2)
+
+    def test_resume_after_idle(self):
+        """测试前台流量停止后等待中的后台下载立即恢复"""
+        async def run():
+            limiter = BandwidthLimiter(share=0.1, min_rate=1024, idle_sec=0.3)
+            await limiter.consume(0, DownloadPriority.Visible)
+            start = time.monotonic()
+            await limiter.consume(1024 * 1024, DownloadPriority.Background)
+            return time.monotonic() - start, limiter.get_stats()
+        cost, stats = asyncio.run(run())
+        self.assertLess(cost, 1)
+        self.assertFalse(stats["interactive_active"])
+        self.assertGreater(stats["throttled_sec"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+BaseRes 延迟解析单元测试
+"""
+import sys
+import os
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import httpx
+
+from server.res import BaseRes
+from tools.tool import ToolUtil
+
+
+def make_response(body, status=200):
+    content = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    return httpx.Response(status, content=content, request=httpx.Request("GET", "https://example.com/"))
+
+
+class TestBaseRes(unittest.TestCase):
+    """BaseRes单元测试"""
+
+    def test_lazy_parse(self):
+        """测试构造时不解析, 第一次访问时解析全部字段"""
+        res = BaseRes(make_response({"code": 200, "message": "success", "data": {"comics": [1, 2]}}), True, "Req")
+        self.assertNotIn("code", res.__dict__)
+        self.assertEqual(res.code, 200)
+        self.assertEqual(res.message, "success")
+        self.assertEqual(res.data, {"comics": [1, 2]})
+
+    def test_extra_fields(self):
+        """测试顶层的其他字段也能访问"""
+        res = BaseRes(make_response({"code": 400, "error": "1005", "message": "unauthorized"}), True, "Req")
+        self.assertEqual(res.error, "1005")
+        self.assertFalse(hasattr(res, "detail"))
+
+    def test_defaults(self):
+        """测试不解析或请求失败时使用默认值"""
+        res = BaseRes("", False, "Req")
+        self.assertEqual((res.code, res.message, res.data), (0, "", {}))
+        res = BaseRes(make_response({"code": 200}), False, "Req")
+        self.assertEqual(res.code, 0)
+
+    def test_invalid_json(self):
+        """测试无法解析的内容保留默认值"""
+        res = BaseRes(make_response(b"<html>502 Bad Gateway</html>", 502), True, "Req")
+        self.assertEqual(res.code, 0)
+        self.assertEqual(res.data, {})
+        self.assertIn("502", res.GetText())
+
+    def test_load_json(self):
+        """测试str、bytes和非utf8编码都能解析"""
+        data = {"title": "测试", "count": 2 ** 70}
+        text = json.dumps(data, ensure_ascii=False)
+        self.assertEqual(ToolUtil.LoadJson(text), data)
+        self.assertEqual(ToolUtil.LoadJson(text.encode("utf-8")), data)
+        self.assertEqual(ToolUtil.LoadJson(text.encode("utf-16")), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+BlobStore 单元测试
+"""
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.blob_store import BlobStore, scan_duplicates
+from tools.stream_buffer import StreamFile
+
+
+class TestBlobStore(unittest.TestCase):
+    """BlobStore单元测试"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="pica_blob_")
+        self.store = BlobStore(os.path.join(self.path, "blobs"))
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _path(self, *names):
+        return os.path.join(self.path, *names)
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_put_bytes_dedup(self):
+        """测试相同内容只保存一份"""
+        data = os.urandom(4096)
+        cachePath = self._path("cache", "book", "1", "1", "1.jpg")
+        savePath = self._path("commies", "a", "original", "0001.jpg")
+        digest = self.store.put_bytes(data, [cachePath])
+        digest2 = self.store.put_bytes(data, [savePath])
+        self.assertEqual(digest, digest2)
+        self.assertEqual(self._read(cachePath), data)
+        self.assertEqual(self._read(savePath), data)
+        self.assertTrue(os.path.samefile(cachePath, savePath))
+        self.assertEqual(self.store.refcount(digest), 2)
+        stats = self.store.get_stats()
+        self.assertEqual(stats['blobs'], 1)
+        self.assertEqual(stats['dedup'], 1)
+        self.assertEqual(stats['saved_bytes'], len(data))
+
+    def test_put_file(self):
+        """测试临时文件放进仓库"""
+        data = os.urandom(1000)
+        tmpPath = self._path("a.part")
+        self._write(tmpPath, data)
+        paths = [self._path("x", "1.jpg"), self._path("y", "1.jpg")]
+        digest = self.store.put_file(tmpPath, paths)
+        self.assertFalse(os.path.exists(tmpPath))
+        self.assertEqual(digest, BlobStore.hash_bytes(data))
+        for path in paths:
+            self.assertEqual(self._read(path), data)
+        self.assertEqual(self.store.refcount(digest), 2)
+
+        # 再放一次相同的内容, 临时文件被删掉
+        self._write(tmpPath, data)
+        self.store.put_file(tmpPath, [self._path("z", "1.jpg")], digest)
+        self.assertFalse(os.path.exists(tmpPath))
+        self.assertEqual(self.store.refcount(digest), 3)
+
+    def test_replace_not_in_place(self):
+        """测试覆盖路径时不改写共享的blob"""
+        data, data2 = b"a" * 100, b"b" * 100
+        path = self._path("x", "1.jpg")
+        path2 = self._path("y", "1.jpg")
+        digest = self.store.put_bytes(data, [path, path2])
+        self.store.put_bytes(data2, [path])
+        self.assertEqual(self._read(path), data2)
+        self.assertEqual(self._read(path2), data)
+        self.assertEqual(self._read(self.store.blob_path(digest)), data)
+        self.assertEqual(self.store.refcount(digest), 1)
+
+    def test_link_file(self):
+        """测试收进已有文件, 重复的文件换成硬链接"""
+        data = os.urandom(2048)
+        cachePath = self._path("cache", "1.jpg")
+        savePath = self._path("commies", "0001.jpg")
+        otherPath = self._path("other", "1.jpg")
+        self._write(cachePath, data)
+        self._write(otherPath, data)
+        digest = self.store.link_file(cachePath, [savePath])
+        self.assertTrue(os.path.samefile(cachePath, savePath))
+        self.assertEqual(self.store.refcount(digest), 2)
+
+        self.store.link_file(otherPath)
+        self.assertTrue(os.path.samefile(cachePath, otherPath))
+        self.assertEqual(self.store.refcount(digest), 3)
+
+    def test_gc(self):
+        """测试删除没有引用的blob"""
+        path = self._path("x", "1.jpg")
+        path2 = self._path("y", "1.jpg")
+        digest = self.store.put_bytes(b"a" * 100, [path])
+        digest2 = self.store.put_bytes(b"b" * 50, [path2])
+        self.store.put_derived(digest, "tag", digest2)
+        os.remove(path2)
+        self.assertEqual(self.store.refcount(digest2), 0)
+        self.assertEqual(self.store.gc(), (1, 50))
+        self.assertTrue(self.store.has(digest))
+        self.assertFalse(self.store.has(digest2))
+        self.assertIsNone(self.store.get_derived(digest, "tag"))
+
+    def test_derived(self):
+        """测试转换结果索引"""
+        src = self.store.put_bytes(b"src", [self._path("src.jpg")])
+        out = self.store.put_bytes(b"out", [self._path("cache", "waifu2x", "1.jpg")])
+        self.assertIsNone(self.store.get_derived(src, "t1"))
+        self.store.put_derived(src, "t1", out)
+        self.assertEqual(self.store.get_derived(src, "t1"), out)
+        self.assertIsNone(self.store.get_derived(src, "t2"))
+
+        savePath = self._path("commies", "waifu2x", "0001.jpg")
+        self.assertTrue(self.store.link_digest(out, [savePath]))
+        self.assertEqual(self._read(savePath), b"out")
+        self.assertFalse(self.store.link_digest(BlobStore.hash_bytes(b"none"), [savePath]))
+        self.assertEqual(self.store.get_stats()['derived_hits'], 1)
+
+    def test_stream_file(self):
+        """测试边下载边计算hash后交给仓库"""
+        data = os.urandom(300000)
+        cachePath = self._path("cache", "book", "1.jpg")
+        savePath = self._path("commies", "0001.jpg")
+        for paths in ([cachePath], [savePath]):
+            streamFile = StreamFile(paths, self.store)
+            for i in range(0, len(data), 65536):
+                streamFile.Write(data[i:i + 65536])
+            streamFile.Commit()
+            self.assertFalse(os.path.exists(streamFile.tempPath))
+        self.assertTrue(os.path.samefile(cachePath, savePath))
+        self.assertEqual(self._read(savePath), data)
+        self.assertEqual(self.store.refcount(BlobStore.hash_bytes(data)), 2)
+
+    def test_scan_duplicates(self):
+        """测试重复空间统计"""
+        data = os.urandom(1000)
+        self._write(self._path("cache", "1.jpg"), data)
+        self._write(self._path("commies", "1.jpg"), data)
+        self._write(self._path("commies", "2.jpg"), os.urandom(1000))
+        self._write(self._path("commies", "3.jpg"), b"c" * 10)
+        dirs = [self._path("cache"), self._path("commies")]
+        report = scan_duplicates(dirs)
+        self.assertEqual(report['files'], 4)
+        self.assertEqual(report['total_bytes'], 3010)
+        self.assertEqual(report['disk_bytes'], 3010)
+        self.assertEqual(report['unique_bytes'], 2010)
+        self.assertEqual(report['reclaimable_bytes'], 1000)
+
+        self.store.link_file(self._path("cache", "1.jpg"))
+        self.store.link_file(self._path("commies", "1.jpg"))
+        report = scan_duplicates(dirs + [self.store.root])
+        self.assertEqual(report['disk_bytes'], 2010)
+        self.assertEqual(report['reclaimable_bytes'], 0)
+        self.assertEqual(report['linked_bytes'], 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
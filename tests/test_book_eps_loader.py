@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+BookMgr.LoadEps 并发加载章节单元测试
+"""
+import sys
+import os
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from tools.book import BookMgr, Book
+from tools.status import Status
+
+
+class FakeTaskHttp(object):
+    """记录发出的请求, 由测试决定何时返回"""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self):
+        return self
+
+    def AddHttpTask(self, req, callBack=None, backParam=None, cleanFlag=None):
+        self.requests.append((req, callBack, backParam))
+
+    def Reply(self, mgr, st=Status.Ok):
+        req, callBack, backParam = self.requests.pop(0)
+        page = int(req.url.rsplit("=", 1)[1])
+        if st == Status.Ok:
+            info = mgr.books[backParam]
+            info.maxLoadEps = 10
+            info.epsLimit = 40
+            info.curLoadEps.add(page)
+        callBack({"st": st}, backParam)
+        return page
+
+
+class TestBookEpsLoader(unittest.TestCase):
+    """BookMgr.LoadEps单元测试"""
+
+    def setUp(self):
+        self.mgr = BookMgr()
+        info = Book()
+        info._id = "eps_test"
+        self.mgr.books[info.id] = info
+        self.http = FakeTaskHttp()
+        self.patch = mock.patch("task.task_http.TaskHttp", self.http)
+        self.patch.start()
+        self.results = []
+
+    def tearDown(self):
+        self.patch.stop()
+        self.mgr.books.pop("eps_test", None)
+        self.mgr.epsLoads.pop("eps_test", None)
+
+    def callBack(self, raw, param):
+        self.results.append((raw["st"], param))
+
+    def test_concurrent_pages(self):
+        """测试第一页返回后其余分页并发请求且不超过上限"""
+        self.mgr.LoadEps("eps_test", self.callBack, "a")
+        self.mgr.LoadEps("eps_test", self.callBack, "b")
+        self.assertEqual(len(self.http.requests), 1)
+        self.assertFalse(self.http.requests[0][0].isNoCache)
+        self.assertEqual(self.http.Reply(self.mgr), 1)
+        self.assertEqual(len(self.http.requests), config.EpsLoadConcurrency)
+
+        pages = [1]
+        maxInflight = 0
+        while self.http.requests:
+            maxInflight = max(maxInflight, len(self.http.requests))
+            pages.append(self.http.Reply(self.mgr))
+        self.assertEqual(sorted(pages), list(range(1, 11)))
+        self.assertLessEqual(maxInflight, config.EpsLoadConcurrency)
+        self.assertEqual(self.results, [(Status.Ok, "a"), (Status.Ok, "b")])
+
+    def test_already_loaded(self):
+        """测试全部加载过时直接回调"""
+        info = self.mgr.books["eps_test"]
+        info.maxLoadEps = 2
+        info.curLoadEps.update({1, 2})
+        self.mgr.LoadEps("eps_test", self.callBack, "a")
+        self.assertEqual(self.http.requests, [])
+        self.assertEqual(self.results, [(Status.Ok, "a")])
+
+    def test_reload_pages(self):
+        """测试已经加载过的分页可以强制重新请求"""
+        info = self.mgr.books["eps_test"]
+        info.maxLoadEps = 2
+        info.curLoadEps.update({1, 2})
+        self.mgr.LoadEps("eps_test", self.callBack, "a", reloadPages=[1])
+        self.mgr.LoadEps("eps_test", self.callBack, "b", reloadPages=[1, 2])
+        self.assertTrue(all(request.isNoCache for request, _, _ in self.http.requests))
+        pages = []
+        while self.http.requests:
+            pages.append(self.http.Reply(self.mgr))
+        self.assertEqual(pages, [1, 2])
+        self.assertEqual(self.results, [(Status.Ok, "a"), (Status.Ok, "b")])
+
+    def test_book_update(self):
+        """测试书更新后删除章节缓存, 已加载的分页重新请求"""
+        info = self.mgr.books["eps_test"]
+        info.epsCount = 2
+        info.updated_at = "2024-01-01"
+        info.maxLoadEps = 1
+        info.curLoadEps.add(1)
+        backData = mock.Mock(status=Status.Ok)
+        backData.res.data = {"comic": {"_id": "eps_test", "epsCount": 2, "updated_at": "2024-01-01"}}
+        with mock.patch("tools.response_cache.get_response_cache") as getCache:
+            self.assertEqual(self.mgr.AddBookByIdBack(backData), Status.Ok)
+            self.assertEqual(info.curLoadEps, {1})
+            getCache.return_value.invalidate_prefix.assert_not_called()
+
+            backData.res.data["comic"]["epsCount"] = 3
+            with mock.patch.object(config, "IsUseApiCache", True):
+                self.mgr.AddBookByIdBack(backData)
+            self.assertEqual(info.curLoadEps, set())
+            self.assertEqual(info.maxLoadEps, 0)
+            names = [c.args[0] for c in getCache.return_value.invalidate_prefix.call_args_list]
+            self.assertEqual(names, ["GetComicsBookEpsReq", "GetComicsBookOrderReq"])
+            self.assertTrue(getCache.return_value.invalidate_prefix.call_args.args[1].endswith("comics/eps_test/"))
+
+    def test_error(self):
+        """测试分页失败时停止请求并返回错误"""
+        self.mgr.LoadEps("eps_test", self.callBack, "a")
+        self.http.Reply(self.mgr)
+        self.http.Reply(self.mgr, Status.NetError)
+        while self.http.requests:
+            self.http.Reply(self.mgr)
+        self.assertEqual(self.results, [(Status.NetError, "a")])
+        self.assertNotIn("eps_test", self.mgr.epsLoads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+DnsCache 单元测试
+"""
+import sys
+import os
+import socket
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.dns_cache import DnsCache
+
+
+class TestDnsCache(unittest.TestCase):
+    """DnsCache单元测试"""
+
+    def setUp(self):
+        self.calls = []
+
+        def resolver(host, port, family=0, type=0, proto=0, flags=0):
+            self.calls.append((host, family))
+            if host == "bad.example":
+                raise socket.gaierror(socket.EAI_NONAME, "not found")
+            if family == socket.AF_INET6:
+                return [(socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", port, 0, 0))]
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+
+        self.cache = DnsCache(resolver, ttl=0.2, negative_ttl=0.2, refresh_ahead=0.5)
+
+    def test_hit(self):
+        """测试重复解析命中缓存"""
+        first = self.cache.resolve("a.example", 443)
+        second = self.cache.resolve("a.example", 443)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 2)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_parallel_order(self):
+        """测试A/AAAA并行查询并按设置排序"""
+        result = self.cache.resolve("a.example", 443)
+        self.assertEqual(result[0][0], socket.AF_INET)
+        self.assertEqual({family for _, family in self.calls}, {socket.AF_INET, socket.AF_INET6})
+        self.cache.prefer_ipv6 = True
+        self.cache.clear()
+        self.assertEqual(self.cache.resolve("a.example", 443)[0][0], socket.AF_INET6)
+
+    def test_negative(self):
+        """测试解析失败的结果也会缓存"""
+        for _ in range(3):
+            with self.assertRaises(socket.gaierror):
+                self.cache.resolve("bad.example", 443)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.get_stats()["negative_hits"], 2)
+
+    def test_refresh_ahead(self):
+        """测试快过期时后台刷新"""
+        self.cache.resolve("a.example", 443, socket.AF_INET)
+        time.sleep(0.12)
+        self.cache.resolve("a.example", 443, socket.AF_INET)
+        self.cache._refresher.submit(lambda: None).result()
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache.get_stats()["refreshes"], 1)
+        time.sleep(0.12)
+        # 刷新后的结果还没过期
+        self.cache.resolve("a.example", 443, socket.AF_INET)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_ip_bypass(self):
+        """测试IP地址不缓存"""
+        self.cache.resolve("127.0.0.1", 443)
+        self.assertEqual(self.cache.get_stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
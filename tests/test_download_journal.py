@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+DownloadJournal 单元测试
+"""
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from view.download.download_journal import DownloadJournal
+
+
+class TestDownloadJournal(unittest.TestCase):
+    """DownloadJournal单元测试"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="pica_journal_")
+        self.path = os.path.join(self.dir, "download.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_load(self):
+        """测试重启后一次读出每个章节的准确进度"""
+        journal = DownloadJournal(self.path)
+        for index in [0, 1, 3, 2, 6]:
+            journal.AddPage("book1", 0, index)
+        journal.AddPage("book1", 1, 0)
+        journal.AddPage("book2", 0, 0)
+        journal.DelBook("book2")
+        journal.Close()
+
+        journal = DownloadJournal(self.path)
+        progress = journal.Load()
+        self.assertEqual(progress, {("book1", 0): (4, 1 << 6), ("book1", 1): (1, 0)})
+        self.assertEqual(journal.appendCnt, 8)
+
+    def test_partial_line(self):
+        """测试崩溃时写了一半的记录被忽略"""
+        journal = DownloadJournal(self.path)
+        journal.AddPage("book1", 0, 0)
+        journal.Close()
+        with open(self.path, "a") as f:
+            f.write("p\tbook1\t0\t")
+        self.assertEqual(DownloadJournal(self.path).Load(), {("book1", 0): (1, 0)})
+
+    def test_compact(self):
+        """测试压缩后进度不变, 已保存的章节被去掉, 之后还可以继续追加"""
+        journal = DownloadJournal(self.path, compactNum=4)
+        for index in range(3):
+            journal.AddPage("book1", 0, index)
+        journal.AddPage("book1", 1, 2)
+        journal.AddPage("book2", 0, 0)
+        self.assertTrue(journal.NeedCompact())
+        journal.Compact(lambda bookId, epsId, preIndex, bits: bookId == "book2")
+        self.assertFalse(journal.NeedCompact())
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        journal.AddPage("book1", 0, 3)
+        journal.Close()
+        self.assertEqual(DownloadJournal(self.path).Load(), {("book1", 0): (4, 0), ("book1", 1): (0, 1 << 2)})
+
+
+class TestDownloadDbJournal(unittest.TestCase):
+    """DownloadDb崩溃恢复测试"""
+
+    def test_resume(self):
+        """测试数据库没写入的进度和不连续的页在重启后都能恢复"""
+        from view.download.download_db import DownloadDb
+        from view.download.download_item import DownloadItem, DownloadEpsItem
+
+        path = tempfile.mkdtemp(prefix="pica_dl_")
+        try:
+            with mock.patch("config.setting.Setting.GetConfigPath", return_value=path):
+                db = DownloadDb()
+            task = DownloadItem()
+            task.bookId, task.title, task.epsIds = "book1", "book", [0, 1]
+            info = DownloadEpsItem()
+            info.bookId, info.epsId, info.epsTitle, info.picCnt = "book1", 0, "eps", 10
+            task.epsInfo[0] = info
+            db.AddDownloadDB(task)
+            db.AddDownloadEpsDB(info)
+            db.Flush()
+            # 之后的进度只写到日志, 模拟崩溃前数据库还没写入
+            for index in [0, 1, 2, 5]:
+                db.AddDownloadPage("book1", 0, index)
+            db.AddDownloadPage("book1", 1, 0)
+            db.journal.Close()
+
+            downloads = db.LoadDownload(None)
+            eps = downloads["book1"].epsInfo
+            self.assertEqual(eps[0].curPreDownloadIndex, 3)
+            self.assertTrue(eps[0].IsPageDone(5))
+            self.assertFalse(eps[0].IsPageDone(4))
+            self.assertTrue(eps[0].dirty)
+            self.assertEqual(eps[1].curPreDownloadIndex, 1)
+            self.assertEqual(downloads["book1"].GetDownloadPaths(2)[0][:2], (0, 3))
+            db.Close()
+            db.db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_compact_keep_unsaved(self):
+        """测试压缩在写入线程中进行, 只去掉数据库里已经有的进度"""
+        from view.download.download_db import DownloadDb
+        from view.download.download_item import DownloadEpsItem
+
+        path = tempfile.mkdtemp(prefix="pica_dl_")
+        try:
+            with mock.patch("config.setting.Setting.GetConfigPath", return_value=path):
+                db = DownloadDb()
+            info = DownloadEpsItem()
+            info.bookId, info.epsId, info.epsTitle, info.picCnt = "book1", 0, "eps", 10
+            info.curPreDownloadIndex = 3
+            db.AddDownloadEpsDB(info)
+            for index in range(3):
+                db.AddDownloadPage("book1", 0, index)
+                db.AddDownloadPage("book1", 1, index)
+            db.CompactJournal()
+            self.assertTrue(db.writer.flush())
+            self.assertFalse(db.journal.isCompacting)
+            self.assertEqual(db.journal.appendCnt, 0)
+            # 第0章已经写入数据库, 第1章还没有
+            self.assertEqual(DownloadJournal(db.journal.path).Load(), {("book1", 1): (3, 0)})
+            db.Close()
+            db.db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+DownloadTableModel / DownloadProxyModel 单元测试
+"""
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from PySide6.QtCore import QCoreApplication, Qt
+
+from view.download.download_item import DownloadItem
+from view.download.download_model import DownloadTableModel, DownloadProxyModel
+
+
+def make_task(i, title=""):
+    task = DownloadItem()
+    task.bookId = "book{}".format(i)
+    task.title = title or "title{}".format(i)
+    task.tick = 1000 - i
+    task.epsIds = [0]
+    return task
+
+
+class TestDownloadTableModel(unittest.TestCase):
+    """DownloadTableModel单元测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    def setUp(self):
+        self.model = DownloadTableModel()
+        self.tasks = [make_task(i) for i in range(5)]
+        self.model.AddTasks(self.tasks)
+        self.changes = []
+        self.model.dataChanged.connect(lambda a, b, roles: self.changes.append((a.row(), a.column(), b.column())))
+
+    def text(self, row, col):
+        return self.model.data(self.model.index(row, col))
+
+    def test_add(self):
+        """测试批量添加, 文字在显示时才计算"""
+        self.assertEqual(self.model.rowCount(), 5)
+        self.assertEqual(self.model.columnCount(), 11)
+        self.assertEqual(self.model.texts, [None] * 5)
+        self.assertEqual(self.text(2, DownloadTableModel.ColumnTitle), "title2")
+        self.assertIsNotNone(self.model.texts[2])
+        self.assertEqual(self.tasks[3].tableRow, 3)
+        # 重复添加忽略
+        self.model.AddTasks([self.tasks[0]])
+        self.assertEqual(self.model.rowCount(), 5)
+
+    def test_update_changed_columns(self):
+        """测试只通知变化了的列, 没显示过的行不通知"""
+        task = self.tasks[1]
+        self.model.UpdateTask(task)
+        self.assertEqual(self.changes, [])
+
+        self.text(1, 0)
+        task.speedStr = "1KB/s"
+        self.model.UpdateTask(task)
+        self.assertEqual(self.changes, [(1, DownloadTableModel.ColumnSpeed, DownloadTableModel.ColumnSpeed)])
+        self.model.UpdateTask(task)
+        self.assertEqual(len(self.changes), 1)
+
+        task.title = "new"
+        task.speedStr = "2KB/s"
+        self.model.UpdateTask(task, [DownloadTableModel.ColumnSpeed])
+        self.assertEqual(self.changes[-1], (1, DownloadTableModel.ColumnSpeed, DownloadTableModel.ColumnSpeed))
+        self.assertEqual(self.text(1, DownloadTableModel.ColumnTitle), "title1")
+        self.model.UpdateTask(task)
+        self.assertEqual(self.changes[-1], (1, DownloadTableModel.ColumnTitle, DownloadTableModel.ColumnTitle))
+        self.assertEqual(self.text(1, DownloadTableModel.ColumnTitle), "new")
+
+        # 多列变化时通知一个范围
+        task.title = "new2"
+        task.speedStr = "3KB/s"
+        self.model.UpdateTask(task)
+        self.assertEqual(self.changes[-1], (1, DownloadTableModel.ColumnTitle, DownloadTableModel.ColumnSpeed))
+
+    def test_remove(self):
+        """测试删除后后面的行号跟着变"""
+        self.model.RemoveTask("book1")
+        self.model.RemoveTask("book1")
+        self.assertEqual(self.model.rowCount(), 4)
+        self.assertEqual(self.tasks[1].tableRow, -1)
+        self.assertEqual(self.tasks[4].tableRow, 3)
+        self.assertEqual(self.model.GetRow("book4"), 3)
+        self.assertEqual(self.text(3, DownloadTableModel.ColumnId), "book4")
+
+    def test_new_eps(self):
+        """测试新章节标记"""
+        self.model.SetNewEps("book2", True)
+        self.assertEqual(self.changes, [(2, DownloadTableModel.ColumnDownloadEps, DownloadTableModel.ColumnDownloadEps)])
+        self.model.SetNewEps("book2", True)
+        self.assertEqual(len(self.changes), 1)
+        self.model.RemoveTask("book2")
+        self.assertNotIn("book2", self.model.newBookIds)
+
+
+class TestDownloadProxyModel(unittest.TestCase):
+    """DownloadProxyModel单元测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    def setUp(self):
+        self.model = DownloadTableModel()
+        self.tasks = [make_task(i, title) for i, title in enumerate(["b", "c", "a"])]
+        self.tasks[1].status = DownloadItem.Success
+        self.model.AddTasks(self.tasks)
+        self.proxy = DownloadProxyModel()
+        self.proxy.setSourceModel(self.model)
+
+    def ids(self):
+        return [self.proxy.data(self.proxy.index(i, 0)) for i in range(self.proxy.rowCount())]
+
+    def test_sort(self):
+        """测试按标题和时间排序"""
+        self.proxy.sort(DownloadTableModel.ColumnTitle, Qt.AscendingOrder)
+        self.assertEqual(self.ids(), ["book2", "book0", "book1"])
+        self.proxy.sort(DownloadTableModel.ColumnTime, Qt.DescendingOrder)
+        self.assertEqual(self.ids(), ["book0", "book1", "book2"])
+        # 转换耗时按数值排序, 不按"10s" < "9s"的文字顺序
+        for task, cvTick in zip(self.model.tasks, [10, 9, 100]):
+            task.cvTick = cvTick
+        self.proxy.sort(DownloadTableModel.ColumnConvertTick, Qt.AscendingOrder)
+        self.assertEqual([task.cvTick for task in self.model.tasks], [9, 10, 100])
+
+    def test_filter(self):
+        """测试搜索和完成状态过滤"""
+        self.proxy.SetFilter("", DownloadProxyModel.ShowComplete)
+        self.assertEqual(self.ids(), ["book1"])
+        self.proxy.SetFilter("", DownloadProxyModel.ShowNotComplete)
+        self.assertEqual(self.ids(), ["book0", "book2"])
+        self.proxy.SetFilter("book2", DownloadProxyModel.ShowAll)
+        self.assertEqual(self.ids(), ["book2"])
+        # 新加的行也按当前条件过滤
+        self.model.AddTasks([make_task(3), make_task(22)])
+        self.assertEqual(self.ids(), ["book2", "book22"])
+
+
+if __name__ == "__main__":
+    unittest.main()
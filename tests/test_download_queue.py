@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+DownloadQueue 单元测试
+"""
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.download_queue import DownloadQueue, DownloadPriority
+
+
+class TestDownloadQueue(unittest.TestCase):
+    """DownloadQueue单元测试"""
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_priority_order(self):
+        """测试按优先级取出"""
+        async def run():
+            queue = DownloadQueue(agingSec=100)
+            queue.put_nowait("background", DownloadPriority.Background)
+            queue.put_nowait("cover", DownloadPriority.Cover)
+            queue.put_nowait("preload", DownloadPriority.Preload)
+            queue.put_nowait("visible", DownloadPriority.Visible)
+            return [await queue.get() for _ in range(4)]
+        self.assertEqual(self.run_async(run()), ["visible", "preload", "cover", "background"])
+
+    def test_aging(self):
+        """测试等待过久的低优先级任务先于新的高优先级任务"""
+        async def run():
+            queue = DownloadQueue(agingSec=0.01)
+            queue.put_nowait("background", DownloadPriority.Background)
+            await asyncio.sleep(0.05)
+            queue.put_nowait("preload", DownloadPriority.Preload)
+            queue.put_nowait("visible", DownloadPriority.Visible)
+            return [await queue.get() for _ in range(3)]
+        self.assertEqual(self.run_async(run()), ["visible", "background", "preload"])
+
+    def test_only_urgent(self):
+        """测试预留worker只取阅读页"""
+        async def run():
+            queue = DownloadQueue()
+            queue.put_nowait("background", DownloadPriority.Background)
+            reserved = asyncio.ensure_future(queue.get(onlyUrgent=True))
+            await asyncio.sleep(0.01)
+            self.assertFalse(reserved.done())
+            queue.put_nowait("visible", DownloadPriority.Visible)
+            self.assertEqual(await asyncio.wait_for(reserved, 1), "visible")
+            self.assertEqual(await queue.get(), "background")
+            self.assertEqual(queue.get_stats()["waiting"], 0)
+        self.run_async(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+DownloadBookHandler 断点续传单元测试
+"""
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import contextlib
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from server import req
+from server.server import Server, Task
+from server.user_handler import DownloadBookHandler
+from tools.status import Status
+from tools.stream_buffer import StreamBuffer, StreamFile
+
+
+class FakeResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status_code = status
+        self.content = content
+        self.headers = httpx.Headers(headers or {})
+        self.headers.setdefault("Content-Length", str(len(content)))
+
+    async def aiter_bytes(self, chunk_size=None):
+        for i in range(0, len(self.content), 1024):
+            yield self.content[i:i + 1024]
+
+
+class FakeSession(object):
+    """按顺序返回准备好的响应, 记录请求头"""
+
+    def __init__(self):
+        self.responses = []
+        self.headers = []
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, headers=None, **kwargs):
+        self.headers.append(headers)
+        yield self.responses.pop(0)
+
+
+class TestDownloadResume(unittest.TestCase):
+    """DownloadBookHandler断点续传单元测试"""
+
+    Data = bytes(range(256)) * 40
+    Offset = 4096
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "1.jpg")
+        self.server = Server()
+        self.session = FakeSession()
+        self.reDownloads = []
+
+        @contextlib.asynccontextmanager
+        async def lease(isDownload=False):
+            yield self.session
+
+        self.taskBase = mock.Mock()
+        self.patches = [
+            mock.patch.object(self.server.sessionPool, "lease", lease),
+            mock.patch.object(self.server, "ReDownload", self.reDownloads.append),
+            mock.patch("server.user_handler.TaskBase", self.taskBase),
+            mock.patch("server.user_handler.get_blob_store", return_value=None),
+            mock.patch.object(config, "IsUseCache", True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def NewTask(self, resetCnt):
+        """上次下载到Offset时断开"""
+        request = req.DownloadBookReq("https://img.example.com/static/1.jpg", cachePath=self.path, resetCnt=resetCnt)
+        request.acceptRanges = True
+        request.partialFile = StreamFile([self.path])
+        request.partialFile.Write(self.Data[:self.Offset])
+        request.partialBuffer = StreamBuffer(len(self.Data))
+        request.partialBuffer.Write(self.Data[:self.Offset])
+        request.partialSize = self.Offset
+        return Task(request, 1)
+
+    def Run(self, task, response):
+        self.session.responses.append(response)
+        self.server.RunSync(DownloadBookHandler()(task))
+
+    def GetEmits(self):
+        return [c.args[1:] for c in self.taskBase.taskObj.downloadBack.emit.call_args_list]
+
+    def GetFile(self):
+        if not os.path.isfile(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def AssertNoPart(self):
+        self.assertEqual([name for name in os.listdir(self.tempDir) if name.endswith(".part")], [])
+
+    def test_resume_206(self):
+        """测试范围正确的206接在已下载的数据后面"""
+        task = self.NewTask(1)
+        self.Run(task, FakeResponse(206, self.Data[self.Offset:], {"Content-Range": "bytes 4096-10239/10240"}))
+        self.assertEqual(self.session.headers[0]["Range"], "bytes=4096-")
+        self.assertEqual(self.GetFile(), self.Data)
+        self.assertEqual(self.GetEmits()[-1], (0, self.Data))
+        self.assertEqual(task.req.resumeBytes, self.Offset)
+        self.AssertNoPart()
+
+    def test_ignore_range_200(self):
+        """测试服务器忽略Range返回200时从头保存"""
+        task = self.NewTask(1)
+        self.Run(task, FakeResponse(200, self.Data))
+        self.assertEqual(self.GetFile(), self.Data)
+        self.assertEqual(self.GetEmits()[-1], (0, self.Data))
+        self.assertEqual(task.req.resumeBytes, 0)
+        self.AssertNoPart()
+
+    def test_mismatch_206(self):
+        """测试范围不对的206不保存, 不带Range重新下载"""
+        task = self.NewTask(1)
+        self.Run(task, FakeResponse(206, self.Data, {"Content-Range": "bytes 0-10239/10240"}))
+        self.assertEqual(self.reDownloads, [task])
+        self.assertIsNone(self.GetFile())
+        self.assertEqual(self.GetEmits(), [])
+        self.AssertNoPart()
+
+        # 重试时由_Download减少次数
+        task.req.resetCnt -= 1
+        self.Run(task, FakeResponse(200, self.Data))
+        self.assertNotIn("Range", self.session.headers[1])
+        self.assertEqual(self.GetFile(), self.Data)
+        self.assertEqual(task.req.resumeBytes, 0)
+
+        # 没有重试次数时直接失败
+        os.remove(self.path)
+        task = self.NewTask(0)
+        self.Run(task, FakeResponse(206, self.Data, {"Content-Range": "bytes 0-10239/10240"}))
+        self.assertIsNone(self.GetFile())
+        self.assertEqual(self.GetEmits()[-1], (-Status.DownloadFail, b""))
+        self.AssertNoPart()
+
+    def test_416(self):
+        """测试416时不把错误内容当成图片"""
+        task = self.NewTask(1)
+        self.Run(task, FakeResponse(416, b"range not satisfiable"))
+        self.assertEqual(self.reDownloads, [task])
+        self.assertFalse(task.req.acceptRanges)
+
+        task = self.NewTask(0)
+        self.Run(task, FakeResponse(416, b"range not satisfiable"))
+        self.assertIsNone(self.GetFile())
+        self.assertEqual(self.GetEmits(), [(-Status.DownloadFail, b"")])
+        self.assertEqual(task.req.resumeBytes, 0)
+        self.AssertNoPart()
+
+
+if __name__ == '__main__':
+    unittest.main()
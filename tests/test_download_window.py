@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+下载管理器每本书多页并发下载的单元测试
+"""
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from config.setting import Setting
+from tools.status import Status
+from tools.str import Str
+from view.download.download_item import DownloadItem, DownloadEpsItem
+from view.download.download_status import DownloadStatus
+
+
+class FakeDownloadStatus(DownloadStatus):
+    """记录AddDownloadBook的调用, 由测试决定何时返回"""
+
+    def __init__(self):
+        with mock.patch("view.download.download_status.DownloadDb"):
+            DownloadStatus.__init__(self)
+        self.requests = []
+        self.cancels = []
+
+    def _CancelDownload(self, task):
+        self.cancels.append(task.bookId)
+        self.requests.clear()
+
+    def AddDownloadBook(self, bookId, epsId, index, statusBack=None, downloadCallBack=None, completeCallBack=None,
+                        backParam=None, savePath="", cleanFlag="", isInit=False, isNeedData=True, **kwargs):
+        self.requests.append((epsId, index, isInit, savePath, backParam))
+
+    def Init(self, maxPic=10):
+        epsId, index, isInit, savePath, backParam = self.requests.pop(0)
+        assert isInit
+        self.DownloadStCallBack({"st": Str.Success, "maxPic": maxPic, "title": "eps{}".format(epsId),
+                                 "bookName": "book", "author": "author"}, backParam)
+
+    def Complete(self, epsId, index):
+        for request in self.requests:
+            if request[:2] == (epsId, index):
+                self.requests.remove(request)
+                self.DownloadCompleteCallBack(b"", Status.Ok, request[4])
+                return
+        raise AssertionError("page not downloading: {}".format((epsId, index)))
+
+
+class TestDownloadEpsItem(unittest.TestCase):
+    """章节完成位图测试"""
+
+    def test_out_of_order(self):
+        """测试乱序完成时只推进连续完成的部分"""
+        info = DownloadEpsItem()
+        info.epsTitle, info.picCnt = "eps", 5
+        info.SetPageDone(2)
+        info.SetPageDone(1)
+        self.assertEqual(info.curPreDownloadIndex, 0)
+        self.assertTrue(info.IsPageDone(2))
+        self.assertFalse(info.IsPageDone(0))
+        info.SetPageDone(0)
+        self.assertEqual(info.curPreDownloadIndex, 3)
+        self.assertEqual(info.doneBits, 0)
+        info.SetPageDone(4)
+        info.SetPageDone(3)
+        self.assertTrue(info.isDownloadComplete())
+
+
+class TestDownloadWindow(unittest.TestCase):
+    """DownloadStatus页窗口测试"""
+
+    def setUp(self):
+        self.savePath = Setting.SavePath._value
+        Setting.SavePath._value = tempfile.gettempdir()
+        self.status = FakeDownloadStatus()
+        task = DownloadItem()
+        task.bookId = "book1"
+        task.epsIds = [0, 1]
+        task.status = task.Waiting
+        self.status.downloadDict[task.bookId] = task
+        self.task = task
+
+    def tearDown(self):
+        Setting.SavePath._value = self.savePath
+
+    def pages(self):
+        return sorted((r[0], r[1]) for r in self.status.requests)
+
+    def test_window(self):
+        """测试同时下载DownloadPageWindow页, 完成一页补一页"""
+        status, task = self.status, self.task
+        status.StartItemDownload(task)
+        self.assertEqual(len(status.requests), 1)
+        status.Init(10)
+        window = config.DownloadPageWindow
+        self.assertEqual(self.pages(), [(0, i) for i in range(window)])
+
+        # 乱序完成, 进度只到连续完成的页
+        status.Complete(0, 2)
+        status.Complete(0, 1)
+        self.assertEqual(task.curDownloadPic, 0)
+        self.assertEqual(self.pages(), [(0, 0), (0, 3), (0, 4), (0, 5)][:window])
+        status.Complete(0, 0)
+        self.assertEqual(task.curDownloadPic, 3)
+
+        while status.requests:
+            epsId, index = self.pages()[-1]
+            if status.requests[0][2]:
+                status.Init(3)
+                continue
+            status.Complete(epsId, index)
+        self.assertEqual(task.status, task.Success)
+        self.assertTrue(task.IsEpsComplete(0))
+        self.assertTrue(task.IsEpsComplete(1))
+
+    def test_error_clears_window(self):
+        """测试出错后重新开始时不会把没回来的页算作下载中"""
+        status, task = self.status, self.task
+        status.StartItemDownload(task)
+        status.Init(10)
+        request = status.requests.pop(0)
+        status.DownloadCompleteCallBack(b"", Status.Error, request[4])
+        self.assertEqual(task.status, task.Error)
+        self.assertEqual(task.downloadingPages, set())
+        # 还在下载的页被取消
+        self.assertEqual(status.cancels, ["book1"])
+        self.assertEqual(status.requests, [])
+
+        status.SetNewStatus(task, task.Waiting)
+        status.StartItemDownload(task)
+        self.assertEqual(len(status.requests), config.DownloadPageWindow)
+
+    def test_cancel_download(self):
+        """测试离开下载状态时按cleanFlag取消下载任务, 暂停只取消一次"""
+        task = self.task
+        with mock.patch("view.download.download_status.DownloadDb"):
+            status = DownloadStatus()
+        status.downloadDict[task.bookId] = task
+        with mock.patch("task.task_download.TaskDownload") as taskDownload:
+            status.SetNewStatus(task, task.Downloading)
+            status.SetNewStatus(task, task.SpaceEps)
+            taskDownload.return_value.Cancel.assert_called_once_with(task.cleanFlag)
+            status.SetNewStatus(task, task.Downloading)
+            status.SetNewStatus(task, task.Pause)
+            self.assertEqual(taskDownload.return_value.Cancel.call_count, 2)
+
+
+class TestDownloadScheduler(unittest.TestCase):
+    """DownloadStatus排队调度测试"""
+
+    def setUp(self):
+        self.status = FakeDownloadStatus()
+        self.started = []
+        self.status.StartItemDownload = self.FakeStart
+        self.tasks = []
+        for i in range(50):
+            task = DownloadItem()
+            task.bookId = "book{}".format(i)
+            self.status.downloadDict[task.bookId] = task
+            self.status.SetNewStatus(task, task.Waiting)
+            self.tasks.append(task)
+
+    def FakeStart(self, task):
+        self.started.append(task.bookId)
+        self.status.SetNewStatus(task, task.Downloading)
+
+    def test_fill_slots(self):
+        """测试每次只按空出来的名额从队首开始下载"""
+        status = self.status
+        status.TimeOutHandler()
+        num = config.DownloadThreadNum
+        self.assertEqual(self.started, ["book{}".format(i) for i in range(num)])
+        self.assertEqual(len(status.downloadingList), num)
+        self.assertEqual(len(status.downloadList), 50 - num)
+
+        # 暂停一个正在下载的, 下次补上一个, 暂停排队中的不会被启动
+        with mock.patch("task.task_download.TaskDownload"):
+            status.SetNewStatus(self.tasks[0], self.tasks[0].Pause)
+            status.SetNewStatus(self.tasks[num], self.tasks[num].Pause)
+        status.TimeOutHandler()
+        self.assertEqual(self.started[-1], "book{}".format(num + 1))
+        self.assertEqual(len(status.downloadingList), num)
+
+        status.RemoveTask(self.tasks[num + 2])
+        self.assertNotIn(self.tasks[num + 2], status.downloadList)
+
+    def test_convert_blocked(self):
+        """测试等待下载进度的转换任务不会每次都被重新检查"""
+        status = self.status
+        task = self.tasks[0]
+        task.ConvertInit = mock.Mock(return_value=task.Waiting)
+        status.SetNewCovertStatus(task, task.Waiting)
+        status.TimeOutHandler()
+        self.assertEqual(task.ConvertInit.call_count, 1)
+        self.assertIn(task, status.convertBlocked)
+        status.TimeOutHandler()
+        self.assertEqual(task.ConvertInit.call_count, 1)
+
+        # 下载状态变化后放回转换队列
+        status.SetNewStatus(task, task.Error)
+        self.assertIn(task, status.convertList)
+        status.TimeOutHandler()
+        self.assertEqual(task.ConvertInit.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
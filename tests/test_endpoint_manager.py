@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+EndpointManager 单元测试
+"""
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.endpoint_manager import EndpointManager, Route
+
+
+class TestEndpointManager(unittest.TestCase):
+    """EndpointManager单元测试"""
+
+    def setUp(self):
+        self.latency = {"api1": 0.3, "api2": 0.1, "api5": None}
+        self.probes = []
+        self.changes = []
+        self.routes = [Route("api", 1), Route("api", 2, "1.1.1.1"), Route("api", 5, proxyUrl="proxy.example")]
+
+        async def probe(route):
+            self.probes.append(route.name)
+            await asyncio.sleep(0.001)
+            latency = self.latency[route.name]
+            if latency is None:
+                raise ConnectionError(route.name)
+            return latency, None
+
+        self.manager = EndpointManager(probe, lambda kind: self.routes if kind == "api" else [],
+                                       lambda kind, route: self.changes.append(route.name),
+                                       min_probe_gap=0)
+
+    def test_select_fastest(self):
+        """测试选择延迟最低的线路"""
+        asyncio.run(self.manager.probe_all())
+        self.assertEqual(self.manager.best("api").name, "api2")
+        self.assertIsNone(self.manager.best("img"))
+        self.assertEqual(sorted(self.probes), ["api1", "api2", "api5"])
+        self.assertEqual(self.changes, ["api2"])
+        stats = self.manager.get_stats()
+        self.assertEqual(stats["routes"]["api5"]["fail_rate"], 1.0)
+
+    def test_hysteresis(self):
+        """测试新线路只快一点时不切换"""
+        asyncio.run(self.manager.probe_all())
+        self.latency["api1"] = 0.095
+        for _ in range(5):
+            asyncio.run(self.manager.probe_all())
+        self.assertEqual(self.manager.best("api").name, "api2")
+
+    def test_failover(self):
+        """测试当前线路连续失败时切到次优线路"""
+        asyncio.run(self.manager.probe_all())
+        for _ in range(3):
+            self.manager.record("api2", False)
+        self.assertEqual(self.manager.best("api").name, "api1")
+        self.assertEqual(self.changes, ["api2", "api1"])
+
+    def test_probe_gap(self):
+        """测试同一线路的测速间隔限制"""
+        self.manager.min_probe_gap = 100
+        asyncio.run(self.manager.probe_all())
+        asyncio.run(self.manager.probe_all())
+        self.assertEqual(len(self.probes), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
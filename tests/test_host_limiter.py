@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+HostLimiter 单元测试
+"""
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.host_limiter import HostLimiter
+
+
+class TestHostLimiter(unittest.TestCase):
+    """HostLimiter单元测试"""
+
+    def test_additive_increase(self):
+        """测试延迟正常时每轮加1"""
+        async def run():
+            limiter = HostLimiter(initial=2, max_limit=4, reserve=0)
+            for _ in range(20):
+                slot = await limiter.acquire("a")
+                slot.latency = 0.05
+                limiter.release(slot)
+            return limiter.get_limit("a")
+        self.assertEqual(asyncio.run(run()), 4)
+
+    def test_multiplicative_decrease(self):
+        """测试出错时减半且冷却期内只减一次"""
+        async def run():
+            limiter = HostLimiter(initial=16, reserve=0, cooldown=10)
+            for status in [503, 429]:
+                slot = await limiter.acquire("a")
+                slot.on_response(status)
+                limiter.release(slot)
+            stats = limiter.get_stats()["a"]
+            return stats["limit"], stats["errors"], stats["history"][-1][2]
+        self.assertEqual(asyncio.run(run()), (8, 2, "decrease"))
+
+    def test_limit_and_priority(self):
+        """测试超过上限时排队, 高优先级先唤醒且可以使用预留名额"""
+        async def run():
+            limiter = HostLimiter(initial=1, reserve=1)
+            first = await limiter.acquire("a", 3)
+            order = []
+
+            async def worker(name, priority):
+                slot = await limiter.acquire("a", priority)
+                order.append(name)
+                await asyncio.sleep(0.01)
+                limiter.release(slot)
+
+            low = asyncio.ensure_future(worker("low", 3))
+            await asyncio.sleep(0.01)
+            visible = asyncio.ensure_future(worker("visible", 0))
+            await asyncio.sleep(0.005)
+            # Visible使用预留名额, 不用等第一个请求结束
+            self.assertEqual(order, ["visible"])
+            limiter.release(first)
+            await asyncio.gather(low, visible)
+            self.assertEqual(order, ["visible", "low"])
+            self.assertEqual(limiter.get_stats()["a"]["inflight"], 0)
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
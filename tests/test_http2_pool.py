@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Http2PoolTransport 单元测试
+"""
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import httpx
+
+from tools.http2_pool import Http2PoolTransport
+
+
+class FakeStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b"ok"
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    """模拟一个域名的连接池: 第一次请求需要握手, 之后复用"""
+
+    def __init__(self, version=b"HTTP/2", connect_delay=0.05, delay=0.02, fail=0):
+        self.version = version
+        self.connect_delay = connect_delay
+        self.delay = delay
+        self.fail = fail
+        self.connected = False
+        self.handshakes = 0
+        self.active = 0
+        self.peak = 0
+
+    async def handle_async_request(self, request):
+        if not self.connected:
+            self.handshakes += 1
+            await asyncio.sleep(self.connect_delay)
+            if self.fail > 0:
+                self.fail -= 1
+                raise httpx.ConnectError("connect error")
+            self.connected = True
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return httpx.Response(200, stream=FakeStream(), extensions={"http_version": self.version})
+
+
+class FakePool(Http2PoolTransport):
+    def __init__(self, inner, **kwargs):
+        self.inner = inner
+        super().__init__(**kwargs)
+
+    def _new_transport(self):
+        return self.inner
+
+
+def run_requests(transport, count):
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            async def one():
+                try:
+                    r = await client.get("https://example.com/")
+                    return r.status_code
+                except httpx.ConnectError:
+                    return 0
+            return await asyncio.gather(*[one() for _ in range(count)])
+    return asyncio.run(run())
+
+
+class TestHttp2Pool(unittest.TestCase):
+    """Http2PoolTransport单元测试"""
+
+    def test_single_handshake(self):
+        """测试并发请求只握手一次, 之后复用HTTP/2连接"""
+        inner = FakeTransport()
+        pool = FakePool(inner)
+        self.assertEqual(run_requests(pool, 20), [200] * 20)
+        self.assertEqual(inner.handshakes, 1)
+        stats = pool.get_stats()["example.com"]
+        self.assertEqual(stats["http_version"], "HTTP/2")
+        self.assertEqual(stats["requests"], 20)
+        self.assertEqual(stats["streams"], 0)
+        self.assertGreater(stats["probe_waits"], 0)
+
+    def test_stream_limit(self):
+        """测试HTTP/2每个域名的流数限制"""
+        inner = FakeTransport()
+        pool = FakePool(inner, max_streams=3)
+        run_requests(pool, 12)
+        self.assertEqual(inner.peak, 3)
+        self.assertEqual(pool.get_stats()["example.com"]["peak_streams"], 3)
+
+    def test_http1_connection_limit(self):
+        """测试HTTP/1.1时按连接数限制"""
+        inner = FakeTransport(b"HTTP/1.1")
+        pool = FakePool(inner, max_connections=2, max_streams=100)
+        run_requests(pool, 10)
+        self.assertEqual(inner.peak, 2)
+        self.assertEqual(pool.get_stats()["example.com"]["http_version"], "HTTP/1.1")
+
+    def test_probe_failed(self):
+        """测试首个连接失败后由等待的请求重新建立"""
+        inner = FakeTransport(fail=1)
+        pool = FakePool(inner)
+        results = run_requests(pool, 5)
+        self.assertEqual(results.count(0), 1)
+        self.assertEqual(results.count(200), 4)
+        self.assertEqual(inner.handshakes, 2)
+
+    def test_invalid_proxy(self):
+        """测试代理格式错误时抛出"""
+        with self.assertRaises(ValueError):
+            Http2PoolTransport("ftp://127.0.0.1:1080")
+
+
+if __name__ == "__main__":
+    unittest.main()
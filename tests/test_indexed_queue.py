@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+IndexedQueue 单元测试
+"""
+import sys
+import os
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.indexed_queue import IndexedQueue
+
+
+class TestIndexedQueue(unittest.TestCase):
+    """IndexedQueue单元测试"""
+
+    def test_fifo(self):
+        """测试按加入顺序取出, 重复加入保持原位置"""
+        queue = IndexedQueue([1, 2])
+        self.assertTrue(queue.add(3))
+        self.assertFalse(queue.add(1))
+        self.assertEqual(list(queue), [1, 2, 3])
+        self.assertEqual(queue.first(), 1)
+        self.assertEqual(queue.popleft(), 1)
+        self.assertEqual(queue.popleft(), 2)
+        self.assertEqual(len(queue), 1)
+
+    def test_discard(self):
+        """测试删除中间元素和不存在的元素"""
+        queue = IndexedQueue(range(5))
+        self.assertTrue(queue.discard(2))
+        self.assertFalse(queue.discard(2))
+        self.assertNotIn(2, queue)
+        self.assertIn(3, queue)
+        self.assertEqual(list(queue), [0, 1, 3, 4])
+        queue.add(2)
+        self.assertEqual(list(queue), [0, 1, 3, 4, 2])
+
+    def test_empty(self):
+        """测试空队列"""
+        queue = IndexedQueue()
+        self.assertFalse(queue)
+        self.assertIsNone(queue.first())
+        with self.assertRaises(StopIteration):
+            queue.popleft()
+        queue.add(1)
+        queue.clear()
+        self.assertEqual(len(queue), 0)
+
+    def test_drain_linear(self):
+        """测试取完整个队列的耗时和长度成线性关系"""
+        def drain(num):
+            costs = []
+            for _ in range(3):
+                queue = IndexedQueue(range(num))
+                start = time.perf_counter()
+                while queue:
+                    queue.first()
+                    queue.popleft()
+                costs.append(time.perf_counter() - start)
+            return min(costs)
+
+        small, large = drain(20000), drain(80000)
+        # 线性约4倍, 原来的dict实现是平方级, 约16倍
+        self.assertLess(large / small, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
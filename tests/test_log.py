@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Log 异步日志单元测试
+"""
+import sys
+import os
+import glob
+import logging
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from config.setting import Setting
+from tools.log import Log
+
+
+class Counter(object):
+    """记录__str__被调用的次数"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "counter"
+
+
+class TestLog(unittest.TestCase):
+    """Log单元测试"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.oldPath = Setting.LogDirPath.value
+        self.oldIndex = Setting.LogIndex.value
+        self.oldMaxBytes = config.LogMaxBytes
+        Setting.LogDirPath._value = self.path
+        Log.Init()
+
+    def tearDown(self):
+        Log.Stop()
+        Log.ch = Log.fh = None
+        Setting.LogDirPath._value = self.oldPath
+        Setting.LogIndex._value = self.oldIndex
+        config.LogMaxBytes = self.oldMaxBytes
+        Log.logger.setLevel(logging.DEBUG)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def read_log(self):
+        Log.Stop()
+        text = ""
+        for path in sorted(glob.glob(os.path.join(self.path, "*.log*"))):
+            with open(path, encoding="utf-8") as f:
+                text += f.read()
+        return text
+
+    def test_lazy_format(self):
+        """测试级别关闭时不格式化参数"""
+        Setting.LogIndex._value = 0
+        Log.UpdateLoggingLevel()
+        counter = Counter()
+        Log.Debug("debug {}", counter)
+        Log.Info("info {}", counter)
+        self.assertEqual(counter.count, 0)
+        Log.Warn("warn {}", counter)
+        self.assertEqual(counter.count, 1)
+        self.assertIn("warn counter", self.read_log())
+
+    def test_background_writer(self):
+        """测试多线程写入的记录都由后台线程写到文件, 且保留调用位置"""
+        Setting.LogIndex._value = 1
+        Log.UpdateLoggingLevel()
+        names = set()
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                names.add(threading.current_thread().name)
+
+        Log.listener.handlers = Log.listener.handlers + (Handler(),)
+
+        def worker(index):
+            for i in range(50):
+                Log.Info("thread:{}, line:{}", index, i)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        text = self.read_log()
+        self.assertEqual(text.count("INFO: thread:"), 200)
+        self.assertIn("test_log.py", text)
+        self.assertEqual(len(names), 1)
+        self.assertNotIn(threading.current_thread().name, names)
+
+    def test_error_traceback(self):
+        """测试异常堆栈在调用线程转换后写入"""
+        try:
+            raise ValueError("bad value")
+        except ValueError as es:
+            Log.Error(es)
+        text = self.read_log()
+        self.assertIn("Traceback", text)
+        self.assertIn("ValueError: bad value", text)
+
+    def test_rotate(self):
+        """测试超过大小后轮转"""
+        config.LogMaxBytes = 2048
+        Log.Init()
+        Setting.LogIndex._value = 1
+        Log.UpdateLoggingLevel()
+        for i in range(200):
+            Log.Info("rotate {}", "x" * 50)
+        self.read_log()
+        files = glob.glob(os.path.join(self.path, "*.log*"))
+        self.assertGreater(len(files), 1)
+        self.assertLessEqual(len(files), config.LogBackupCount + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+TaskDownload.LoadPicPages 并发加载章节图片分页单元测试
+"""
+import sys
+import os
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from config import config
+from task.task_download import TaskDownload, QtDownloadTask
+from tools.status import Status
+
+
+class TestPicPageLoader(unittest.TestCase):
+    """TaskDownload.LoadPicPages单元测试"""
+
+    def setUp(self):
+        self.download = TaskDownload()
+        self.download.picPageLoads.clear()
+        self.requests = []
+        self.backs = []
+        self.patches = [
+            mock.patch.object(self.download, "AddHttpTask", self.AddHttpTask),
+            mock.patch.object(self.download, "HandlerDownload", self.HandlerDownload),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.download.picPageLoads.clear()
+
+    def AddHttpTask(self, req, callBack=None, backParam=None, cleanFlag=None):
+        self.requests.append((req, callBack, backParam))
+
+    def HandlerDownload(self, data, v):
+        self.backs.append((data["st"], v))
+
+    def NewTask(self, taskId):
+        task = QtDownloadTask(taskId)
+        task.bookId = "pic_test"
+        task.epsId = 2
+        return task
+
+    def Reply(self, st=Status.Ok):
+        req, callBack, backParam = self.requests.pop(0)
+        callBack({"st": st}, backParam)
+        return int(req.url.rsplit("=", 1)[1])
+
+    def test_concurrent_pages(self):
+        """测试同时请求的分页不超过上限, 全部完成后通知所有等待的任务"""
+        self.download.LoadPicPages(1, self.NewTask(1), list(range(2, 12)))
+        self.download.LoadPicPages(2, self.NewTask(2), list(range(2, 12)))
+        self.assertEqual(len(self.requests), config.PicPageLoadConcurrency)
+        self.assertIn("comics/pic_test/order/3/pages", self.requests[0][0].url)
+
+        pages = []
+        maxInflight = 0
+        while self.requests:
+            maxInflight = max(maxInflight, len(self.requests))
+            self.assertEqual(self.backs, [])
+            pages.append(self.Reply())
+        self.assertEqual(sorted(pages), list(range(2, 12)))
+        self.assertLessEqual(maxInflight, config.PicPageLoadConcurrency)
+        self.assertEqual(self.backs, [(Status.Ok, (1, QtDownloadTask.ReadingEps)), (Status.Ok, (2, QtDownloadTask.ReadingEps))])
+        self.assertEqual(self.download.picPageLoads, {})
+
+    def test_error(self):
+        """测试分页失败时停止请求并把错误通知所有等待的任务"""
+        self.download.LoadPicPages(1, self.NewTask(1), list(range(2, 12)))
+        self.download.LoadPicPages(2, self.NewTask(2), [2])
+        self.Reply(Status.NetError)
+        while self.requests:
+            self.Reply()
+        self.assertEqual(self.backs, [(Status.NetError, (1, QtDownloadTask.ReadingEps)), (Status.NetError, (2, QtDownloadTask.ReadingEps))])
+        self.assertEqual(self.download.picPageLoads, {})
+
+    def test_new_eps_no_cache(self):
+        """测试新增章节的图片分页不读缓存"""
+        task = self.NewTask(1)
+        task.isNewEps = True
+        self.download.LoadPicPages(1, task, [2, 3])
+        self.assertTrue(all(req.isNoCache for req, _, _ in self.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+ResponseCache 单元测试
+"""
+import sys
+import os
+import time
+import unittest
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """ResponseCache单元测试"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.tempDir, "api_cache.db"), max_entries=10)
+
+    def tearDown(self):
+        self.cache.conn.close()
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def test_put_get(self):
+        """测试保存与读取"""
+        body = b'{"code": 200}'
+        self.cache.put("CategoryReq", "https://a/categories", 200, '"v1"', "", "application/json", body)
+        entry = self.cache.get("CategoryReq", "https://a/categories")
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.body, body)
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertLess(entry.age, 5)
+        self.assertIsNone(self.cache.get("RankReq", "https://a/categories"))
+
+    def test_touch(self):
+        """测试304后刷新缓存时间"""
+        self.cache.put("RankReq", "u", 200, '"v1"', "", "", b"{}")
+        self.cache.conn.execute("UPDATE response SET tick=?", (time.time() - 1000,))
+        self.assertGreater(self.cache.get("RankReq", "u").age, 999)
+        self.cache.touch("RankReq", "u")
+        self.assertLess(self.cache.get("RankReq", "u").age, 5)
+        self.assertEqual(self.cache.get_stats()["revalidated"], 1)
+
+    def test_invalidate(self):
+        """测试删除缓存"""
+        self.cache.put("GetComicsBookReq", "u", 200, "", "", "", b"{}")
+        self.cache.invalidate("GetComicsBookReq", "u")
+        self.assertIsNone(self.cache.get("GetComicsBookReq", "u"))
+
+    def test_invalidate_prefix(self):
+        """测试按url前缀删除缓存"""
+        self.cache.put("GetComicsBookEpsReq", "https://a/comics/b1/eps?page=1", 200, "", "", "", b"{}")
+        self.cache.put("GetComicsBookEpsReq", "https://a/comics/b10/eps?page=1", 200, "", "", "", b"{}")
+        self.cache.put("GetComicsBookReq", "https://a/comics/b1/x", 200, "", "", "", b"{}")
+        self.cache.invalidate_prefix("GetComicsBookEpsReq", "https://a/comics/b1/")
+        self.assertIsNone(self.cache.get("GetComicsBookEpsReq", "https://a/comics/b1/eps?page=1"))
+        self.assertIsNotNone(self.cache.get("GetComicsBookEpsReq", "https://a/comics/b10/eps?page=1"))
+        self.assertIsNotNone(self.cache.get("GetComicsBookReq", "https://a/comics/b1/x"))
+
+    def test_evict(self):
+        """测试超过上限时删除最旧条目"""
+        for i in range(100):
+            self.cache.put("RankReq", str(i), 200, "", "", "", b"{}")
+        stats = self.cache.get_stats()
+        self.assertLessEqual(stats["entries"], 10)
+        self.assertIsNotNone(self.cache.get("RankReq", "99"))
+
+    def test_stats(self):
+        """测试命中统计"""
+        self.cache.record(True)
+        self.cache.record(True, stale=True)
+        self.cache.record(False)
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["stale_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+ResultTable 单元测试
+"""
+import sys
+import os
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from PySide6.QtCore import QCoreApplication
+
+from task.qt_task import ResultTable, QtTaskQObject
+
+
+class TestResultTable(unittest.TestCase):
+    """ResultTable单元测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    def test_put_pop(self):
+        """测试按taskId取出且只能取一次"""
+        table = ResultTable()
+        data = {"st": 1001, "data": "x"}
+        table.Put(1, data)
+        self.assertIs(table.Pop(1), data)
+        self.assertIsNone(table.Pop(1))
+        self.assertEqual(len(table), 0)
+
+    def test_emit_from_thread(self):
+        """测试工作线程发出的结果按引用到达UI线程"""
+        obj = QtTaskQObject()
+        data = {"rows": list(range(1000))}
+        received = []
+        obj.taskBack.connect(lambda taskId: received.append(obj.taskResults.Pop(taskId)))
+        thread = threading.Thread(target=obj.EmitTask, args=(7, data))
+        thread.start()
+        thread.join()
+        start = time.time()
+        while not received and time.time() - start < 5:
+            self.app.processEvents()
+        self.assertEqual(len(received), 1)
+        self.assertIs(received[0], data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Server 单元测试
+"""
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from server import req, res
+from server.server import Server, Task
+from tools.response_cache import ResponseCache
+from tools.status import Status
+
+
+class LoopTestReq(req.ServerReq):
+    def __init__(self, name):
+        super(self.__class__, self).__init__("https://loop.example.com/" + name, {}, {}, "GET")
+        self.name = name
+
+
+class LoopTestHandler(object):
+    """在事件循环中执行的handler, 记录执行的线程"""
+
+    def __init__(self):
+        self.results = {}
+        self.event = threading.Event()
+
+    async def __call__(self, task):
+        if task.req.name == "raise":
+            raise RuntimeError("handler error")
+        self.results[task.req.name] = (threading.get_ident(), task.status, task.res.message if task.res else "")
+        self.event.set()
+
+
+class SyncLoopTestHandler(LoopTestHandler):
+    """同步的handler, 由Server放到线程池执行"""
+
+    def __call__(self, task):
+        self.results[task.req.name] = (threading.current_thread().name, task.status, task.res.message)
+        self.event.set()
+
+
+class TestServerCache(unittest.TestCase):
+    """Server.GetWithCache单元测试"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.tempDir, "api_cache.db"))
+        self.patch = mock.patch("server.server.get_response_cache", return_value=self.cache)
+        self.patch.start()
+        self.server = Server()
+        self.gets = []
+
+    def tearDown(self):
+        self.patch.stop()
+        self.cache.conn.close()
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    async def FakeGet(self, task, index=0, cacheEntry=None):
+        self.gets.append(cacheEntry)
+        r = httpx.Response(200, content=b'{"code": 200, "message": "new"}', request=httpx.Request("GET", task.req.url))
+        task.res = res.BaseRes(r, True, task.req.__class__.__name__)
+        return task
+
+    def Load(self, request):
+        with mock.patch.object(self.server, "Get", self.FakeGet):
+            task = self.server.RunSync(self.server.GetWithCache(Task(request)))
+        return task.res.message
+
+    def test_no_cache(self):
+        """测试强制刷新时不返回缓存, 并用新结果更新缓存"""
+        request = req.GetComicsBookEpsReq("book1", 1)
+        self.cache.put(request.__class__.__name__, request.cacheUrl, 200, '"v1"', "", "", b'{"code": 200, "message": "old"}')
+        self.assertEqual(self.Load(request), "old")
+        self.assertEqual(self.gets, [])
+
+        request = req.GetComicsBookEpsReq("book1", 1)
+        request.isNoCache = True
+        self.assertEqual(self.Load(request), "new")
+        self.assertEqual(self.gets[0].etag, '"v1"')
+        self.assertEqual(self.Load(req.GetComicsBookEpsReq("book1", 1)), "new")
+        self.assertEqual(len(self.gets), 1)
+
+
+class TestServerLoop(unittest.TestCase):
+    """Server事件循环单元测试"""
+
+    def setUp(self):
+        self.server = Server()
+        self.handler = LoopTestHandler()
+        self.server.handler[LoopTestReq.__name__] = self.handler
+        self.patch = mock.patch.object(self.server, "Get", self.FakeGet)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.server.handler.pop(LoopTestReq.__name__, None)
+
+    async def FakeGet(self, task, index=0, cacheEntry=None):
+        if task.req.name == "neterror":
+            raise ValueError("connect error")
+        content = '{{"code": 200, "message": "{}"}}'.format(task.req.name).encode("utf-8")
+        r = httpx.Response(200, content=content, request=httpx.Request("GET", task.req.url))
+        task.res = res.BaseRes(r, True, task.req.__class__.__name__)
+        return task
+
+    def Send(self, name):
+        self.handler.event.clear()
+        self.server.Send(LoopTestReq(name))
+        self.assertTrue(self.handler.event.wait(5))
+        return self.handler.results[name]
+
+    def GetLoopThread(self):
+        async def GetIdent():
+            return threading.get_ident()
+        return self.server.RunSync(GetIdent())
+
+    def test_run_in_thread(self):
+        """测试同步函数在线程池中执行, 不占用事件循环"""
+        async def Run():
+            return threading.get_ident(), await self.server.RunInThread(threading.current_thread)
+        loopIdent, thread = self.server.RunSync(Run())
+        self.assertNotEqual(thread.ident, loopIdent)
+        self.assertTrue(thread.name.startswith("HTTP_"))
+
+        # 同步的handler也放到线程池中执行
+        self.handler = SyncLoopTestHandler()
+        self.server.handler[LoopTestReq.__name__] = self.handler
+        threadName, st, message = self.Send("sync")
+        self.assertTrue(threadName.startswith("HTTP_"))
+        self.assertEqual((st, message), (Status.Ok, "sync"))
+
+    def test_send(self):
+        """测试Send的结果在事件循环线程中交给handler"""
+        ident, st, message = self.Send("book")
+        self.assertEqual(ident, self.GetLoopThread())
+        self.assertNotEqual(ident, threading.get_ident())
+        self.assertEqual((st, message), (Status.Ok, "book"))
+
+    def test_error_not_stop_loop(self):
+        """测试一个请求出错不影响事件循环继续处理其他请求"""
+        self.server.Send(LoopTestReq("raise"))
+        _, st, _ = self.Send("neterror")
+        self.assertEqual(st, Status.NetError)
+        for i in range(self.server.apiConcurrentNum + 1):
+            self.assertEqual(self.Send("ok{}".format(i))[1:], (Status.Ok, "ok{}".format(i)))
+        self.assertTrue(self.server._loop.is_running())
+
+
+if __name__ == '__main__':
+    unittest.main()
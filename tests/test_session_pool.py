@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+SessionPool 单元测试
+"""
+import sys
+import os
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import httpx
+
+from tools.session_pool import SessionPool
+
+
+class TestSessionPool(unittest.TestCase):
+    """SessionPool单元测试"""
+
+    def test_skip_same_proxy(self):
+        """测试代理没变时不重建"""
+        pool = SessionPool(lambda proxy: httpx.AsyncClient())
+        session = pool.thread_session
+        self.assertFalse(pool.update_proxy(None))
+        self.assertIs(pool.thread_session, session)
+        self.assertTrue(pool.update_proxy("http://127.0.0.1:1080"))
+        self.assertIsNot(pool.thread_session, session)
+        self.assertFalse(pool.update_proxy("http://127.0.0.1:1080"))
+        self.assertEqual(pool.get_stats()["skip_update_count"], 2)
+
+    def test_drain_after_lease(self):
+        """测试旧Session在请求结束后才关闭"""
+        async def run():
+            pool = SessionPool(lambda proxy: httpx.AsyncClient())
+            pool.bind_loop(asyncio.get_running_loop())
+            async with pool.lease(True) as old:
+                await asyncio.to_thread(pool.update_proxy, "http://127.0.0.1:1080")
+                await asyncio.sleep(0.01)
+                self.assertFalse(old.is_closed)
+                self.assertIsNot(pool.download_session, old)
+            self.assertTrue(old.is_closed)
+            self.assertFalse(pool.download_session.is_closed)
+            stats = pool.get_stats()
+            self.assertEqual(stats["draining"], [])
+            self.assertEqual(stats["drained_count"], 1)
+            await pool.close()
+        asyncio.run(run())
+
+    def test_drain_timeout(self):
+        """测试请求一直不结束时强制关闭"""
+        async def run():
+            pool = SessionPool(lambda proxy: httpx.AsyncClient(), drain_timeout=0.01)
+            pool.bind_loop(asyncio.get_running_loop())
+            async with pool.lease() as old:
+                pool.update_proxy("http://127.0.0.1:1080")
+                await asyncio.sleep(0.1)
+                self.assertTrue(old.is_closed)
+            self.assertEqual(pool.get_stats()["force_closed_count"], 1)
+            await pool.close()
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+StreamBuffer 单元测试
+"""
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.stream_buffer import StreamBuffer, StreamFile
+
+
+class TestStreamBuffer(unittest.TestCase):
+    """StreamBuffer单元测试"""
+
+    def test_preallocated(self):
+        """测试已知长度时的预分配写入"""
+        data = os.urandom(10000)
+        buffer = StreamBuffer(len(data))
+        for i in range(0, len(data), 1024):
+            buffer.Write(data[i:i + 1024])
+        self.assertEqual(len(buffer), len(data))
+        self.assertEqual(buffer.GetData(), data)
+        self.assertIsInstance(buffer.GetData(), bytes)
+
+    def test_unknown_size(self):
+        """测试长度未知时分块收集"""
+        buffer = StreamBuffer()
+        buffer.Write(b"abc")
+        buffer.Write(b"")
+        buffer.Write(b"def")
+        self.assertEqual(buffer.GetData(), b"abcdef")
+
+    def test_shorter_than_content_length(self):
+        """测试实际数据比Content-Length短"""
+        buffer = StreamBuffer(10)
+        buffer.Write(b"abc")
+        self.assertEqual(buffer.GetData(), b"abc")
+
+    def test_longer_than_content_length(self):
+        """测试实际数据比Content-Length长（如gzip解压后）"""
+        buffer = StreamBuffer(4)
+        buffer.Write(b"abc")
+        buffer.Write(b"defg")
+        buffer.Write(b"h")
+        self.assertEqual(len(buffer), 8)
+        self.assertEqual(buffer.GetData(), b"abcdefgh")
+
+    def test_get_data_same_object(self):
+        """测试多次获取返回同一对象，不重复拷贝"""
+        buffer = StreamBuffer(3)
+        buffer.Write(b"abc")
+        self.assertIs(buffer.GetData(), buffer.GetData())
+
+
+class TestStreamFile(unittest.TestCase):
+    """StreamFile单元测试"""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.cachePath = os.path.join(self.tempDir, "cache", "1.jpg")
+        self.savePath = os.path.join(self.tempDir, "save", "1.jpg")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def test_commit(self):
+        """测试写入后原子重命名，第二个路径为硬链接"""
+        streamFile = StreamFile([self.cachePath, "", self.savePath])
+        streamFile.Write(b"abc")
+        streamFile.Write(b"def")
+        self.assertFalse(os.path.exists(self.cachePath))
+        streamFile.Commit()
+
+        with open(self.cachePath, "rb") as f:
+            self.assertEqual(f.read(), b"abcdef")
+        with open(self.savePath, "rb") as f:
+            self.assertEqual(f.read(), b"abcdef")
+        self.assertEqual(os.stat(self.savePath).st_nlink, 2)
+        self.assertFalse(os.path.exists(streamFile.tempPath))
+
+    def test_commit_replace(self):
+        """测试覆盖已存在的文件"""
+        os.makedirs(os.path.dirname(self.savePath))
+        with open(self.savePath, "wb") as f:
+            f.write(b"old")
+        streamFile = StreamFile([self.cachePath, self.savePath])
+        streamFile.Write(b"new")
+        streamFile.Commit()
+        with open(self.savePath, "rb") as f:
+            self.assertEqual(f.read(), b"new")
+
+    def test_abort(self):
+        """测试中断时删除临时文件，不留下半张图片"""
+        streamFile = StreamFile([self.cachePath])
+        streamFile.Write(b"abc")
+        self.assertTrue(os.path.isfile(streamFile.tempPath))
+        streamFile.Abort()
+        self.assertFalse(os.path.exists(streamFile.tempPath))
+        self.assertFalse(os.path.exists(self.cachePath))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+TaskHttp 相同请求合并单元测试
+"""
+import sys
+import os
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from server import req
+from task.task_http import TaskHttp
+
+
+class TestTaskHttpCoalesce(unittest.TestCase):
+    """TaskHttp.AddInflight/HandlerTask单元测试"""
+
+    def setUp(self):
+        self.http = TaskHttp()
+        self.http.inflight.clear()
+        self.http.inflightKeys.clear()
+        self.server = mock.Mock()
+        self.server.return_value.token = ""
+        self.patch = mock.patch("server.server.Server", self.server)
+        self.patch.start()
+        self.results = []
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def callBack(self, data, param):
+        data["param"] = param
+        self.results.append(data)
+
+    def GetSends(self):
+        return [c.kwargs["backParam"] for c in self.server.return_value.Send.call_args_list]
+
+    def Reply(self, taskId, data):
+        self.http.taskObj.taskResults.Put(taskId, data)
+        self.http.HandlerTask(taskId)
+
+    def test_coalesce(self):
+        """测试相同的GET只发送一次, 每个回调拿到自己的一份结果"""
+        self.http.AddHttpTask(req.GetComicsBookReq("b1"), self.callBack, "a")
+        self.http.AddHttpTask(req.GetComicsBookReq("b1"), self.callBack, "b")
+        sends = self.GetSends()
+        self.assertEqual(len(sends), 1)
+
+        self.Reply(sends[0], {"st": 1, "data": "x"})
+        self.assertEqual(self.results, [{"st": 1, "data": "x", "param": "a"}, {"st": 1, "data": "x", "param": "b"}])
+        self.assertIsNot(self.results[0], self.results[1])
+        self.assertEqual(self.http.inflight, {})
+
+        # 返回后再请求会重新发送
+        self.http.AddHttpTask(req.GetComicsBookReq("b1"), self.callBack, "c")
+        self.assertEqual(len(self.GetSends()), 2)
+
+    def test_cancel_leader(self):
+        """测试发出请求的任务取消后, 合并的任务仍能收到结果"""
+        self.http.AddHttpTask(req.GetComicsBookReq("b1"), self.callBack, "a", cleanFlag="leader")
+        self.http.AddHttpTask(req.GetComicsBookReq("b1"), self.callBack, "b")
+        self.http.Cancel("leader")
+        self.Reply(self.GetSends()[0], {"st": 1})
+        self.assertEqual(self.results, [{"st": 1, "param": "b"}])
+
+    def test_not_coalesce(self):
+        """测试非GET请求、超时的请求、不同token的请求不合并"""
+        self.http.AddHttpTask(req.LoginReq("user", "passwd"), self.callBack, "a")
+        self.http.AddHttpTask(req.LoginReq("user", "passwd"), self.callBack, "b")
+        self.assertEqual(len(self.GetSends()), 2)
+
+        self.http.AddHttpTask(req.GetComicsBookReq("b2"), self.callBack, "c")
+        startTick = list(self.http.inflight.values())[-1][0]
+        with mock.patch("task.task_http.time.time", return_value=startTick + TaskHttp.CoalesceExpire + 1):
+            self.http.AddHttpTask(req.GetComicsBookReq("b2"), self.callBack, "d")
+        self.assertEqual(len(self.GetSends()), 4)
+
+        self.server.return_value.token = "user2"
+        self.http.AddHttpTask(req.GetComicsBookReq("b3"), self.callBack, "e")
+        request = req.GetComicsBookReq("b3")
+        request.token = "user3"
+        self.http.AddHttpTask(request, self.callBack, "f")
+        self.assertEqual(len(self.GetSends()), 6)
+        self.http.AddHttpTask(req.GetComicsBookReq("b3"), self.callBack, "g")
+        self.assertEqual(len(self.GetSends()), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+WriteBehindDb 和 DownloadDb 批量写入的单元测试
+"""
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from tools.write_behind import WriteBehindDb
+
+UPSERT = "INSERT INTO t(k, v) VALUES (?, ?) ON CONFLICT(k) DO UPDATE SET v=excluded.v"
+DELETE = "delete from t where k=?"
+
+
+class TestWriteBehindDb(unittest.TestCase):
+    """WriteBehindDb单元测试"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="pica_wb_")
+        self.database = os.path.join(self.path, "test.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("create table t(k varchar primary key, v varchar)")
+        conn.commit()
+        conn.close()
+        # 间隔足够长, 只有flush时写入
+        self.db = WriteBehindDb(self.database, "test", interval=60)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def rows(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return dict(conn.execute("select k, v from t").fetchall())
+        finally:
+            conn.close()
+
+    def test_coalesce(self):
+        """测试同一行多次写入只写最后一次, 一个事务完成"""
+        for i in range(100):
+            self.db.execute(UPSERT, ("a", str(i)), "a")
+        self.db.execute(UPSERT, ("b", "it's"), "b")
+        self.assertEqual(self.db.pending(), 2)
+        self.assertEqual(self.rows(), {})
+        self.assertTrue(self.db.flush())
+        self.assertEqual(self.rows(), {"a": "99", "b": "it's"})
+        stats = self.db.get_stats()
+        self.assertEqual(stats["coalesced"], 99)
+        self.assertEqual(stats["rows"], 2)
+        self.assertEqual(stats["transactions"], 1)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_order(self):
+        """测试删除后重新加入的行保留"""
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        self.db.execute(UPSERT, ("b", "1"), "b")
+        self.db.execute(DELETE, ("a", ))
+        self.db.execute(DELETE, ("b", ))
+        self.db.execute(UPSERT, ("a", "2"), "a")
+        self.db.flush()
+        self.assertEqual(self.rows(), {"a": "2"})
+
+    def test_close(self):
+        """测试关闭时写入剩下的数据, 并使用WAL模式"""
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        self.db.close()
+        self.assertEqual(self.rows(), {"a": "1"})
+        conn = sqlite3.connect(self.database)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+
+    def test_error(self):
+        """测试写入失败时回滚, 后面的批次不受影响"""
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        self.db.execute("INSERT INTO missing(k) VALUES (?)", ("a", ))
+        self.db.flush()
+        self.assertEqual(self.rows(), {})
+        self.assertEqual(self.db.get_stats()["errors"], 1)
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        self.db.flush()
+        self.assertEqual(self.rows(), {"a": "1"})
+
+    def test_retry(self):
+        """测试数据库被锁时放回重试, 期间的新写入不会被旧数据覆盖"""
+        self.db.close()
+        self.db = WriteBehindDb(self.database, "test", interval=60, busyTimeout=0.1)
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        self.db.execute(UPSERT, ("b", "1"), "b")
+        lock = sqlite3.connect(self.database, isolation_level=None)
+        lock.execute("BEGIN EXCLUSIVE")
+        try:
+            self.assertFalse(self.db.flush())
+            self.assertEqual(self.db.pending(), 2)
+            self.db.execute(UPSERT, ("a", "2"), "a")
+        finally:
+            lock.execute("ROLLBACK")
+            lock.close()
+        self.assertEqual(self.rows(), {})
+        stats = self.db.get_stats()
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["retries"], 2)
+        self.assertTrue(self.db.flush())
+        self.assertEqual(self.rows(), {"a": "2", "b": "1"})
+
+    def test_run_after_commit(self):
+        """测试提交成功后才在写入线程中调用, 失败时等下次成功"""
+        self.db.close()
+        self.db = WriteBehindDb(self.database, "test", interval=60, busyTimeout=0.1)
+        called = []
+        self.db.execute(UPSERT, ("a", "1"), "a")
+        lock = sqlite3.connect(self.database, isolation_level=None)
+        lock.execute("BEGIN EXCLUSIVE")
+        try:
+            self.db.run_after_commit(lambda conn: called.append(conn.execute("select v from t").fetchall()))
+            self.assertFalse(self.db.flush())
+            self.assertEqual(called, [])
+        finally:
+            lock.execute("ROLLBACK")
+            lock.close()
+        self.assertTrue(self.db.flush())
+        self.assertEqual(called, [[("1", )]])
+
+
+class TestDownloadDb(unittest.TestCase):
+    """DownloadDb读写测试"""
+
+    def test_round_trip(self):
+        """测试批量写入后可以重新读出, 未修改的章节不会写入"""
+        from view.download.download_db import DownloadDb
+        from view.download.download_item import DownloadItem, DownloadEpsItem
+        from view.download.download_status import DownloadStatus
+
+        path = tempfile.mkdtemp(prefix="pica_dl_")
+        try:
+            with mock.patch("config.setting.Setting.GetConfigPath", return_value=path):
+                db = DownloadDb()
+            task = DownloadItem()
+            task.bookId, task.title, task.epsIds = "book1", "it's a book", [0, 1]
+            for epsId in task.epsIds:
+                info = DownloadEpsItem()
+                info.bookId, info.epsId, info.epsTitle, info.picCnt = task.bookId, epsId, "eps'{}".format(epsId), 10
+                task.epsInfo[epsId] = info
+
+            status = DownloadStatus.__new__(DownloadStatus)
+            status.db = db
+            status.UpdateTaskDB(task)
+            task.epsInfo[1].curPreDownloadIndex = 5
+            task.epsInfo[1].dirty = True
+            status.UpdateTaskDB(task)
+            db.Flush()
+            stats = db.writer.get_stats()
+            self.assertEqual(stats["writes"], 4)
+            self.assertEqual(stats["rows"], 3)
+
+            downloads = db.LoadDownload(None)
+            self.assertEqual(downloads["book1"].title, "it's a book")
+            self.assertEqual(downloads["book1"].epsInfo[1].curPreDownloadIndex, 5)
+            self.assertEqual(downloads["book1"].epsInfo[0].epsTitle, "eps'0")
+            self.assertFalse(downloads["book1"].dirty)
+
+            db.DelDownloadDB("book1")
+            db.Close()
+            self.assertEqual(db.LoadDownload(None), {})
+            db.db.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()